@@ -5,7 +5,7 @@ from services.rate_limiter import rate_limited
 from services.users_service import get_role_by_username
 from services.security_service import (hash_password, verify_credentials)
 from services.users_service import (create_user, get_users_count, get_users, update_user, remove_user)
-from models.database import get_db_connection
+from models.database import get_read_connection
 
 from cryptography.hazmat.primitives import serialization
 
@@ -42,7 +42,7 @@ def login():
     if request.method == 'POST':
         data = request.get_json()
         username, password = data['username'], data['password']
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT password, role FROM users WHERE username = ?', (username,))
             row = c.fetchone()
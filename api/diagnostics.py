@@ -0,0 +1,31 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from services.query_stats import query_stats
+from services.users_service import get_role_by_username
+
+bp = Blueprint('diagnostics', __name__)
+
+@bp.route('/queries', methods=['GET'])
+@jwt_required()
+def list_query_stats():
+    username = get_jwt_identity()
+    if get_role_by_username(username) != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    limit = request.args.get('limit', 50, type=int)
+    order_by = request.args.get('order_by', 'total', type=str)
+    return jsonify({
+        'slow_query_ms': query_stats.slow_query_ms,
+        'statements': query_stats.snapshot(limit=limit, order_by=order_by)
+    })
+
+@bp.route('/queries', methods=['DELETE'])
+@jwt_required()
+def reset_query_stats():
+    username = get_jwt_identity()
+    if get_role_by_username(username) != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    query_stats.reset()
+    return jsonify({'success': True})
@@ -1,19 +1,20 @@
-import pandas as pd
 import io
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 import re
 
-from models.database import get_db_connection
+from models.database import get_read_connection
+from models.license import License
 from services.rate_limiter import rate_limited
+from services.http_cache import conditional_get
 from services.users_service import get_role_by_username
 from services.license_service import (
-    create_license, revoke_license, get_licenses, delete_license,
-    get_license_stats, get_license_detail
+    BULK_ACTIONS, create_license, revoke_license, get_licenses, delete_license,
+    get_license_stats, get_license_detail, bulk_license_action
 )
 
-from utils.hash_utils import hash_machine_code
+from utils.hash_utils import hash_machine_code, machine_code_digest
 from utils.validators import validate_license_key
 
 bp = Blueprint('licenses', __name__)
@@ -83,12 +84,12 @@ def update_license_route(license_key):
     data = request.get_json()
     if 'user_id' in data and contains_xss(data['user_id']):
         return jsonify({'error': 'Invalid input detected'}), 400
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM licenses WHERE key = ?", (license_key,))
     license_record = cursor.fetchone()
+    conn.close()
     if not license_record:
-        conn.close()
         return jsonify({'error': 'License not found'}), 404
     
     # Prepare update fields
@@ -131,14 +132,9 @@ def update_license_route(license_key):
                 return jsonify({'error': 'Invalid expires_at format. Use YYYY-MM-DD HH:MM'}), 400
 
     if not update_fields:
-        conn.close()
         return jsonify({'error': 'No valid fields to update'}), 400
     
-    update_values.append(license_key)
-    sql_query = f"UPDATE licenses SET {', '.join(update_fields)} WHERE key = ?"
-    cursor.execute(sql_query, tuple(update_values))
-    conn.commit()
-    conn.close()
+    License.update(license_key, update_fields, update_values)
     
     updated_license = get_license_detail(license_key)
     return jsonify({'success': True, 'data': updated_license})
@@ -146,6 +142,7 @@ def update_license_route(license_key):
 @bp.route('', methods=['GET'])
 @rate_limited(limit='30 per minute')  # Limit license listing
 @jwt_required()
+@conditional_get('licenses', 'products')
 def list_licenses():
     query = request.args.get('q', '', type=str)
     page = request.args.get('page', 1, type=int)
@@ -165,6 +162,7 @@ def list_licenses():
 @bp.route('/search', methods=['GET'])
 @rate_limited(limit='30 per minute')  # Limit license search
 @jwt_required()
+@conditional_get('licenses', 'products')
 def search_licenses():   
     query = request.args.get('q', '', type=str)
     page = request.args.get('page', 1, type=int)
@@ -198,9 +196,25 @@ def delete_license_route(license_key):
         return jsonify({'message': 'License deleted successfully'})
     return jsonify(result), 404
 
+@bp.route('/bulk/<action>', methods=['POST'])
+@rate_limited(limit='10 per minute')  # Limit bulk revoke/delete/extend
+@jwt_required()
+def bulk_license_route(action):
+    username = get_jwt_identity()
+    if get_role_by_username(username) != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': 'Unknown bulk action'}), 404
+
+    result = bulk_license_action(action, request.data)
+    if result['success']:
+        return jsonify(result)
+    return jsonify(result), 400
+
 @bp.route('/stats', methods=['GET'])
 @rate_limited(limit='40 per minute')  # Limit license stats retrieval
 @jwt_required()
+@conditional_get('licenses', 'usage_logs')
 def license_stats():   
     stats = get_license_stats()
     return jsonify(stats)
@@ -209,7 +223,7 @@ def license_stats():
 @rate_limited(limit='30 per minute')  # Limit test data retrieval
 @jwt_required()
 def test_route():
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT l.key, p.name AS product_name
@@ -236,7 +250,7 @@ def backup_licenses():
         return jsonify({'error': 'Admin access required'}), 403
 
     # save all tablese in excel file as different sheets
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT l.key, l.user_id, l.machine_code, l.credit_number, l.status, l.usage_count,
@@ -247,13 +261,13 @@ def backup_licenses():
     licenses_rows = cursor.fetchall()
     conn.close()
 
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM products")
     product_rows = cursor.fetchall()
     conn.close()
 
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT s.id, p.name AS product_name, s.number_of_credits, s.license_duration_hours, s.created_at
@@ -262,6 +276,9 @@ def backup_licenses():
     """)
     settings_rows = cursor.fetchall()
     conn.close()
+
+    # pandas/numpy/openpyxl add ~250 ms and tens of MB per worker; only load them here
+    import pandas as pd
     
     df_licenses = pd.DataFrame([dict(row) for row in licenses_rows])
     df_products = pd.DataFrame([dict(row) for row in product_rows])
@@ -281,6 +298,32 @@ def backup_licenses():
         download_name='database_backup.xlsx'
     )
 
+@bp.route('/import', methods=['POST'])
+@rate_limited(limit='5 per minute')  # Limit license imports
+@jwt_required()
+def import_licenses_route():
+    username = get_jwt_identity()
+    if get_role_by_username(username) != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    # multipart/form-data with only the file; options are query parameters
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'file is required (CSV or XLSX)'}), 400
+    if not upload.filename.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+        return jsonify({'error': 'Only .csv and .xlsx files can be imported'}), 400
+
+    from services.license_import import import_file
+    result = import_file(
+        upload.stream, upload.filename,
+        sheet=request.args.get('sheet'),
+        hashed_machine_codes=request.args.get('hashed_machine_codes', '').lower() in ('1', 'true'),
+        dry_run=request.args.get('dry_run', '').lower() in ('1', 'true')
+    )
+    if result['success']:
+        return jsonify(result), 200
+    return jsonify(result), 400
+
 @bp.route('/automate', methods=['POST'])
 @jwt_required()
 def automate_license_route():
@@ -294,7 +337,7 @@ def automate_license_route():
         return jsonify({'error': 'Invalid input detected'}), 400
     
     # check if product exists
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT id FROM products WHERE name = ?", (data['product_name'],))
     product = cursor.fetchone()
@@ -305,31 +348,31 @@ def automate_license_route():
     product_id = product['id']
     conn.close()
 
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     # check if any active license of the user_id, machine_code with same product_name already exists
     cursor.execute("""
         SELECT COUNT(*) AS count FROM licenses
-        WHERE (user_id = ? OR machine_code = ?) AND product_id = ?
-    """, (data['user_id'], hash_machine_code(data['machine_code']), product_id))
+        WHERE (user_id = ? OR machine_hash = ?) AND product_id = ?
+    """, (data['user_id'], machine_code_digest(data['machine_code']), product_id))
     result = cursor.fetchone()
     conn.close()
     if result['count'] > 0:
         return jsonify({'error': 'Active license already exists for this user and machine code'}), 400
 
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT COUNT(*) AS count FROM licenses
-        WHERE user_id != ? AND machine_code = ?
-    """, (data['user_id'], hash_machine_code(data['machine_code'])))
+        WHERE user_id != ? AND machine_hash = ?
+    """, (data['user_id'], machine_code_digest(data['machine_code'])))
     result = cursor.fetchone()
     conn.close()
     if result['count'] > 0:
         return jsonify({'error': 'Already registered machine_code with another user'}), 400
     
     # get number_of_credits, license_duration_hours data for the product
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT number_of_credits, license_duration_hours FROM settings WHERE product_id = ?", (product_id,))
     setting = cursor.fetchone()
@@ -373,23 +416,8 @@ def update_credit_number_route():
     if contains_xss(license_key):
         return jsonify({'error': 'Invalid input detected'}), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM licenses WHERE key = ?", (license_key,))
-    license_record = cursor.fetchone()
-    if not license_record:
-        conn.close()
+    if not License.use_credits(license_key, used_credits):
         return jsonify({'error': 'License not found'}), 404
-    new_credit_number = int(license_record['credit_number']) - used_credits
-    if(new_credit_number < 0):
-        new_credit_number = 0
-    cursor.execute("""
-        UPDATE licenses
-        SET credit_number = ?
-        WHERE key = ?
-    """, (new_credit_number, license_key))
-    conn.commit()
-    conn.close()
 
     # get the updated license details
     updated_license = get_license_detail(license_key)
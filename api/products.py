@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from services.rate_limiter import rate_limited
+from services.http_cache import conditional_get
 from services.users_service import get_role_by_username
 from services.product_service import (
     create_product, get_products, update_product, 
@@ -14,6 +15,7 @@ bp = Blueprint('products', __name__)
 @bp.route('', methods=['GET'])
 @rate_limited(limit='30 per minute')  # Limit product listing
 @jwt_required()
+@conditional_get('products', 'licenses')
 def list_products():
     page = int(request.args.get('page', 1))
     query = request.args.get('q', '').strip()
@@ -31,6 +33,7 @@ def list_products():
 
 @bp.route('/all', methods=['GET'])
 @rate_limited(limit='30 per minute')  # Limit product retrieval
+@conditional_get('products', 'licenses')
 def get_all_products():
     from services.product_service import get_products
     # Get all products without pagination
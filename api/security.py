@@ -1,33 +1,114 @@
 import base64
 import secrets
+import struct
 import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Tuple, Optional
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, x25519
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives import padding as sym_padding
 from cryptography.hazmat.backends import default_backend
 
+from config import Config
+from services.compression import compress, decompress
+from services.metrics import crypto_timer
+from utils import json_codec
+
+# Binary envelope (v2): version byte | flags byte | 12-byte nonce | AES-256-GCM ciphertext+tag.
+# The two header bytes are authenticated as associated data.
+ENVELOPE_VERSION_HEADER = 'X-Encryption-Version'
+ENVELOPE_V2 = 2
+ENVELOPE_NONCE_SIZE = 12
+ENVELOPE_HEADER_SIZE = 2
+# Flag bits: plaintext was compressed before sealing (ciphertext itself doesn't compress)
+ENVELOPE_FLAG_GZIP = 0x01
+ENVELOPE_FLAG_BROTLI = 0x02
+
+# Key exchange modes, chosen by the client with the X-Key-Exchange header on /init-session
+KEY_EXCHANGE_HEADER = 'X-Key-Exchange'
+KEY_EXCHANGE_RSA = 'rsa'
+KEY_EXCHANGE_X25519 = 'x25519'
+KEY_EXCHANGE_MODES = (KEY_EXCHANGE_RSA, KEY_EXCHANGE_X25519)
+HKDF_INFO = b'license-server session key v1'
+
+# Session ticket: version byte | key epoch (uint32) | 12-byte nonce | AES-GCM(expires_at uint64 | AES key).
+# Sealed with a key derived from SECRET_KEY per rotation epoch, so any worker can resume it.
+TICKET_HEADER = 'X-Session-Ticket'
+TICKET_VERSION = 1
+_TICKET_HEADER = struct.Struct('>BI')
+_TICKET_EXPIRY = struct.Struct('>Q')
+RESUMED_SESSION_CACHE_SIZE = 10000
+
+# Defaults published in this repository; tickets sealed with them could be forged and opened by anyone
+_PUBLIC_SECRETS = ('dev-secret-key-change-me', 'jwt-secret-change-me')
+
+def session_tickets_enabled() -> bool:
+    """Whether SESSION_TICKET_SECRET is set to something other than a published default"""
+    return bool(Config.SESSION_TICKET_SECRET) and Config.SESSION_TICKET_SECRET not in _PUBLIC_SECRETS
+
+@lru_cache(maxsize=64)
+def _ticket_cipher(secret_key: str, epoch: int) -> AESGCM:
+    key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=b'license-server session ticket',
+        info=f'epoch:{epoch}'.encode('utf-8')
+    ).derive(secret_key.encode('utf-8'))
+    return AESGCM(key)
+
 class SessionManager:
     def __init__(self):
         self.sessions: Dict[str, dict] = {}
         self.session_timeout = 3600  # 1 hour
+        # Sessions rebuilt from tickets, keyed by ticket; bounded since tickets need no server state
+        self.resumed_sessions: 'OrderedDict[str, dict]' = OrderedDict()
         
-    def create_session(self, client_id: str) -> str:
+    def create_session(self, client_id: str, key_exchange: str = KEY_EXCHANGE_RSA) -> str:
         """Create new session with client"""
         session_id = secrets.token_urlsafe(32)
+        if key_exchange == KEY_EXCHANGE_X25519:
+            with crypto_timer('x25519_keygen'):
+                server_private_key = x25519.X25519PrivateKey.generate()
+        else:
+            with crypto_timer('rsa_keygen'):
+                server_private_key = rsa.generate_private_key(
+                    public_exponent=65537,
+                    key_size=2048,
+                    backend=default_backend()
+                )
         self.sessions[session_id] = {
             'client_id': client_id,
             'created_at': time.time(),
+            'key_exchange': key_exchange,
             'aes_key': None,
-            'server_private_key': rsa.generate_private_key(
-                public_exponent=65537,
-                key_size=2048,
-                backend=default_backend()
-            ),
+            'crypto': None,
+            'server_private_key': server_private_key,
             'client_public_key': None
         }
         return session_id
     
+    def set_session_key(self, session: dict, aes_key: bytes) -> None:
+        """Store the negotiated AES key and its precomputed crypto context"""
+        session['aes_key'] = aes_key
+        session['crypto'] = SessionCryptoContext(aes_key)
+
+    def export_server_public_key(self, session: dict) -> str:
+        """Server public key for the handshake: PEM for RSA, base64 raw bytes for X25519"""
+        public_key = session['server_private_key'].public_key()
+        if session.get('key_exchange') == KEY_EXCHANGE_X25519:
+            return base64.b64encode(public_key.public_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PublicFormat.Raw
+            )).decode('utf-8')
+        return public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+
     def get_session(self, session_id: str) -> Optional[dict]:
         """Retrieve session and validate timeout"""
         session = self.sessions.get(session_id)
@@ -40,8 +121,72 @@ class SessionManager:
             
         return session
 
+    def issue_ticket(self, session: dict) -> Tuple[Optional[str], Optional[int]]:
+        """Seal the session's AES key into a resumption ticket. Returns (ticket, expires_at), or Nones if disabled"""
+        if not session_tickets_enabled():
+            return None, None
+        epoch = int(time.time()) // Config.SESSION_TICKET_ROTATION
+        expires_at = int(time.time()) + Config.SESSION_TICKET_TTL
+        header = _TICKET_HEADER.pack(TICKET_VERSION, epoch)
+        nonce = secrets.token_bytes(ENVELOPE_NONCE_SIZE)
+        sealed = _ticket_cipher(Config.SESSION_TICKET_SECRET, epoch).encrypt(
+            nonce, _TICKET_EXPIRY.pack(expires_at) + session['aes_key'], header
+        )
+        return base64.urlsafe_b64encode(header + nonce + sealed).decode('ascii'), expires_at
+
+    def resume_session(self, ticket: str) -> Optional[dict]:
+        """Rebuild a session from a ticket without any shared server-side state"""
+        if not session_tickets_enabled():
+            return None
+        session = self.resumed_sessions.get(ticket)
+        if session is not None:
+            if time.time() < session['expires_at']:
+                self.resumed_sessions.move_to_end(ticket)
+                return session
+            self.resumed_sessions.pop(ticket, None)
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(ticket)
+            version, epoch = _TICKET_HEADER.unpack_from(raw)
+            if version != TICKET_VERSION:
+                return None
+            # Keys older than the ticket lifetime can't have sealed a still-valid ticket
+            current_epoch = int(time.time()) // Config.SESSION_TICKET_ROTATION
+            max_age = -(-Config.SESSION_TICKET_TTL // Config.SESSION_TICKET_ROTATION)
+            if not 0 <= current_epoch - epoch <= max_age:
+                return None
+            nonce_end = _TICKET_HEADER.size + ENVELOPE_NONCE_SIZE
+            with crypto_timer('ticket_open'):
+                payload = _ticket_cipher(Config.SESSION_TICKET_SECRET, epoch).decrypt(
+                    raw[_TICKET_HEADER.size:nonce_end], raw[nonce_end:], raw[:_TICKET_HEADER.size]
+                )
+        except Exception:
+            return None
+        (expires_at,) = _TICKET_EXPIRY.unpack_from(payload)
+        if time.time() >= expires_at:
+            return None
+        session = {'client_id': None, 'created_at': time.time(), 'expires_at': expires_at, 'resumed': True}
+        self.set_session_key(session, payload[_TICKET_EXPIRY.size:])
+        self.resumed_sessions[ticket] = session
+        if len(self.resumed_sessions) > RESUMED_SESSION_CACHE_SIZE:
+            self.resumed_sessions.popitem(last=False)
+        return session
+
+    def resolve_session(self, headers) -> Optional[dict]:
+        """Session for a request: X-Session-ID if this worker knows it, else the resumption ticket"""
+        session_id = headers.get('X-Session-ID')
+        if session_id:
+            session = self.get_session(session_id)
+            if session:
+                return session
+        ticket = headers.get(TICKET_HEADER)
+        if ticket:
+            return self.resume_session(ticket)
+        return None
+
 class CryptoManager:
     @staticmethod
+    @crypto_timer('rsa_keygen')
     def generate_rsa_keypair() -> Tuple[rsa.RSAPrivateKey, rsa.RSAPublicKey]:
         """Generate RSA 2048 keypair"""
         private_key = rsa.generate_private_key(
@@ -53,6 +198,7 @@ class CryptoManager:
         return private_key, public_key
     
     @staticmethod
+    @crypto_timer('rsa_encrypt')
     def rsa_encrypt(public_key: rsa.RSAPublicKey, data: bytes) -> bytes:
         """Encrypt data with RSA public key"""
         return public_key.encrypt(
@@ -65,6 +211,7 @@ class CryptoManager:
         )
     
     @staticmethod
+    @crypto_timer('rsa_decrypt')
     def rsa_decrypt(private_key: rsa.RSAPrivateKey, encrypted_data: bytes) -> bytes:
         """Decrypt data with RSA private key"""
         return private_key.decrypt(
@@ -76,6 +223,18 @@ class CryptoManager:
             )
         )
     
+    @staticmethod
+    @crypto_timer('x25519_derive')
+    def derive_session_key(private_key: x25519.X25519PrivateKey, peer_public_key: bytes, session_id: str) -> bytes:
+        """X25519 shared secret -> 256-bit AES key via HKDF-SHA256, salted with the session id"""
+        shared_secret = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(peer_public_key))
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=session_id.encode('utf-8'),
+            info=HKDF_INFO
+        ).derive(shared_secret)
+
     @staticmethod
     def generate_aes_key() -> bytes:
         """Generate 256-bit AES key"""
@@ -84,42 +243,112 @@ class CryptoManager:
     @staticmethod
     def aes_encrypt(key: bytes, data: str) -> dict:
         """Encrypt data with AES-256-CBC"""
+        return SessionCryptoContext(key).aes_encrypt(data)
+    
+    @staticmethod
+    def aes_decrypt(key: bytes, encrypted_data: dict) -> bytes:
+        """Decrypt AES-256-CBC encrypted data"""
+        return SessionCryptoContext(key).aes_decrypt(encrypted_data)
+
+    @staticmethod
+    def seal_envelope(key: bytes, plaintext: bytes, flags: int = 0) -> bytes:
+        """Encrypt raw bytes into a v2 envelope (AES-256-GCM)"""
+        return SessionCryptoContext(key).seal_envelope(plaintext, flags)
+
+    @staticmethod
+    def open_envelope(key: bytes, envelope: bytes) -> Tuple[bytes, int]:
+        """Decrypt and authenticate a v2 envelope, returning (plaintext, flags)"""
+        return SessionCryptoContext(key).open_envelope(envelope)
+
+class SessionCryptoContext:
+    """AES key schedule for one session, built once at key exchange and reused per request"""
+    __slots__ = ('key', '_aes', '_gcm')
+
+    def __init__(self, key: bytes):
+        self.key = key
+        self._aes = algorithms.AES(key)
+        self._gcm = AESGCM(key)
+
+    def cbc_encryptor(self, iv: bytes):
+        return Cipher(self._aes, modes.CBC(iv)).encryptor()
+
+    def cbc_decryptor(self, iv: bytes):
+        return Cipher(self._aes, modes.CBC(iv)).decryptor()
+
+    @crypto_timer('aes_encrypt')
+    def aes_encrypt(self, data: str) -> dict:
+        """Encrypt data with AES-256-CBC (legacy envelope)"""
         iv = secrets.token_bytes(16)
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        encryptor = cipher.encryptor()
-        
-        # Pad data to 16-byte boundary
-        data_bytes = data.encode('utf-8')
-        pad_length = 16 - (len(data_bytes) % 16)
-        data_bytes += bytes([pad_length] * pad_length)
-        
-        encrypted = encryptor.update(data_bytes) + encryptor.finalize()
-        
+        padder = sym_padding.PKCS7(128).padder()
+        padded = padder.update(data.encode('utf-8')) + padder.finalize()
+        encryptor = self.cbc_encryptor(iv)
+        encrypted = encryptor.update(padded) + encryptor.finalize()
         return {
             'iv': base64.b64encode(iv).decode('utf-8'),
             'data': base64.b64encode(encrypted).decode('utf-8')
         }
-    
-    @staticmethod
-    def aes_decrypt(key: bytes, encrypted_data: dict) -> str:
-        """Decrypt AES-256-CBC encrypted data"""
+
+    @crypto_timer('aes_decrypt')
+    def aes_decrypt(self, encrypted_data: dict) -> bytes:
+        """Decrypt AES-256-CBC encrypted data (legacy envelope)"""
         iv = base64.b64decode(encrypted_data['iv'])
-        data = base64.b64decode(encrypted_data['data'])
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        
-        decrypted = decryptor.update(data) + decryptor.finalize()
-        
-        # Remove padding
-        pad_length = decrypted[-1]
-        decrypted = decrypted[:-pad_length]
-        
-        data_str = decrypted.decode('utf-8')
-        last_bracket_index = data_str.rfind('}')
-        clean_data = data_str[:last_bracket_index] + "}"
-        
-        return clean_data.encode('utf-8')
-    
+        decryptor = self.cbc_decryptor(iv)
+        decrypted = decryptor.update(base64.b64decode(encrypted_data['data'])) + decryptor.finalize()
+        unpadder = sym_padding.PKCS7(128).unpadder()
+        decrypted = unpadder.update(decrypted) + unpadder.finalize()
+        # The browser client pads before WebCrypto pads again; drop the inner layer too.
+        # JSON text never ends in a control byte, so this can't eat real data.
+        pad_length = decrypted[-1] if decrypted else 0
+        if 0 < pad_length <= 16 and decrypted[-pad_length:] == bytes([pad_length]) * pad_length:
+            decrypted = decrypted[:-pad_length]
+        return decrypted
+
+    @crypto_timer('envelope_seal')
+    def seal_envelope(self, plaintext: bytes, flags: int = 0) -> bytes:
+        """Encrypt raw bytes into a v2 envelope (AES-256-GCM)"""
+        header = bytes((ENVELOPE_V2, flags))
+        nonce = secrets.token_bytes(ENVELOPE_NONCE_SIZE)
+        return header + nonce + self._gcm.encrypt(nonce, plaintext, header)
+
+    @crypto_timer('envelope_open')
+    def open_envelope(self, envelope: bytes) -> Tuple[bytes, int]:
+        """Decrypt and authenticate a v2 envelope, returning (plaintext, flags)"""
+        if len(envelope) < ENVELOPE_HEADER_SIZE + ENVELOPE_NONCE_SIZE + 16:
+            raise ValueError('Envelope too short')
+        if envelope[0] != ENVELOPE_V2:
+            raise ValueError(f'Unsupported envelope version: {envelope[0]}')
+        header = envelope[:ENVELOPE_HEADER_SIZE]
+        nonce = envelope[ENVELOPE_HEADER_SIZE:ENVELOPE_HEADER_SIZE + ENVELOPE_NONCE_SIZE]
+        ciphertext = envelope[ENVELOPE_HEADER_SIZE + ENVELOPE_NONCE_SIZE:]
+        return self._gcm.decrypt(nonce, ciphertext, header), envelope[1]
+
+ENVELOPE_ENCODING_FLAGS = {'gzip': ENVELOPE_FLAG_GZIP, 'br': ENVELOPE_FLAG_BROTLI}
+
+def open_request_envelope(session_crypto: SessionCryptoContext, body: bytes, binary: bool, max_size: int) -> bytes:
+    """Plaintext of a v2 request body (base64 text unless sent as application/octet-stream)"""
+    if not binary:
+        body = base64.b64decode(body, validate=True)
+    plaintext, flags = session_crypto.open_envelope(body)
+    for encoding, flag in ENVELOPE_ENCODING_FLAGS.items():
+        if flags & flag:
+            plaintext = decompress(plaintext, encoding, max_size)
+    return plaintext
+
+def seal_response_envelope(session_crypto: SessionCryptoContext, body: bytes, encoding: Optional[str], config) -> bytes:
+    """v2 envelope of a response body; the plaintext is compressed first when `encoding` is set"""
+    flags = 0
+    if encoding:
+        body = compress(body, encoding, config)
+        flags = ENVELOPE_ENCODING_FLAGS[encoding]
+    return session_crypto.seal_envelope(body, flags)
+
+def legacy_response_payload(session_crypto: SessionCryptoContext, text: str) -> dict:
+    """Legacy envelope: the body text as a JSON string, AES-CBC encrypted, base64 of the iv/data JSON"""
+    encrypted_data = session_crypto.aes_encrypt(json_codec.dumps(text))
+    return {
+        'encrypted_data': base64.b64encode(json_codec.dumps_bytes(encrypted_data)).decode('utf-8'),
+        'status': 'encrypted'
+    }
 
 # Global instances
 session_manager = SessionManager()
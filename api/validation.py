@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 
@@ -6,9 +7,15 @@ from services.license_service import validate_license
 from services.rate_limiter import rate_limited, suspicious_activity_check, redis_client
 
 bp = Blueprint('validation', __name__)
+# High volume: sampled per LOG_SAMPLE_RATES, failures are logged at WARNING so they are always kept
+logger = logging.getLogger('license_server.validation')
+VALIDATION_RATE_LIMIT = '30 per minute'  # Also enforced by the ASGI route (asgi.py)
+
+def mask_license_key(license_key):
+    return f"***{str(license_key)[-4:]}" if license_key else None
 
 @bp.route('/', methods=['POST'])
-@rate_limited(limit='30 per minute')  # Limit validation requests
+@rate_limited(limit=VALIDATION_RATE_LIMIT)  # Limit validation requests
 def validate_license_route():
     """Validate license with safety checks."""
     try:
@@ -17,7 +24,6 @@ def validate_license_route():
         license_key = data['license_key']
         product_name = data['product_name']
         machine_code = data['machine_code']
-        print(license_key, product_name, machine_code)
         # Safe suspicious activity check
         if suspicious_activity_check(ip):
             return jsonify({
@@ -28,14 +34,17 @@ def validate_license_route():
     
         # Perform validation
         result = validate_license(product_name, license_key, machine_code)
-    
+        logger.log(
+            logging.INFO if result.get('valid') else logging.WARNING,
+            'License validation %s', 'succeeded' if result.get('valid') else 'failed',
+            extra={'product': product_name, 'license_key': mask_license_key(license_key),
+                   'valid': bool(result.get('valid')), 'reason': result.get('error')})
+
         return jsonify(result), 200 if result.get('valid') else 400
         
-    except Exception as e:
-        print(e)
+    except Exception:
         # Log error but don't expose details
-        if hasattr(bp, 'logger'):
-            bp.logger.error(f"Validation error for {product_name}/{license_key}: {e}")
+        logger.exception('Validation error')
        
         return jsonify({
             'valid': False,
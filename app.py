@@ -1,90 +1,108 @@
 import base64
 import datetime
-import json
-import socket
 from flask import Flask, redirect, request, jsonify, render_template, url_for
 from flask_jwt_extended import JWTManager, get_jwt_identity, verify_jwt_in_request
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 from flask import Request
+from werkzeug.exceptions import BadRequest
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import timedelta
 
 from config import Config
-from api import auth, licenses, products , validation, settings
-from models.database import init_db
-from services.rate_limiter import limiter
-from services.rate_limiter import redis_client
+from utils import json_codec
+from utils.json_provider import init_json_provider
+from utils.logger import init_logging
+from api import auth, licenses, products , validation, settings, diagnostics
+from models.migrations import ensure_schema
+from services.rate_limiter import init_limiter
 from services.rate_limiter import suspicious_activity_check
+from services.metrics import init_metrics
+from services.query_stats import init_query_stats
+from services.compression import init_compression, negotiate_encoding
+from services.health_service import health_prober, init_health
 
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
-from api.security import session_manager, crypto_manager
+from api.security import (
+    session_manager, crypto_manager, ENVELOPE_VERSION_HEADER, ENVELOPE_V2,
+    open_request_envelope, seal_response_envelope, legacy_response_payload,
+    KEY_EXCHANGE_HEADER, KEY_EXCHANGE_MODES, KEY_EXCHANGE_RSA, KEY_EXCHANGE_X25519,
+    session_tickets_enabled
+)
+
+_NOT_PARSED = object()
+_FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
 
 class UniversalJSONRequest(Request):
+    """Request whose body is parsed once, by content type, and cached.
+
+    JSON bodies are decoded directly; form posts carry their JSON in the
+    `json_data` field (HttpAntiDebug clients). Anything else has no JSON body.
+    """
+    _parsed_body = _NOT_PARSED
+
+    def parsed_body(self):
+        if self._parsed_body is _NOT_PARSED:
+            self._parsed_body = self._parse_body()
+        return self._parsed_body
+
+    def _parse_body(self):
+        mimetype = self.mimetype
+        if mimetype == 'application/json' or mimetype.endswith('+json'):
+            body = self.get_data(cache=True)
+            return json_codec.loads(body) if body else None
+        if mimetype in _FORM_MIMETYPES:
+            json_data = self.form.get('json_data')
+            return json_codec.loads(json_data) if json_data else None
+        return None
+
     def get_json(self, force=False, silent=False, cache=True):
         """
         Override get_json to handle ANY content type
         """
-        # First try parent method (standard JSON parsing)
         try:
-            result = super().get_json(force=force, silent=silent, cache=cache)
-            if result is not None:
-                return result
-        except:
-            pass
-        
-        # Try alternative parsing methods
-        parsers = [
-            self._parse_form_as_json
-        ]
-        
-        for parser in parsers:
-            try:
-                result = parser()
-                if result is not None:
-                    return result
-            except:
-                continue
-        
-        # If nothing worked and not silent, raise error
-        if not silent:
-            raise ValueError("Could not parse JSON from request")
-        return None
-        
-    def _parse_form_as_json(self):
-        """Parse form data as JSON"""
-        if not self.form:
-            return None
-        result = {}
-        for key, value in self.form.items():
-            if isinstance(value, list) and len(value) == 1:
-                result[key] = value[0]
-            else:
-                result[key] = value
-        
-        # Parse JSON strings in form fields
-        for key in list(result.keys()):
-            if isinstance(result[key], str):
-                stripped = result[key].strip()
-                if (stripped.startswith('{') and stripped.endswith('}')) or \
-                   (stripped.startswith('[') and stripped.endswith(']')):
-                    try:
-                        result[key] = json.loads(result[key])
-                    except json.JSONDecodeError:
-                        pass
-        return result["json_data"] if result["json_data"] else None
+            result = self.parsed_body()
+        except ValueError:
+            self._parsed_body = None
+            result = None
+        if result is None and not silent:
+            raise BadRequest("Could not parse JSON from request")
+        return result
     
+# Shared with the ASGI validation route (asgi.py)
+CORS_ORIGINS = ["http://localhost:3000", "https://richtoolsquantri.online"]  # Add your domains
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "X-Client-ID", "X-Session-ID",
+                      "X-Session-Ticket", "X-Encryption-Version", "X-Key-Exchange"]
+CORS_EXPOSE_HEADERS = ["X-Encryption-Version"]
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE"]
+
 def create_app():
     app = Flask(__name__)
     app.request_class = UniversalJSONRequest
+    init_json_provider(app)
 
     app.config.from_object(Config)
+    if app.config['PROXY_COUNT']:
+        # Client address from X-Forwarded-For, for rate limits, the spam gate and logs
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'])
 
     # Apply timeout configurations for stability
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(seconds=app.config.get('PERMANENT_SESSION_LIFETIME', 1800))
     app.config['SEND_FILE_MAX_AGE_DEFAULT'] = timedelta(seconds=app.config.get('SEND_FILE_MAX_AGE_DEFAULT', 300))
 
-    limiter.init_app(app)
+    init_limiter(app)
+
+    # Registered first so request timing wraps decryption/encryption hooks,
+    # and the access log (last after_request to run) sees the final status
+    init_logging(app)
+    if not session_tickets_enabled():
+        app.logger.warning('SESSION_TICKET_SECRET is unset or a published default; session tickets are disabled')
+    init_metrics(app)
+    init_query_stats(app)
+    init_health(app)
+    # Before the encryption hook, so it runs after it and sees the final body
+    init_compression(app)
 
     # Register error handlers first
     @app.errorhandler(404)
@@ -107,90 +125,39 @@ def create_app():
     
     CORS(app, 
      supports_credentials=True,
-     origins=["http://localhost:3000", "https://richtoolsquantri.online"],  # Add your domains
-     allow_headers=["Content-Type", "Authorization", "X-Client-ID", "X-Session-ID"],
-     methods=["GET", "POST", "PUT", "DELETE"])
+     origins=CORS_ORIGINS,
+     allow_headers=CORS_ALLOW_HEADERS,
+     expose_headers=CORS_EXPOSE_HEADERS,
+     methods=CORS_METHODS)
 
-    # Initialize database
+    # Schema changes run once at deploy (python -m models.migrations);
+    # workers only check the recorded schema version here
     with app.app_context():
-        init_db()
+        ensure_schema(app)
 
     # Health check endpoint
     @app.route('/health')
     def health():
-        try:
-            # Test database
-            with app.app_context():
-                from models.database import get_db_connection
-                with get_db_connection() as conn:
-                    conn.execute("SELECT 1")
-
-            # Test Redis (if available)
-            redis_status = "connected" if redis_client and redis_client.ping() else "unavailable"
-
-            return {
-                'status': 'healthy',
-                'timestamp': app.config.get('TESTING', False) and "test" or str(datetime.datetime.utcnow()),
-                'database': 'connected',
-                'redis': redis_status,
-                'version': '1.2.0'
-            }
-        except Exception as e:
-            app.logger.error(f"Health check failed: {e}")
-            return {'status': 'unhealthy', 'error': str(e)}, 503
+        """Liveness/readiness from the background prober's cached snapshot"""
+        snapshot = health_prober.snapshot()
+        components = snapshot['components']
+        body = {
+            'status': 'healthy' if snapshot['status'] != 'unhealthy' else 'unhealthy',
+            'timestamp': app.config.get('TESTING', False) and "test" or str(datetime.datetime.utcnow()),
+            'database': 'connected' if components['database']['status'] == 'ok' else 'error',
+            'redis': 'connected' if components.get('redis', {}).get('detail') == 'connected' else 'unavailable',
+            'age_seconds': snapshot['age_seconds'],
+            'version': '1.2.0'
+        }
+        return body, 200 if body['status'] == 'healthy' else 503
 
     # Enhanced health check with connection diagnostics
     @app.route('/health/detailed')
     def detailed_health():
-        """Detailed health check with connection diagnostics"""
-        health_status = {
-            'status': 'healthy',
-            'timestamp': str(datetime.datetime.utcnow()),
-            'checks': {},
-            'version': '1.2.0'
-        }
-
-        # Test database connectivity
-        try:
-            from models.database import get_db_connection
-            with get_db_connection() as conn:
-                conn.execute("SELECT 1")
-            health_status['checks']['database'] = 'connected'
-        except Exception as e:
-            health_status['checks']['database'] = f'error: {str(e)}'
-            health_status['status'] = 'degraded'
-
-        # Test Redis connectivity
-        try:
-            if redis_client and redis_client.ping():
-                health_status['checks']['redis'] = 'connected'
-            else:
-                health_status['checks']['redis'] = 'unavailable'
-        except Exception as e:
-            health_status['checks']['redis'] = f'error: {str(e)}'
-            health_status['status'] = 'degraded'
-
-        # Test internet connectivity
-        try:
-            socket.create_connection(("8.8.8.8", 53), timeout=5)
-            health_status['checks']['internet'] = 'connected'
-        except Exception as e:
-            health_status['checks']['internet'] = f'error: {str(e)}'
-            health_status['status'] = 'degraded'
-
-        # Test session manager
-        try:
-            session_count = len(session_manager.sessions) if hasattr(session_manager, 'sessions') else 0
-            health_status['checks']['session_manager'] = f'active_sessions: {session_count}'
-        except Exception as e:
-            health_status['checks']['session_manager'] = f'error: {str(e)}'
-            health_status['status'] = 'degraded'
-
-        # Overall status determination
-        if any('error' in str(status) for status in health_status['checks'].values()):
-            health_status['status'] = 'unhealthy'
-
-        return jsonify(health_status), 200 if health_status['status'] == 'healthy' else 503
+        """Per-component status, latency and last error, plus pool and session gauges"""
+        snapshot = health_prober.snapshot()
+        health_status = dict(snapshot, timestamp=str(datetime.datetime.utcnow()), version='1.2.0')
+        return jsonify(health_status), 200 if snapshot['status'] == 'healthy' else 503
     
     # Register blueprints 
     # All routes
@@ -199,6 +166,7 @@ def create_app():
     app.register_blueprint(products.bp, url_prefix='/api/products')
     app.register_blueprint(validation.bp, url_prefix='/api/validate')
     app.register_blueprint(settings.bp, url_prefix='/api/settings')
+    app.register_blueprint(diagnostics.bp, url_prefix='/api/diagnostics')
     
     # Simple routes
     @app.route('/')
@@ -241,26 +209,44 @@ def create_app():
     def initialize_session():
         """Initialize new session and start key exchange"""
         client_id = request.headers.get('X-Client-ID', 'unknown')
-        session_id = session_manager.create_session(client_id)
+        key_exchange = request.headers.get(KEY_EXCHANGE_HEADER, KEY_EXCHANGE_RSA).lower()
+        if key_exchange not in KEY_EXCHANGE_MODES:
+            return jsonify({'error': f'Unsupported key exchange: {key_exchange}'}), 400
+        session_id = session_manager.create_session(client_id, key_exchange)
         session_data = session_manager.get_session(session_id)
         
-        # Get server public key for key exchange
-        server_public_key = session_data['server_private_key'].public_key()
-        server_public_pem = server_public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        
         return jsonify({
             'ok': True,
             'session_id': session_id,
-            'server_public_key': server_public_pem.decode('utf-8'),
+            'server_public_key': session_manager.export_server_public_key(session_data),
+            'key_exchange': key_exchange,
             'status': 'session_created'
         })
     
     # all the responses is send through this endpoint
     # all the responses are encrypted in this function
     # so if you want change encryption method, you have to review this method
+    def wants_envelope_v2():
+        return request.headers.get(ENVELOPE_VERSION_HEADER) == str(ENVELOPE_V2)
+
+    def seal_response_v2(response, session_crypto):
+        """Encrypt the serialized body once; binary if the client accepts it, else one base64 pass"""
+        body = response.get_data()
+        encoding = None
+        if app.config['COMPRESSION_ENABLED'] and len(body) >= app.config['COMPRESSION_MIN_BYTES']:
+            # Compress the plaintext; the envelope flag tells the client to inflate after decrypting
+            encoding = negotiate_encoding(request.accept_encodings)
+        envelope = seal_response_envelope(session_crypto, body, encoding, app.config)
+        if request.accept_mimetypes.best == 'application/octet-stream':
+            response.set_data(envelope)
+            response.mimetype = 'application/octet-stream'
+        else:
+            response.set_data(base64.b64encode(envelope))
+            response.mimetype = 'text/plain'
+        response.headers[ENVELOPE_VERSION_HEADER] = str(ENVELOPE_V2)
+        response.vary.add(ENVELOPE_VERSION_HEADER)
+        return response
+
     @app.after_request
     def encrypt_response(response):
         """Encrypt JSON responses if session and AES key are established"""
@@ -268,30 +254,35 @@ def create_app():
             return response
         if (response.content_type == 'application/json' or not request.endpoint in ['/', '/api/auth/login', '/api/auth/register', 'auth.login', 'auth.register']) and response.status_code == 200:
             try:                
-                session_id = request.headers.get('X-Session-ID')                
-                if session_id:
-                    current_session = session_manager.get_session(session_id)
-                    if current_session and 'aes_key' in current_session:
-                        # Encrypt response data
-                        original_data = response.get_data(as_text=True)
-                        encrypted_data = crypto_manager.aes_encrypt(
-                            current_session['aes_key'],
-                            json.dumps(original_data)
-                        )
-                        # Encode to base64 to make it JSON serializable
-                        b64_encrypted = base64.b64encode(json.dumps(encrypted_data).encode('utf-8')).decode('utf-8')
-                        
-                        # Replace response data with encrypted data
-                        return jsonify({
-                            'encrypted_data': b64_encrypted,  # Wrap in an object
-                            'status': 'encrypted'
-                        })
+                current_session = session_manager.resolve_session(request.headers)
+                session_crypto = current_session.get('crypto') if current_session else None
+                if session_crypto:
+                    if wants_envelope_v2():
+                        return seal_response_v2(response, session_crypto)
+                    # Replace response data with encrypted data
+                    wrapped = jsonify(legacy_response_payload(session_crypto, response.get_data(as_text=True)))
+                    # Keep conditional GET validators set by the view
+                    for header in ('ETag', 'Cache-Control'):
+                        if header in response.headers:
+                            wrapped.headers[header] = response.headers[header]
+                    return wrapped
             except Exception as e:
                 app.logger.error(f"Response encryption failed: {e}")
                 # In case of error, return original response unmodified
                 pass
         return response
     
+    @app.before_request
+    def reject_oversized_body():
+        """Refuse large non-upload bodies before reading or decrypting them"""
+        if request.mimetype == 'multipart/form-data':
+            return  # File uploads are bounded by MAX_CONTENT_LENGTH instead
+        limit = app.config['MAX_JSON_BODY_BYTES']
+        if request.content_length is not None and request.content_length > limit:
+            return jsonify({'error': 'Request body too large'}), 413
+        # Also caps chunked bodies that don't declare a length
+        request.max_content_length = limit
+
     # all the requests are sent to the endpoints through this endpoint
     # all the requests are decrypted in this function, and then sent to the all endpoints
     @app.before_request
@@ -299,25 +290,37 @@ def create_app():
         """Decrypt incoming JSON requests if session and AES key are established"""
         if request.endpoint in ['/', '/api/auth/login', '/api/auth/register', 'auth.login', 'auth.register']:
             return  # Skip decryption for these endpoints
+        if request.method in ['POST'] and wants_envelope_v2():
+            try:
+                current_session = session_manager.resolve_session(request.headers)
+                session_crypto = current_session.get('crypto') if current_session else None
+                if session_crypto:
+                    body = request.get_data()
+                    if not body:
+                        return
+                    plaintext = open_request_envelope(
+                        session_crypto, body, request.mimetype == 'application/octet-stream',
+                        app.config['MAX_JSON_BODY_BYTES'])
+                    request.data = json_codec.loads(plaintext)
+                    return
+            except Exception as e:
+                app.logger.error(f"Request decryption failed: {e}")
+                return jsonify({'error': 'Invalid encrypted data'}), 400
         if request.method in ['POST'] and ( request.is_json or request.form ):
             try:
-                session_id = request.headers.get('X-Session-ID')
-                if session_id:
-                    current_session = session_manager.get_session(session_id)
-                    if current_session and 'aes_key' in current_session:
-                        encrypted_payload = request.get_json()
-                        if 'encryptedRequest' in encrypted_payload:
-                            encrypted_data = encrypted_payload['encryptedRequest']
-                            input_data = encrypted_data
-                            if type(encrypted_data) == str:
-                                input_data = json.loads(encrypted_data)
-                            # Decrypt the data
-                            decrypted_json = crypto_manager.aes_decrypt(
-                                current_session['aes_key'],
-                                input_data
-                            )
-                            # Replace request.data with decrypted data
-                            request.data = json.loads(decrypted_json)
+                current_session = session_manager.resolve_session(request.headers)
+                session_crypto = current_session.get('crypto') if current_session else None
+                if session_crypto:
+                    encrypted_payload = request.get_json()
+                    if 'encryptedRequest' in encrypted_payload:
+                        encrypted_data = encrypted_payload['encryptedRequest']
+                        input_data = encrypted_data
+                        if type(encrypted_data) == str:
+                            input_data = json_codec.loads(encrypted_data)
+                        # Decrypt the data
+                        decrypted_json = session_crypto.aes_decrypt(input_data)
+                        # Replace request.data with decrypted data
+                        request.data = json_codec.loads(decrypted_json)
             except Exception as e:
                 app.logger.error(f"Request decryption failed: {e}")
                 return jsonify({'error': 'Invalid encrypted data'}), 400
@@ -326,22 +329,46 @@ def create_app():
     def get_session_info(sessionId):
         session_id = sessionId
         session_data = session_manager.get_session(session_id)
-        
-        # Get server public key for key exchange
-        server_public_key = session_data['server_private_key'].public_key()
-        server_public_pem = server_public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
+        if not session_data or session_data.get('server_private_key') is None:
+            return jsonify({'error': 'Invalid session'}), 404
         
         return jsonify({
             'session_id': session_id,
-            'server_public_key': server_public_pem.decode('utf-8'),
+            'server_public_key': session_manager.export_server_public_key(session_data),
+            'key_exchange': session_data.get('key_exchange', KEY_EXCHANGE_RSA),
             'status': 'get_session'
         })
 
 
 
+    def x25519_key_exchange(session_id, current_session, client_public_key):
+        """Derive the session key from the client's raw X25519 public key (base64)"""
+        if not client_public_key:
+            return jsonify({'error': 'Missing required parameters'}), 400
+        if current_session.get('server_private_key') is None:
+            return jsonify({'error': 'Key exchange already completed'}), 409
+        try:
+            aes_key = crypto_manager.derive_session_key(
+                current_session['server_private_key'],
+                base64.b64decode(client_public_key),
+                session_id
+            )
+        except Exception as e:
+            return jsonify({'error': f'Key exchange failed: {str(e)}'}), 400
+        session_manager.set_session_key(current_session, aes_key)
+        # Ephemeral key is single-use; dropping it keeps past session keys unrecoverable
+        current_session['server_private_key'] = None
+        return key_exchange_complete(current_session)
+
+    def key_exchange_complete(current_session):
+        """Hand out a resumption ticket so reconnecting clients can skip the handshake"""
+        ticket, ticket_expires_at = session_manager.issue_ticket(current_session)
+        return jsonify({
+            'status': 'key_exchange_complete',
+            'session_ticket': ticket,
+            'ticket_expires_at': ticket_expires_at
+        })
+
     @app.route('/key-exchange', methods=['POST'])
     def key_exchange():
         """Complete key exchange with client"""
@@ -350,10 +377,13 @@ def create_app():
         encrypted_aes_key = data.get('encrypted_aes_key')
         client_public_key_pem = data.get('client_public_key')
         
+        current_session = session_manager.get_session(session_id) if session_id else None
+        if current_session and current_session.get('key_exchange') == KEY_EXCHANGE_X25519:
+            return x25519_key_exchange(session_id, current_session, client_public_key_pem)
+
         if not all([session_id, encrypted_aes_key, client_public_key_pem]):
             return jsonify({'error': 'Missing required parameters'}), 400
         
-        current_session = session_manager.get_session(session_id)
         if not current_session:
             return jsonify({'error': 'Invalid session'}), 401
         
@@ -372,12 +402,12 @@ def create_app():
             )
             
             # Store keys in session
-            current_session['aes_key'] = aes_key
+            session_manager.set_session_key(current_session, aes_key)
             current_session['client_public_key'] = client_public_key
 
             # log current_session
             
-            return jsonify({'status': 'key_exchange_complete'})
+            return key_exchange_complete(current_session)
             
         except Exception as e:
             return jsonify({'error': f'Key exchange failed: {str(e)}'}), 400
@@ -393,7 +423,9 @@ def create_app():
     
     # Check ip suspicious activity
     @app.before_request
-    def check_suspicious_activity():        
+    def check_suspicious_activity():
+        if request.endpoint == 'validation.validate_license_route':
+            return  # Checked (and counted) once by the route, which answers in the validation format
         ip = get_remote_address()
         if suspicious_activity_check(ip):
             return jsonify({
@@ -411,8 +443,8 @@ def create_app():
             verify_jwt_in_request(optional=True)
             user = get_jwt_identity()
             # get user info from db by username
-            from models.database import get_db_connection
-            with get_db_connection() as conn:
+            from models.database import get_read_connection
+            with get_read_connection() as conn:
                 c = conn.cursor()
                 c.execute('SELECT username, first_name, last_name, role FROM users WHERE username = ?', (user,))
                 row = c.fetchone()
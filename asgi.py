@@ -0,0 +1,235 @@
+"""ASGI entry point: /api/validate served on the event loop, everything else by the Flask app.
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+(Prefer this to `uvicorn --workers N`: its workers get the listening socket
+without TCP_NODELAY, which adds ~40 ms of delayed-ACK wait to each response.)
+
+The validation route keeps the Flask route's contract (rate limit, optional
+suspicious activity check, PROXY_COUNT client addresses, v1/v2 encryption,
+status codes and bodies) but awaits its
+SQLite and Redis calls, so one process holds thousands of validations in
+flight instead of one per gunicorn thread. Sessions resumed with an
+X-Session-Ticket work on either stack, since tickets need no server state.
+
+Other paths go to the WSGI app through a2wsgi's thread pool when a2wsgi is
+installed; without it this app serves validation only and a reverse proxy
+must route the rest to gunicorn. The async route reads SQLite through
+aiosqlite; with a PostgreSQL DATABASE_URL validation is left to the Flask app.
+"""
+import base64
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from limits import parse
+from limits.aio.storage import MemoryStorage
+from limits.aio.strategies import FixedWindowRateLimiter
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route, request_response
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from api.security import (
+    ENVELOPE_V2, ENVELOPE_VERSION_HEADER, legacy_response_payload, open_request_envelope,
+    seal_response_envelope, session_manager
+)
+from api.validation import VALIDATION_RATE_LIMIT, mask_license_key
+from app import CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS, CORS_METHODS, CORS_ORIGINS
+from app import app as flask_app
+from models.async_database import AsyncDatabase
+from models.database import is_postgres
+from services.async_validation import AsyncLicenseValidator, connect_redis, suspicious_activity_check
+from services.rate_limiter import client_address, suspicious_activity_enabled
+from services.metrics import REQUEST_LATENCY
+from utils import json_codec
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Validation-only deployment behind a proxy
+    WSGIMiddleware = None
+
+logger = logging.getLogger('license_server.validation')
+access_logger = logging.getLogger('license_server.access')
+config = flask_app.config
+
+_FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+_rate_limit = parse(VALIDATION_RATE_LIMIT)
+
+class ValidationService:
+    """Per-process state of the async route: DB pool, Redis client, rate limiter."""
+    def __init__(self):
+        self.db = AsyncDatabase()
+        self.validator = AsyncLicenseValidator(self.db)
+        self.redis = None
+        self.limiter = FixedWindowRateLimiter(MemoryStorage())
+
+    async def start(self):
+        await self.db.open()
+        if suspicious_activity_enabled(config):  # Redis is only used by the spam gate here
+            self.redis = await connect_redis(config['REDIS_URL'])
+
+    async def stop(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+        await self.db.close()
+
+service = ValidationService()
+
+def json_response(body, status_code=200, headers=None):
+    return Response(json_codec.dumps_bytes(body), status_code, headers, media_type='application/json')
+
+async def parse_json_body(request, body):
+    """Same rules as UniversalJSONRequest: JSON bodies, or JSON in a form's json_data field."""
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if mimetype == 'application/json' or mimetype.endswith('+json'):
+        return json_codec.loads(body) if body else None
+    if mimetype in _FORM_MIMETYPES:
+        json_data = (await request.form()).get('json_data')
+        return json_codec.loads(json_data) if json_data else None
+    return None
+
+async def read_request(request, session_crypto, wants_v2):
+    """Decrypted request payload (plain JSON when no session is established)."""
+    body = await request.body()
+    if len(body) > config['MAX_JSON_BODY_BYTES']:
+        raise ValueError('Request body too large')
+    if session_crypto and wants_v2 and body:
+        mimetype = request.headers.get('content-type', '').split(';')[0].strip()
+        plaintext = open_request_envelope(session_crypto, body, mimetype == 'application/octet-stream',
+                                          config['MAX_JSON_BODY_BYTES'])
+        return json_codec.loads(plaintext)
+    payload = await parse_json_body(request, body)
+    if session_crypto and isinstance(payload, dict) and 'encryptedRequest' in payload:
+        encrypted_data = payload['encryptedRequest']
+        if isinstance(encrypted_data, str):
+            encrypted_data = json_codec.loads(encrypted_data)
+        return json_codec.loads(session_crypto.aes_decrypt(encrypted_data))
+    return payload
+
+def encrypted_response(request, result, session_crypto, wants_v2):
+    """200 response sealed like the Flask app's encrypt_response hook."""
+    body = json_codec.dumps_bytes(result)
+    if session_crypto is None:
+        return json_response(result)
+    if wants_v2:
+        # Validation results are far below COMPRESSION_MIN_BYTES, so they are never compressed
+        envelope = seal_response_envelope(session_crypto, body, None, config)
+        headers = {ENVELOPE_VERSION_HEADER: str(ENVELOPE_V2), 'Vary': ENVELOPE_VERSION_HEADER}
+        if parse_accept_header(request.headers.get('accept'), MIMEAccept).best == 'application/octet-stream':
+            return Response(envelope, 200, headers, media_type='application/octet-stream')
+        return Response(base64.b64encode(envelope), 200, headers, media_type='text/plain')
+    return json_response(legacy_response_payload(session_crypto, body.decode('utf-8')))
+
+def client_ip(request):
+    """The Flask app's remote_addr: the peer, or the X-Forwarded-For hop when PROXY_COUNT is set."""
+    return client_address(request.client.host if request.client else None,
+                          request.headers.get('x-forwarded-for'), config['PROXY_COUNT'])
+
+async def handle_validation(request, request_id):
+    ip = client_ip(request)
+    if config.get('RATELIMIT_ENABLED', True) and not await service.limiter.hit(_rate_limit, 'validation', ip):
+        reset_at, _ = await service.limiter.get_window_stats(_rate_limit, 'validation', ip)
+        return json_response({'error': 'Rate limit exceeded',
+                              'retry_after': max(1, int(reset_at - time.time()))}, 429)
+    if suspicious_activity_enabled(config) and await suspicious_activity_check(service.redis, ip):
+        return json_response({'error': 'Too many requests from this IP. Please try again later.',
+                              'retry_after': 3600}, 429)
+
+    current_session = session_manager.resolve_session(request.headers)
+    session_crypto = current_session.get('crypto') if current_session else None
+    wants_v2 = request.headers.get(ENVELOPE_VERSION_HEADER) == str(ENVELOPE_V2)
+    try:
+        data = await read_request(request, session_crypto, wants_v2)
+    except Exception as e:
+        logger.error(f"Request decryption failed: {e}", extra={'request_id': request_id})
+        return json_response({'error': 'Invalid encrypted data'}, 400)
+
+    try:
+        license_key = data['license_key']
+        product_name = data['product_name']
+        machine_code = data['machine_code']
+        result = await service.validator.validate(product_name, license_key, machine_code)
+        logger.log(
+            logging.INFO if result.get('valid') else logging.WARNING,
+            'License validation %s', 'succeeded' if result.get('valid') else 'failed',
+            extra={'product': product_name, 'license_key': mask_license_key(license_key),
+                   'valid': bool(result.get('valid')), 'reason': result.get('error'),
+                   'request_id': request_id})
+    except Exception:
+        # Log error but don't expose details
+        logger.exception('Validation error', extra={'request_id': request_id})
+        return json_response({
+            'valid': False,
+            'error': 'Validation service temporarily unavailable',
+            'error_code': 'SERVICE_UNAVAILABLE'
+        }, 503)
+
+    if not result.get('valid'):
+        return json_response(result, 400)
+    try:
+        return encrypted_response(request, result, session_crypto, wants_v2)
+    except Exception as e:
+        logger.error(f"Response encryption failed: {e}", extra={'request_id': request_id})
+        return json_response(result)
+
+async def validate_license_endpoint(request: Request):
+    """POST /api/validate/ with the access log, request id and latency metric of the Flask app."""
+    start = time.perf_counter()
+    request_id = request.headers.get('x-request-id') or uuid.uuid4().hex
+    response = await handle_validation(request, request_id)
+    response.headers['X-Request-ID'] = request_id
+    elapsed = time.perf_counter() - start
+    REQUEST_LATENCY.observe(('validation.validate_license_route', 'POST', str(response.status_code)), elapsed)
+    if config.get('LOG_ACCESS', True):
+        access_logger.log(
+            logging.WARNING if response.status_code >= 500 else logging.INFO,
+            '%s %s %s', request.method, request.url.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.url.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+                'remote_addr': client_ip(request),
+                'request_id': request_id
+            })
+    return response
+
+def with_cors(endpoint):
+    """Same CORS policy as flask_cors applies to the WSGI app."""
+    return CORSMiddleware(request_response(endpoint),
+                          allow_origins=CORS_ORIGINS, allow_credentials=True,
+                          allow_headers=CORS_ALLOW_HEADERS, expose_headers=CORS_EXPOSE_HEADERS,
+                          allow_methods=CORS_METHODS)
+
+@asynccontextmanager
+async def lifespan(app):
+    if not app.state.async_validation:
+        yield
+        return
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.stop()
+
+def create_asgi_app():
+    routes = []
+    async_validation = not is_postgres()
+    if async_validation:
+        validate = with_cors(validate_license_endpoint)
+        routes += [
+            Route('/api/validate/', validate, methods=['POST', 'OPTIONS'], name='validate_license'),
+            Route('/api/validate', validate, methods=['POST', 'OPTIONS'], name='validate_license_no_slash')
+        ]
+    if WSGIMiddleware is not None:
+        routes.append(Mount('/', app=WSGIMiddleware(flask_app, workers=config['ASGI_WSGI_THREADS'])))
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.async_validation = async_validation
+    return app
+
+app = create_asgi_app()
@@ -21,12 +21,21 @@ class Config:
 
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379'
     RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL') or "redis://localhost:6379/0"
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'  # false for load tests only
+    # Per-IP spam gate in Redis (429 for an hour past RECENT_REQUESTS_LIMIT); also off when RATELIMIT_ENABLED is
+    SUSPICIOUS_ACTIVITY_CHECK = os.environ.get('SUSPICIOUS_ACTIVITY_CHECK', 'false').lower() == 'true'
+    # Reverse proxies in front of the app that append to X-Forwarded-For (1 behind the bundled nginx)
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
     RECAPTCHA_SITE_KEY = os.environ.get('RECAPTCHA_SITE_KEY')
     RECAPTCHA_SECRET_KEY = os.environ.get('RECAPTCHA_SECRET_KEY')
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'adminpass')
     DEBUG = os.environ.get('FLASK_ENV') == 'development'
+    # Apply pending migrations on worker start (development only by default)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', str(DEBUG)).lower() == 'true'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    # JSON, form and encrypted bodies; only multipart uploads may use the full MAX_CONTENT_LENGTH
+    MAX_JSON_BODY_BYTES = int(os.environ.get('MAX_JSON_BODY_BYTES', 1024 * 1024))
     JWT_TOKEN_LOCATION = ['cookies']
     JWT_ACCESS_COOKIE_NAME = 'access_token_cookie'
     JWT_COOKIE_CSRF_PROTECT = False  # For testing; enable for production
@@ -34,6 +43,62 @@ class Config:
     RECAPTCHA_SITE_KEY = "hobit-321"
     RECAPTCHA_SECRET_KEY = "hobit-321"
 
+    # Datetimes in JSON responses: 'http' (RFC 822, Flask's default format) or 'iso' (ISO 8601, faster)
+    JSON_DATETIME_FORMAT = os.environ.get('JSON_DATETIME_FORMAT', 'http')
+
+    # Response compression (JSON/text above the threshold; brotli if installed, else gzip)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 5))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    # ETags on listing/stats endpoints also roll over on this clock, for time-based fields
+    ETAG_TIME_BUCKET_SECONDS = int(os.environ.get('ETAG_TIME_BUCKET_SECONDS', 60))
+
+    # Background health prober behind /health and /health/detailed
+    HEALTH_CHECK_INTERVAL = int(os.environ.get('HEALTH_CHECK_INTERVAL', 10))
+    HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2))
+    HEALTH_INTERNET_CHECK = os.environ.get('HEALTH_INTERNET_CHECK', '8.8.8.8:53')  # host:port, empty disables
+
+    # Session resumption tickets (sealed with keys derived from this secret per rotation epoch);
+    # no tickets are issued or accepted until it is set
+    SESSION_TICKET_SECRET = os.environ.get('SESSION_TICKET_SECRET')
+    SESSION_TICKET_TTL = int(os.environ.get('SESSION_TICKET_TTL', 86400))
+    SESSION_TICKET_ROTATION = int(os.environ.get('SESSION_TICKET_ROTATION', 3600))
+
+    # Native threads running SQLite calls and password hashing on gevent workers (0 = inline)
+    DB_THREADPOOL_SIZE = int(os.environ.get('DB_THREADPOOL_SIZE', 10))
+    # SQLite read-only connections (listings, search, stats, exports); writes share one connection per worker
+    DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 8))  # Idle readers kept open
+    DB_READ_CACHE_KB = int(os.environ.get('DB_READ_CACHE_KB', 16384))  # Page cache per reader
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes memory-mapped per reader
+    # Pragma set for every SQLite connection: durable, balanced or fast (see models/database.py)
+    SQLITE_PRAGMA_PROFILE = os.environ.get('SQLITE_PRAGMA_PROFILE', 'balanced')
+    SQLITE_PRAGMAS = os.environ.get('SQLITE_PRAGMAS', '')  # Overrides, e.g. "synchronous=FULL,mmap_size=0"
+    SQLITE_CHECKPOINT_INTERVAL = float(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', 5))  # Seconds; with wal_autocheckpoint=0
+    # Group commit of license mutations (models/write_queue.py)
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', 'true').lower() == 'true'
+    WRITE_BATCH_WINDOW_MS = float(os.environ.get('WRITE_BATCH_WINDOW_MS', 0))  # Extra wait for more writes (0: commit what is queued)
+    WRITE_BATCH_MAX = int(os.environ.get('WRITE_BATCH_MAX', 256))  # Writes per transaction
+    BULK_MAX_KEYS = int(os.environ.get('BULK_MAX_KEYS', 10000))  # License keys per bulk revoke/delete/extend
+    BULK_MAX_EXTEND_HOURS = int(os.environ.get('BULK_MAX_EXTEND_HOURS', 87600))  # 10 years per bulk extend
+    # License import (services/license_import.py)
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))  # Rows per transaction
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))  # Row errors listed in the summary
+
+    # Seconds before the in-memory product name/id map is reloaded
+    PRODUCT_CACHE_TTL = int(os.environ.get('PRODUCT_CACHE_TTL', 60))
+
+    # ASGI validation service (asgi.py): aiosqlite connections, threads for the mounted Flask app
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 8))
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+    # Usage log retention (services/usage_log_service.py, run from cron)
+    USAGE_LOG_RETENTION_DAYS = int(os.environ.get('USAGE_LOG_RETENTION_DAYS', 30))  # Raw rows kept in the DB
+    USAGE_ROLLUP_HOURLY_RETENTION_DAYS = int(os.environ.get('USAGE_ROLLUP_HOURLY_RETENTION_DAYS', 90))
+    USAGE_LOG_ARCHIVE_DIR = os.environ.get('USAGE_LOG_ARCHIVE_DIR', 'data/archive')
+    USAGE_LOG_BATCH_SIZE = int(os.environ.get('USAGE_LOG_BATCH_SIZE', 5000))
+    USAGE_LOG_VACUUM_PAGES = int(os.environ.get('USAGE_LOG_VACUUM_PAGES', 2000))
+
     # Server timeout configurations for stability
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutes in seconds
     SEND_FILE_MAX_AGE_DEFAULT = 300  # 5 minutes cache
@@ -41,4 +106,24 @@ class Config:
     # Connection pooling settings
     REQUEST_TIMEOUT = 30  # Default request timeout in seconds
     CONNECTION_POOL_SIZE = 100
-    MAX_KEEPALIVE_CONNECTIONS = 20
\ No newline at end of file
+    MAX_KEEPALIVE_CONNECTIONS = 20
+
+    # Metrics and profiling
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for /metrics; unset = localhost only
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))  # 0 disables profiling
+    PROFILE_SLOW_REQUEST_MS = int(os.environ.get('PROFILE_SLOW_REQUEST_MS', 500))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'logs/profiles')
+    PROFILER = os.environ.get('PROFILER', 'cprofile')  # 'cprofile' or 'pyinstrument'
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))  # Log statements slower than this with their plan
+
+    # Logging (written by a background thread; request threads only enqueue)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # 'json' or 'text'
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/license_server.log')  # Empty for stdout only; may contain {pid}
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # Records beyond this are dropped, not waited on
+    LOG_ACCESS = os.environ.get('LOG_ACCESS', 'true').lower() == 'true'
+    # Fraction of INFO records kept per logger; warnings and errors are never sampled
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'license_server.validation=0.1')
@@ -1,28 +1,11 @@
 #!/bin/bash
 set -e
 
-# Wait for Redis to be ready
-if [ "$FLASK_ENV" = "production" ]; then
-    echo "Waiting for Redis..."
-    until redis-cli -h redis -p 6379 ping; do
-        echo "Redis is unavailable - sleeping"
-        sleep 2
-    done
-    echo "Redis is up!"
-fi
+# Redis is optional; docker-compose starts the app once it is healthy
 
-# Initialize database if it doesn't exist
-if [ ! -f /app/data/licenses.db ]; then
-    echo "Initializing database..."
-    python -c "from models.database import init_db; init_db()"
-fi
-
-# Run migrations if they exist
-if [ -f /app/migrations/pending.sql ]; then
-    echo "Running pending migrations..."
-    sqlite3 /app/data/licenses.db < /app/migrations/pending.sql
-    rm /app/migrations/pending.sql
-fi
+# Create or upgrade the schema once, before any worker starts
+echo "Running database migrations..."
+python -m models.migrations
 
 # Create admin user if needed
 python -c "
@@ -0,0 +1,41 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) and workers are forked
+from it, so imports and create_app() run once instead of per worker and the
+loaded code pages are shared copy-on-write. Nothing in create_app() keeps a
+connection or thread open across the fork: SQLite connections are per call,
+the Redis pool reconnects on pid change, and the health prober restarts
+itself in each worker.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # Empty disables it
+errorlog = '-'
+
+if worker_class == 'gevent' and preload_app:
+    # Patch before the master imports the app, so everything loaded at
+    # preload time (sockets, locks, redis) is already cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+def when_ready(server):
+    """Drop DB connections the master opened while preloading; each worker opens its own pool."""
+    from models.database import close_db_pool
+    close_db_pool()
+
+def post_fork(server, worker):
+    """Start per-worker background work in the child, never in the master."""
+    from services.health_service import health_prober
+    health_prober.ensure_running()
+    server.log.info(f"Worker {worker.pid} ready")
@@ -0,0 +1,6 @@
+"""Versioned schema migrations.
+
+Each ``mNNN_<name>.py`` module defines a ``description`` string and an
+``upgrade(conn)`` function. Migrations are applied in version order by
+``python -m models.migrations`` and recorded in the ``schema_version`` table.
+"""
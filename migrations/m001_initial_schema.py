@@ -0,0 +1,71 @@
+"""Baseline schema, identical to what init_db() historically created."""
+
+description = 'Initial schema'
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            max_devices INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS licenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL,
+            product_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            usage_count INTEGER DEFAULT 0,
+            credit_number TEXT DEFAULT 'None',
+            machine_code TEXT DEFAULT 'None',
+            FOREIGN KEY(product_id) REFERENCES products (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            license_key TEXT NOT NULL,
+            ip_address TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action TEXT NOT NULL,
+            user_agent TEXT,
+            response_status TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER UNIQUE NOT NULL,
+            number_of_credits INTEGER NOT NULL,
+            license_duration_hours INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(product_id) REFERENCES products (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            last_name TEXT,
+            role TEXT NOT NULL DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_key ON licenses(key)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_status ON licenses(status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_product ON licenses(product_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_license ON usage_logs(license_key)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_ip ON usage_logs(ip_address)')
@@ -0,0 +1,47 @@
+"""Bring databases created by init_db() in line with the documented schema.
+
+Adds the columns the old SQL schema declared (last_used_at, device_id,
+duration_ms, error_message, updated_at) and enforces the license status
+CHECK constraint with triggers, since SQLite cannot add a CHECK to an
+existing table without rebuilding it. PostgreSQL gets a real CHECK constraint.
+"""
+from models.database import table_columns
+
+description = 'Align schema with documented columns and status constraint'
+
+_COLUMNS = [
+    ('licenses', 'device_id', 'TEXT'),
+    ('licenses', 'last_used_at', 'TIMESTAMP'),
+    ('usage_logs', 'duration_ms', 'INTEGER'),
+    ('usage_logs', 'error_message', 'TEXT'),
+    ('products', 'updated_at', 'TIMESTAMP'),
+]
+
+def upgrade(conn):
+    for table, column, column_type in _COLUMNS:
+        if column not in table_columns(conn, table):
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+    if conn.dialect == 'postgresql':
+        if not conn.execute("SELECT 1 FROM pg_constraint WHERE conname = 'check_license_status'").fetchone():
+            conn.execute('''
+                ALTER TABLE licenses ADD CONSTRAINT check_license_status
+                CHECK (status IN ('active', 'expired', 'revoked'))
+            ''')
+        return
+
+    for event in ('INSERT', 'UPDATE OF status'):
+        trigger = 'check_license_status_' + event.split()[0].lower()
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {trigger}
+            BEFORE {event} ON licenses
+            FOR EACH ROW
+            WHEN NEW.status NOT IN ('active', 'expired', 'revoked')
+            BEGIN
+                SELECT RAISE(ABORT, 'Invalid license status');
+            END
+        ''')
+
+    # Left behind by the old SQL migrations; it rejects the audit log row
+    # written after a license is deleted.
+    conn.execute('DROP TRIGGER IF EXISTS validate_log_license')
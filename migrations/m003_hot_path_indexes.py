@@ -0,0 +1,24 @@
+"""Composite indexes for the validation, listing, expiry and stats queries."""
+
+description = 'Composite indexes for hot queries'
+
+def upgrade(conn):
+    # License.validate: WHERE key = ? AND product_id = ? AND machine_code = ?
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_key_product_machine ON licenses(key, product_id, machine_code)')
+    # Duplicate checks in License.create / automate: product_id with user_id or machine_code
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_product_user ON licenses(product_id, user_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_product_machine ON licenses(product_id, machine_code)')
+    # Per-product counts by status on product listings and stats
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_product_status ON licenses(product_id, status)')
+    # Bulk expiry update in get_licenses
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_expires ON licenses(expires_at)')
+    # Recent validation counts in license/product stats
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_action_time ON usage_logs(action, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON usage_logs(timestamp)')
+
+    # Redundant with the UNIQUE autoindex on key and the product_id-prefixed
+    # composites above; they only slow down writes
+    conn.execute('DROP INDEX IF EXISTS idx_licenses_key')
+    conn.execute('DROP INDEX IF EXISTS idx_licenses_product')
+
+    conn.execute('ANALYZE' if conn.dialect == 'postgresql' else 'PRAGMA optimize')
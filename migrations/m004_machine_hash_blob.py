@@ -0,0 +1,51 @@
+"""Store machine hashes as 32-byte BLOBs and cover the validation lookup.
+
+machine_code keeps the hex digest for display, search and exports; the new
+machine_hash column holds the same digest as raw bytes, half the size in the
+table and in every index that contains it.
+"""
+
+from models.database import table_columns
+
+description = 'Binary machine hash column and covering validation index'
+
+_BATCH_SIZE = 5000
+
+def _to_blob(machine_code):
+    if isinstance(machine_code, str) and len(machine_code) == 64:
+        try:
+            return bytes.fromhex(machine_code)
+        except ValueError:
+            pass
+    return None
+
+def upgrade(conn):
+    if 'machine_hash' not in table_columns(conn, 'licenses'):
+        conn.execute('ALTER TABLE licenses ADD COLUMN machine_hash BLOB')
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, machine_code FROM licenses WHERE id > ? AND machine_hash IS NULL ORDER BY id LIMIT ?',
+            (last_id, _BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            'UPDATE licenses SET machine_hash = ? WHERE id = ?',
+            [(_to_blob(machine_code), row_id) for row_id, machine_code in rows]
+        )
+        last_id = rows[-1][0]
+
+    # Covers License.validate entirely: the lookup columns followed by every
+    # column it returns (id is the rowid and is part of every index)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_licenses_validate
+        ON licenses(key, product_id, machine_hash, status, expires_at, user_id, credit_number)
+    ''')
+    # Duplicate-machine checks on create / automate
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_licenses_machine_hash ON licenses(machine_hash)')
+
+    # Text-hash versions superseded by the indexes above
+    conn.execute('DROP INDEX IF EXISTS idx_licenses_key_product_machine')
+    conn.execute('DROP INDEX IF EXISTS idx_licenses_product_machine')
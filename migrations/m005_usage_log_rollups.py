@@ -0,0 +1,29 @@
+"""Aggregate tables for usage log rollups."""
+
+description = 'Hourly/daily usage log rollups'
+
+def upgrade(conn):
+    # One row per (bucket, license, action, status); product_id is resolved when
+    # the bucket is rolled up so stats no longer join usage_logs to licenses
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage_log_rollups (
+            granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+            bucket TEXT NOT NULL,
+            license_key TEXT NOT NULL,
+            product_id INTEGER,
+            action TEXT NOT NULL,
+            response_status TEXT NOT NULL DEFAULT '',
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (granularity, bucket, license_key, action, response_status)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rollups_action_bucket ON usage_log_rollups(action, granularity, bucket)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rollups_product_action_bucket ON usage_log_rollups(product_id, action, granularity, bucket)')
+
+    # Watermarks: everything before them has been rolled up
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage_log_rollup_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
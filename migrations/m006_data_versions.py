@@ -0,0 +1,49 @@
+"""Per-table change counters for ETags on admin listing/stats endpoints."""
+
+description = 'Data version counters bumped by triggers'
+
+# Table -> statements that change what the admin APIs return. usage_logs only
+# counts inserts: the retention job deletes rows it has already rolled up.
+_TRACKED = {
+    'licenses': ('INSERT', 'UPDATE', 'DELETE'),
+    'products': ('INSERT', 'UPDATE', 'DELETE'),
+    'usage_logs': ('INSERT',),
+}
+
+def upgrade(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table, events in _TRACKED.items():
+        conn.execute('INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)', (table,))
+        if conn.dialect == 'postgresql':
+            _create_pg_trigger(conn, table, events)
+            continue
+        for event in events:
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS bump_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+def _create_pg_trigger(conn, table, events):
+    # One statement-level trigger per table: a bulk UPDATE bumps the counter once
+    conn.execute(f'''
+        CREATE OR REPLACE FUNCTION bump_{table}_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    conn.execute(f'DROP TRIGGER IF EXISTS bump_{table}_version ON {table}')
+    conn.execute(f'''
+        CREATE TRIGGER bump_{table}_version
+        AFTER {' OR '.join(events)} ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_{table}_version()
+    ''')
@@ -0,0 +1,80 @@
+"""aiosqlite connection pool for the ASGI validation service (asgi.py).
+
+Each aiosqlite connection runs its queries on its own thread, so a pool of N
+connections keeps up to N queries in flight while the event loop goes on
+accepting requests. Statements are shared with the sync models
+(License.VALIDATE_SQL, Product.CACHE_SQL...) so both stacks behave the same.
+"""
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from config import Config
+from models.database import get_db_path, sqlite_pragma_statements
+
+class AsyncDatabase:
+    def __init__(self, path=None, size=None):
+        self.path = path or get_db_path()
+        self.size = size or Config.ASYNC_DB_POOL_SIZE
+        self._idle = None
+        self._connections = []
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        async with self._lock:
+            if self._idle is not None:
+                return
+            idle = asyncio.Queue()
+            for _ in range(self.size):
+                conn = await aiosqlite.connect(self.path, timeout=30)
+                conn.row_factory = sqlite3.Row
+                await conn.execute('PRAGMA journal_mode=WAL;')
+                for statement in sqlite_pragma_statements():
+                    await conn.execute(statement)
+                self._connections.append(conn)
+                idle.put_nowait(conn)
+            self._idle = idle
+
+    async def close(self):
+        async with self._lock:
+            for conn in self._connections:
+                await conn.close()
+            self._connections = []
+            self._idle = None
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; waits (without blocking the loop) while all are busy."""
+        if self._idle is None:
+            await self.open()
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def fetchone(self, sql, params=()):
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=()):
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+    async def execute(self, sql, params=()):
+        """Run a write and commit it; returns the number of changed rows."""
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                rowcount = cursor.rowcount
+            await conn.commit()
+            return rowcount
+
+    def stats(self):
+        return {
+            'size': len(self._connections),
+            'idle': self._idle.qsize() if self._idle is not None else 0
+        }
@@ -1,19 +1,486 @@
 from config import Config
 import sqlite3
 import os
+import pathlib
+import queue
+import re
+import sys
+import threading
+import time
 from contextlib import contextmanager
+from functools import lru_cache
 
-def get_db_connection():
+# On gevent workers sqlite3 (and scrypt) release the GIL but never yield to the hub,
+# so one slow statement stalls every greenlet in the worker. Blocking calls are then
+# run on a bounded pool of native threads; elsewhere they run inline.
+_blocking_pool = None
+_blocking_pool_pid = None
+
+def _gevent_active():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+def _get_blocking_pool():
+    global _blocking_pool, _blocking_pool_pid
+    if _blocking_pool_pid != os.getpid():
+        from gevent.threadpool import ThreadPool
+        _blocking_pool = ThreadPool(Config.DB_THREADPOOL_SIZE)
+        _blocking_pool_pid = os.getpid()
+    return _blocking_pool
+
+def run_blocking(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs), off the gevent hub when running under gevent.
+
+    Callers already on a pool thread run inline, so nested calls cannot deadlock.
+    DB_THREADPOOL_SIZE=0 disables the dispatch.
+    """
+    if not Config.DB_THREADPOOL_SIZE or not _gevent_active():
+        return fn(*args, **kwargs)
+    return _get_blocking_pool().apply(fn, args, kwargs)
+
+def blocking_pool_stats():
+    if not Config.DB_THREADPOOL_SIZE or not _gevent_active():
+        return {'enabled': False}
+    pool = _get_blocking_pool()
+    return {
+        'enabled': True,
+        'threads': pool.size,
+        'max_threads': pool.maxsize,
+        'pending': len(pool)  # Running plus queued calls
+    }
+
+# Callables invoked as observer(conn, sql, params, elapsed_seconds) after every
+# statement executed through a tracked connection (metrics, slow query log...)
+_query_observers = []
+
+def add_query_observer(observer):
+    """Register a callback notified after every executed statement."""
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+def _notify_query_observers(conn, sql, params, elapsed):
+    for observer in _query_observers:
+        try:
+            observer(conn, sql, params, elapsed)
+        except Exception:
+            pass  # Instrumentation must never break a query
+
+class TrackedCursor(sqlite3.Cursor):
+    """Cursor that reports the time to first row of every statement.
+
+    Statements and multi-row fetches go through run_blocking; fetchone() only
+    steps one row past the one execute() already fetched, so it stays inline.
+    Observers run on the calling greenlet, where the request context lives.
+    """
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return run_blocking(super().execute, sql, parameters)
+        finally:
+            if _query_observers:
+                _notify_query_observers(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return run_blocking(super().executemany, sql, seq_of_parameters)
+        finally:
+            if _query_observers:
+                _notify_query_observers(self.connection, sql, None, time.perf_counter() - start)
+
+    def fetchall(self):
+        return run_blocking(super().fetchall)
+
+    def fetchmany(self, size=None):
+        return run_blocking(super().fetchmany, self.arraysize if size is None else size)
+
+class TrackedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are tracked."""
+    dialect = 'sqlite'
+
+    def cursor(self, factory=TrackedCursor):
+        return super().cursor(factory)
+
+    def untracked_cursor(self):
+        """Cursor whose statements are not reported to query observers."""
+        return super().cursor(sqlite3.Cursor)
+
+    def commit(self):
+        return run_blocking(super().commit)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # `with conn:` commits (and fsyncs) here without going through commit()
+        return run_blocking(super().__exit__, exc_type, exc_value, traceback)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def is_postgres():
+    """True when DATABASE_URL points at PostgreSQL (models.postgres driver)."""
+    return Config.SQLALCHEMY_DATABASE_URI.startswith(('postgres://', 'postgresql://'))
+
+def get_db_path():
+    """SQLite file named by DATABASE_URL (a plain path is accepted too)."""
     db_uri = Config.SQLALCHEMY_DATABASE_URI
     if db_uri.startswith("sqlite:///"):
-        db_path = db_uri.replace("sqlite:///", "", 1)
-    else:
-        db_path = db_uri
-    conn = sqlite3.connect(db_path, timeout=30)
+        return db_uri.replace("sqlite:///", "", 1)
+    return db_uri
+
+class PooledConnection(TrackedConnection):
+    """TrackedConnection lent out by a pool: close() and leaving `with` hand it back."""
+    pool = None
+    leased = False
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.close()
+
+    def close(self):
+        self.pool.release(self)
+
+    def discard(self):
+        """Really close the connection."""
+        super().close()
+
+# Pragmas set on every pooled connection. synchronous=NORMAL in WAL mode cannot
+# corrupt the database, but the last commits before a power loss (not a process
+# crash) may roll back; wal_autocheckpoint=0 hands checkpoints to _Checkpointer
+# so commits never pay for them. benchmark_pragmas.py measures the difference.
+SQLITE_PRAGMA_PROFILES = {
+    'durable': {
+        'synchronous': 'FULL', 'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT',
+        'busy_timeout': 30000, 'wal_autocheckpoint': 1000, 'journal_size_limit': -1
+    },
+    'balanced': {
+        'synchronous': 'NORMAL', 'cache_size': -16384, 'mmap_size': 256 * 1024 * 1024, 'temp_store': 'MEMORY',
+        'busy_timeout': 10000, 'wal_autocheckpoint': 0, 'journal_size_limit': 64 * 1024 * 1024
+    },
+    # Commits are not synced at all: for throwaway data (load tests, imports into a copy)
+    'fast': {
+        'synchronous': 'OFF', 'cache_size': -65536, 'mmap_size': 1024 * 1024 * 1024, 'temp_store': 'MEMORY',
+        'busy_timeout': 10000, 'wal_autocheckpoint': 0, 'journal_size_limit': 64 * 1024 * 1024
+    }
+}
+_PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z]+)$')
+# Only meaningful on connections that write; readers keep SQLite's defaults
+_WRITER_PRAGMAS = ('synchronous', 'wal_autocheckpoint', 'journal_size_limit')
+
+@lru_cache(maxsize=8)
+def _parse_pragmas(profile, overrides):
+    if profile not in SQLITE_PRAGMA_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PRAGMA_PROFILE {profile!r} (expected one of {', '.join(SQLITE_PRAGMA_PROFILES)})")
+    pragmas = dict(SQLITE_PRAGMA_PROFILES[profile])
+    for item in filter(None, (part.strip() for part in overrides.split(','))):
+        name, _, value = (token.strip() for token in item.partition('='))
+        if name.lower() not in pragmas or not _PRAGMA_VALUE.match(value):
+            raise ValueError(f'Invalid SQLITE_PRAGMAS entry {item!r}')
+        pragmas[name.lower()] = int(value) if value.lstrip('-').isdigit() else value.upper()
+    return pragmas
+
+def sqlite_pragmas():
+    """Pragmas of SQLITE_PRAGMA_PROFILE with the SQLITE_PRAGMAS overrides applied."""
+    return dict(_parse_pragmas(Config.SQLITE_PRAGMA_PROFILE, Config.SQLITE_PRAGMAS))
+
+def sqlite_pragma_statements(readonly=False):
+    """PRAGMA statements to run once on each new connection."""
+    return [f'PRAGMA {name} = {value}' for name, value in sqlite_pragmas().items()
+            if not (readonly and name in _WRITER_PRAGMAS)]
+
+def _connect(path, pool):
+    # Pool threads use the connection on behalf of its greenlet, one call at a time
+    conn = sqlite3.connect(path, timeout=30, factory=PooledConnection, check_same_thread=False)
+    conn.pool = pool
     conn.row_factory = sqlite3.Row
     conn.execute('PRAGMA journal_mode=WAL;')  # Enable Write-Ahead Logging for concurrency
+    for statement in sqlite_pragma_statements():
+        conn.execute(statement)
     return conn
 
+def _connect_readonly(path, pool):
+    uri = pathlib.Path(path).absolute().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, timeout=30, factory=PooledConnection, check_same_thread=False)
+    conn.pool = pool
+    conn.row_factory = sqlite3.Row
+    for statement in sqlite_pragma_statements(readonly=True):
+        conn.execute(statement)
+    conn.execute('PRAGMA query_only = ON')
+    conn.execute(f'PRAGMA cache_size = -{int(Config.DB_READ_CACHE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(Config.DB_MMAP_SIZE)}')
+    return conn
+
+class _WriterSlot:
+    """The process's single SQLite write connection, lent to one thread/greenlet at a time.
+
+    SQLite takes one writer anyway; queueing here instead of on the file lock means
+    a waiting request never spins on SQLITE_BUSY. Re-entrant: nested
+    get_db_connection() calls on the same thread share the connection, which is
+    released (rolled back if left open) when the outermost user closes it.
+    """
+    def __init__(self, path, checkpointer=None):
+        self.path = path
+        self.checkpointer = checkpointer
+        self._lock = threading.RLock()
+        self._conn = None
+        self._owner = None
+        self._depth = 0
+        self.waiting = 0
+
+    def acquire(self):
+        self.waiting += 1
+        try:
+            self._lock.acquire()
+        finally:
+            self.waiting -= 1
+        if self._conn is None:
+            try:
+                self._conn = run_blocking(_connect, self.path, self)
+            except Exception:
+                self._lock.release()
+                raise
+        self._owner = threading.get_ident()
+        self._depth += 1
+        return self._conn
+
+    def release(self, conn):
+        if self._depth == 0 or self._owner != threading.get_ident():
+            return  # Already released (close() after leaving `with`)
+        self._depth -= 1
+        if self._depth:
+            return
+        self._owner = None
+        try:
+            if conn.in_transaction:
+                run_blocking(conn.rollback)
+            conn.isolation_level = ''  # Undo isolation_level = None (migrations, usage log jobs)
+        finally:
+            self._lock.release()
+        if self.checkpointer is not None:
+            self.checkpointer.note_write()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.discard()
+            self._conn = None
+
+    def held_by_caller(self):
+        return self._depth > 0 and self._owner == threading.get_ident()
+
+    def stats(self):
+        return {'busy': self._depth > 0, 'waiting': self.waiting}
+
+class _ReaderPool:
+    """Read-only connections (mode=ro, query_only) reused across requests.
+
+    Readers never take the write lock; in WAL mode each statement sees the last
+    committed data. Opened on demand, at most DB_READ_POOL_SIZE are kept idle.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self.in_use = 0
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = run_blocking(_connect_readonly, self.path, self)
+        conn.leased = True
+        self.in_use += 1
+        return conn
+
+    def release(self, conn):
+        if not conn.leased:
+            return  # Already released (close() after leaving `with`)
+        conn.leased = False
+        self.in_use -= 1
+        if conn.in_transaction:
+            run_blocking(conn.rollback)
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.discard()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {'in_use': self.in_use, 'idle': self._idle.qsize(), 'max_idle': self.size}
+
+class _Checkpointer:
+    """Checkpoints the WAL from a background thread when wal_autocheckpoint is 0.
+
+    Woken every WAKE_AFTER_WRITES writer releases (and at least every
+    SQLITE_CHECKPOINT_INTERVAL seconds), it runs a PASSIVE checkpoint, which
+    never waits on readers or the writer. While writes never pause SQLite
+    cannot rewind the WAL, so once the file outgrows journal_size_limit a
+    TRUNCATE checkpoint briefly holds new writers and empties it. Uses its own
+    connection; stopped by close() or when the process forks.
+    """
+    WAKE_AFTER_WRITES = 200
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = False
+        self._writes = 0
+        self._conn = None
+        self.runs = 0
+        self.truncations = 0
+        self.last = None
+        self.last_error = None
+
+    def start(self):
+        threading.Thread(target=self._run, args=(os.getpid(),), name='sqlite-checkpoint', daemon=True).start()
+
+    def note_write(self):
+        self._writes += 1
+        if self._writes >= self.WAKE_AFTER_WRITES:
+            self._writes = 0
+            self._wake.set()
+
+    def checkpoint(self):
+        """Run one checkpoint; returns (busy, wal_frames, checkpointed_frames)."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute(f"PRAGMA busy_timeout = {int(sqlite_pragmas()['busy_timeout'])}")
+        start = time.perf_counter()
+        mode = 'PASSIVE'
+        busy, log, checkpointed = self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        limit = sqlite_pragmas()['journal_size_limit']
+        try:
+            oversized = limit > 0 and os.path.getsize(self.path + '-wal') > limit
+        except OSError:
+            oversized = False
+        if oversized:
+            mode = 'TRUNCATE'
+            busy, log, checkpointed = self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+            self.truncations += 1
+        self.runs += 1
+        self.last = {'mode': mode, 'busy': busy, 'wal_frames': log, 'checkpointed_frames': checkpointed,
+                     'duration_ms': round((time.perf_counter() - start) * 1000, 3), 'at': time.time()}
+        return busy, log, checkpointed
+
+    def _run(self, pid):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped or os.getpid() != pid:
+                break
+            try:
+                run_blocking(self.checkpoint)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+        if self._conn is not None and os.getpid() == pid:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+
+    def stats(self):
+        return {'interval': self.interval, 'runs': self.runs, 'truncations': self.truncations,
+                'last': self.last, 'error': self.last_error}
+
+_sqlite_pools = {}  # (pid, path) -> (writer, readers, checkpointer or None)
+_sqlite_pools_lock = threading.Lock()
+
+def _get_sqlite_pools():
+    key = (os.getpid(), get_db_path())
+    pools = _sqlite_pools.get(key)
+    if pools is None:
+        with _sqlite_pools_lock:
+            pools = _sqlite_pools.get(key)
+            if pools is None:
+                checkpointer = None
+                if sqlite_pragmas()['wal_autocheckpoint'] == 0 and Config.SQLITE_CHECKPOINT_INTERVAL > 0:
+                    checkpointer = _Checkpointer(key[1], Config.SQLITE_CHECKPOINT_INTERVAL)
+                    checkpointer.start()
+                pools = (_WriterSlot(key[1], checkpointer), _ReaderPool(key[1], Config.DB_READ_POOL_SIZE), checkpointer)
+                _sqlite_pools[key] = pools
+    return pools
+
+def get_db_connection():
+    """Connection for writes, and for reads that must see the caller's own writes.
+
+    SQLite: the serialized writer connection; PostgreSQL: a pooled connection.
+    Release it with close() or by leaving a `with` block.
+    """
+    if is_postgres():
+        from models import postgres
+        return postgres.connect()
+    return _get_sqlite_pools()[0].acquire()
+
+def holds_write_connection():
+    """True while the calling thread/greenlet has the SQLite writer checked out."""
+    if is_postgres():
+        return False
+    pools = _sqlite_pools.get((os.getpid(), get_db_path()))
+    return pools is not None and pools[0].held_by_caller()
+
+def get_read_connection():
+    """Connection for queries that never write (listings, search, stats, exports)."""
+    if is_postgres():
+        from models import postgres
+        return postgres.connect()
+    return _get_sqlite_pools()[1].acquire()
+
+def close_db_pool():
+    """Close this process's pooled connections (e.g. in a preloading master before it forks)."""
+    if is_postgres():
+        from models import postgres
+        postgres.close_pool()
+        return
+    with _sqlite_pools_lock:
+        for key in [key for key in _sqlite_pools if key[0] == os.getpid()]:
+            for pool in _sqlite_pools.pop(key):
+                if pool is not None:
+                    pool.close()
+
+def db_pool_stats():
+    if is_postgres():
+        from models import postgres
+        return {'enabled': True, **postgres.pool_stats()}
+    pools = _sqlite_pools.get((os.getpid(), get_db_path()))
+    if pools is None:
+        return {'enabled': False}
+    writer, readers, checkpointer = pools
+    return {
+        'enabled': True,
+        'profile': Config.SQLITE_PRAGMA_PROFILE,
+        'writer': writer.stats(),
+        'readers': readers.stats(),
+        'checkpoint': checkpointer.stats() if checkpointer else None
+    }
+
+def table_exists(conn, table):
+    if conn.dialect == 'postgresql':
+        sql = "SELECT 1 FROM information_schema.tables WHERE table_schema = current_schema() AND table_name = ?"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    return conn.execute(sql, (table,)).fetchone() is not None
+
+def table_columns(conn, table):
+    """Column names of a table on either backend."""
+    if conn.dialect == 'postgresql':
+        rows = conn.execute(
+            'SELECT column_name FROM information_schema.columns '
+            'WHERE table_schema = current_schema() AND table_name = ?', (table,)).fetchall()
+        return {row[0] for row in rows}
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+
 @contextmanager
 def get_db_connection_context():
     conn = get_db_connection()
@@ -46,99 +513,26 @@ def insert_default_users():
     with get_db_connection_context() as conn:
         c = conn.cursor()
         for user in defaults_users:
-            try:
-                c.execute('''
-                    INSERT INTO users (username, password, first_name, last_name, role)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', user)
-            except sqlite3.IntegrityError:
-                pass  # User already exists
+            # OR IGNORE rather than catching IntegrityError: on PostgreSQL a failed
+            # statement aborts the rest of the transaction
+            c.execute('''
+                INSERT OR IGNORE INTO users (username, password, first_name, last_name, role)
+                VALUES (?, ?, ?, ?, ?)
+            ''', user)
         conn.commit()
 
 def init_db():
-
-    """Initialize the database with tables and indexes."""
-    with get_db_connection_context() as conn:
-        c = conn.cursor()
-        
-        # Products table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                max_devices INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Licenses table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS licenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                key TEXT UNIQUE NOT NULL,
-                product_id INTEGER NOT NULL,
-                user_id TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                usage_count INTEGER DEFAULT 0,
-                credit_number TEXT DEFAULT 'None',
-                machine_code TEXT DeFAULT 'None',
-                FOREIGN KEY(product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        # Usage logs table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS usage_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                license_key TEXT NOT NULL,
-                ip_address TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                action TEXT NOT NULL,
-                user_agent TEXT,
-                response_status TEXT
-            )
-        ''')
-
-        # Settings table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER UNIQUE NOT NULL,
-                number_of_credits INTEGER NOT NULL,
-                license_duration_hours INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(product_id) REFERENCES products (id)
-            )
-        ''')
-
-        # Users table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                first_name TEXT,
-                last_name TEXT,
-                role TEXT NOT NULL DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Indexes for performance
-        c.execute('CREATE INDEX IF NOT EXISTS idx_licenses_key ON licenses(key)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_licenses_status ON licenses(status)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_licenses_product ON licenses(product_id)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_logs_license ON usage_logs(license_key)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_logs_ip ON usage_logs(ip_address)')
-        
-        conn.commit()
+    """Create or upgrade the schema by applying pending migrations."""
+    from models.migrations import migrate
+    return migrate()
 
 def get_database_size():
     """Get the size of the database file in MB."""
-    db_path = Config.SQLALCHEMY_DATABASE_URI.replace('sqlite:///', '')
-    if os.path.exists(db_path):
-        return round(os.path.getsize(db_path) / (1024 * 1024), 2)
-    return 0
\ No newline at end of file
+    if is_postgres():
+        with get_read_connection() as conn:
+            size = conn.execute('SELECT pg_database_size(current_database())').fetchone()[0]
+        return round(size / (1024 * 1024), 2)
+    # Pooled connections keep the WAL open, so recent pages may not be in the main file yet
+    paths = [get_db_path(), get_db_path() + '-wal']
+    size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+    return round(size / (1024 * 1024), 2)
\ No newline at end of file
@@ -1,8 +1,32 @@
-from models.database import get_db_connection
+from models.database import get_read_connection
+from models.write_queue import run_write
 from datetime import datetime, timedelta
-from utils.hash_utils import hash_machine_code
+from utils.hash_utils import machine_code_digest, machine_hash_from_hex
 
 class License:
+    # Answered from the covering index alone, without touching the table. The planner
+    # would otherwise pick the UNIQUE(key) autoindex and do an extra table lookup.
+    VALIDATE_SQL = '''
+        SELECT id, user_id, credit_number, status, expires_at
+        FROM licenses INDEXED BY idx_licenses_validate
+        WHERE key = ? AND product_id = ? AND machine_hash = ?
+    '''
+    EXPIRE_SQL = "UPDATE licenses SET status = 'expired' WHERE key = ?"
+    # Key lists are matched BULK_KEY_CHUNK keys per statement (bound parameter limits)
+    BULK_KEY_CHUNK = 500
+    # New expires_at of an extended license: `hours` after the later of its expiry and now.
+    # strftime yields NULL (never expires) when out of range; keep the old expiry instead
+    EXTEND_SQL = {
+        'sqlite': "COALESCE(strftime('%Y-%m-%dT%H:%M:%f', MAX(expires_at, ?), ? || ' hours'), expires_at)",
+        'postgresql': "GREATEST(expires_at, ?) + ? * INTERVAL '1 hour'"
+    }
+    # Rows each bulk action leaves alone, on top of the caller's selection
+    BULK_TARGETS = {
+        'revoke': " AND status != 'revoked'",
+        'delete': '',
+        'extend': " AND expires_at IS NOT NULL AND status != 'revoked'"
+    }
+
     @staticmethod
     def create(product_id, user_id, credit_number, machine_code, expires_hours=24, license_key=None):
         """Create a new license."""
@@ -13,124 +37,285 @@ class License:
         
         expires_at = (datetime.now() + timedelta(hours=expires_hours)).isoformat() if expires_hours > 0 else None
         created_at = datetime.now().isoformat();
+        # machine_code arrives already hashed (hex); validation looks up the binary form
+        machine_hash = machine_hash_from_hex(machine_code)
+
+        try:
+            return run_write(License._insert, license_key, product_id, user_id, credit_number,
+                             machine_code, machine_hash, expires_at, created_at)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _insert(conn, license_key, product_id, user_id, credit_number, machine_code, machine_hash, expires_at, created_at):
         # check user_id and machine_code combination does not already exist for the same product
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''
-                SELECT COUNT(*) FROM licenses
-                WHERE product_id = ? AND (user_id = ? OR machine_code = ?)
-            ''', (product_id, user_id, machine_code))
-            if c.fetchone()[0] > 0:
-                return {'success': False, 'error': 'A license for this user and machine already exists for the product'}
-
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            try:
-                c.execute('''
-                    INSERT INTO licenses (key, product_id, user_id, credit_number, machine_code, expires_at, created_at, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ? ,'active')
-                ''', (license_key, product_id, user_id, credit_number, machine_code, expires_at, created_at))
-                conn.commit()
-                return {'success': True, 'license_key': license_key}
-            except Exception as e:
-                conn.rollback()
-                return {'success': False, 'error': str(e)}
+        # (inside the write, so two creates committed together cannot both pass)
+        c = conn.cursor()
+        c.execute('''
+            SELECT COUNT(*) FROM licenses
+            WHERE product_id = ? AND (user_id = ? OR machine_hash = ?)
+        ''', (product_id, user_id, machine_hash))
+        if c.fetchone()[0] > 0:
+            return {'success': False, 'error': 'A license for this user and machine already exists for the product'}
+        c.execute('''
+            INSERT INTO licenses (key, product_id, user_id, credit_number, machine_code, machine_hash, expires_at, created_at, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ? ,'active')
+        ''', (license_key, product_id, user_id, credit_number, machine_code, machine_hash, expires_at, created_at))
+        return {'success': True, 'license_key': license_key}
     
     @staticmethod
-    def validate(product_id, license_key, machine_code):
+    def validate(product_id, license_key, machine_code, product_name=None):
         """Validate a license key."""   
         # Check license existence and status based on product_id , license_key and machine_code
-        machine_code = hash_machine_code(machine_code)
-        print(machine_code)
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''
-                SELECT l.*, p.name as product_name, p.max_devices
-                FROM licenses l
-                JOIN products p ON l.product_id = p.id
-                WHERE l.key = ? AND l.product_id = ? AND l.machine_code = ?
-            ''', (license_key, product_id, machine_code))
-
-            license = c.fetchone()
-            print(license)
-            if not license:
-                return {'valid': False, 'error': 'Invalid license key or machine code'}
-            if license['status'] == 'expired':
-                return {'valid': False, 'error': 'License is expired'}
-            
-            expires_at = license['expires_at']
-            if expires_at:
-                if isinstance(expires_at, str):
-                    # Try parsing as ISO format or SQLite format
-                    try:
-                        expires_at = datetime.fromisoformat(expires_at)
-                    except ValueError:
-                        expires_at = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
-                if datetime.now() > expires_at:
-                    c.execute("UPDATE licenses SET status = 'expired' WHERE key = ?", (license_key,))
-                    conn.commit()
-                    return {'valid': False, 'error': 'License expired'}
-            
-            return{
-                'valid': True,
-                'license_id': license['id'],
-                'product_name': license['product_name'],
-                'user_id': license['user_id'],
-                'machine_code': license['machine_code'],
-                'credit_number': license['credit_number'],
-                'expires_at': expires_at.isoformat() if expires_at else None,
-                'status': license['status']
-            }
-                
+        machine_hash = machine_code_digest(machine_code)
+        if product_name is None:
+            from models.product import Product
+            product_name = Product.get_name_by_id(product_id)
+        with get_read_connection() as conn:
+            row = conn.execute(License.VALIDATE_SQL, (license_key, product_id, machine_hash)).fetchone()
+        result, newly_expired = License.validation_result(row, product_name, machine_hash)
+        if newly_expired:
+            run_write(License._expire, license_key)
+        return result
+
+    @staticmethod
+    def _expire(conn, license_key):
+        conn.execute(License.EXPIRE_SQL, (license_key,))
+
+    @staticmethod
+    def expire_overdue():
+        """Mark every license past its expiry date (and not revoked) as expired."""
+        run_write(License._expire_overdue, datetime.now().isoformat())
+
+    @staticmethod
+    def _expire_overdue(conn, now):
+        conn.execute('''
+            UPDATE licenses
+            SET status = 'expired'
+            WHERE expires_at IS NOT NULL AND expires_at < ? AND status != 'revoked'
+        ''', (now,))
+
+    @staticmethod
+    def validation_result(license, product_name, machine_hash):
+        """(result, newly_expired) for a VALIDATE_SQL row; shared by the sync and async validators.
+
+        newly_expired means the caller must run EXPIRE_SQL for the key.
+        """
+        if not license:
+            return {'valid': False, 'error': 'Invalid license key or machine code'}, False
+        if license['status'] == 'expired':
+            return {'valid': False, 'error': 'License is expired'}, False
+
+        expires_at = license['expires_at']
+        if expires_at:
+            if isinstance(expires_at, str):
+                # Try parsing as ISO format or SQLite format
+                try:
+                    expires_at = datetime.fromisoformat(expires_at)
+                except ValueError:
+                    expires_at = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
+            if datetime.now() > expires_at:
+                return {'valid': False, 'error': 'License expired'}, True
+
+        return {
+            'valid': True,
+            'license_id': license['id'],
+            'product_name': product_name,
+            'user_id': license['user_id'],
+            'machine_code': machine_hash.hex(),
+            'credit_number': license['credit_number'],
+            'expires_at': expires_at.isoformat() if expires_at else None,
+            'status': license['status']
+        }, False
+
     
     @staticmethod
     def log_usage(license_key, ip_address, action, status='success', user_agent=None):
         """Log license usage."""
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''
-                INSERT INTO usage_logs (license_key, ip_address, action, response_status, user_agent)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (license_key, ip_address, action, status, user_agent))
-            conn.commit()
+        run_write(License._insert_usage, license_key, ip_address, action, status, user_agent)
+
+    @staticmethod
+    def _insert_usage(conn, license_key, ip_address, action, status='success', user_agent=None):
+        conn.execute('''
+            INSERT INTO usage_logs (license_key, ip_address, action, response_status, user_agent)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (license_key, ip_address, action, status, user_agent))
     
     @staticmethod
     def revoke(license_key):
         """Revoke a license."""
-        
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute("UPDATE licenses SET status = 'revoked' WHERE key = ?", (license_key,))
-            affected = c.rowcount
-            conn.commit()
-            
-            if affected > 0:
-                License.log_usage(license_key, 'admin', 'revocation', 'success')
-                return {'success': True, 'message': 'License revoked'}
-            
-            return {'success': False, 'error': 'License not found'}
+        return run_write(License._revoke, license_key)
+
+    @staticmethod
+    def _revoke(conn, license_key):
+        c = conn.execute("UPDATE licenses SET status = 'revoked' WHERE key = ?", (license_key,))
+        if c.rowcount > 0:
+            License._insert_usage(conn, license_key, 'admin', 'revocation', 'success')
+            return {'success': True, 'message': 'License revoked'}
+        return {'success': False, 'error': 'License not found'}
         
     @staticmethod
     def delete(license_key):
         """Delete a license."""
+        return run_write(License._delete, license_key)
+
+    @staticmethod
+    def _delete(conn, license_key):
+        c = conn.execute("DELETE FROM licenses WHERE key = ?", (license_key,))
+        if c.rowcount > 0:
+            License._insert_usage(conn, license_key, 'admin', 'deletion', 'success')
+            return {'success': True, 'message': 'License deleted'}
+        return {'success': False, 'error': 'License not found'}
+
+    @staticmethod
+    def update(license_key, assignments, values):
+        """Apply `SET` assignments ("user_id = ?", ...) with their values to one license."""
+        return run_write(License._update, license_key, assignments, values)
+
+    @staticmethod
+    def _update(conn, license_key, assignments, values):
+        sql = f"UPDATE licenses SET {', '.join(assignments)} WHERE key = ?"
+        return conn.execute(sql, (*values, license_key)).rowcount > 0
+
+    @staticmethod
+    def use_credits(license_key, used_credits):
+        """Deduct used credits (not below 0); False if the license does not exist."""
+        return run_write(License._use_credits, license_key, used_credits)
+
+    @staticmethod
+    def _use_credits(conn, license_key, used_credits):
+        row = conn.execute("SELECT credit_number FROM licenses WHERE key = ?", (license_key,)).fetchone()
+        if not row:
+            return False
+        new_credit_number = max(int(row['credit_number']) - used_credits, 0)
+        conn.execute("UPDATE licenses SET credit_number = ? WHERE key = ?", (new_credit_number, license_key))
+        return True
         
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute("DELETE FROM licenses WHERE key = ?", (license_key,))
-            affected = c.rowcount
-            conn.commit()
-            
-            if affected > 0:
-                License.log_usage(license_key, 'admin', 'deletion', 'success')
-                return {'success': True, 'message': 'License deleted'}
-            
-            return {'success': False, 'error': 'License not found'}
-        
+    @staticmethod
+    def bulk_conditions(keys=None, product_id=None, user_id=None, status=None, created_from=None, created_to=None):
+        """[(where, params)] selecting licenses by key list and/or filter, one entry per key chunk."""
+        where, params = [], []
+        for clause, value in (('product_id = ?', product_id), ('user_id = ?', user_id), ('status = ?', status),
+                              ('created_at >= ?', created_from), ('created_at <= ?', created_to)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        if not keys:
+            return [(' AND '.join(where), params)]
+        keys = list(dict.fromkeys(keys))
+        conditions = []
+        for i in range(0, len(keys), License.BULK_KEY_CHUNK):
+            chunk = keys[i:i + License.BULK_KEY_CHUNK]
+            clause = f"key IN ({', '.join('?' * len(chunk))})"
+            conditions.append((' AND '.join(where + [clause]), params + chunk))
+        return conditions
+
+    @staticmethod
+    def count_matching(conditions, action):
+        """How many licenses a bulk action ('revoke', 'delete', 'extend') would change."""
+        total = 0
+        with get_read_connection() as conn:
+            for where, params in conditions:
+                sql = f'SELECT COUNT(*) FROM licenses WHERE {where}{License.BULK_TARGETS[action]}'
+                total += conn.execute(sql, params).fetchone()[0]
+        return total
+
+    @staticmethod
+    def bulk_revoke(conditions):
+        """Revoke every matched license that is not revoked yet; returns the number revoked."""
+        return run_write(License._bulk_apply, conditions, 'revoke', 'revocation',
+                         "UPDATE licenses SET status = 'revoked' WHERE {where}")
+
+    @staticmethod
+    def bulk_delete(conditions):
+        """Delete every matched license; returns the number deleted."""
+        return run_write(License._bulk_apply, conditions, 'delete', 'deletion', 'DELETE FROM licenses WHERE {where}')
+
+    @staticmethod
+    def bulk_extend(conditions, hours):
+        """Push expires_at of matched, expiring, unrevoked licenses `hours` past max(expiry, now).
+
+        Expired licenses become active again. Returns the number extended.
+        """
+        return run_write(License._bulk_extend, conditions, hours, datetime.now().isoformat())
+
+    @staticmethod
+    def _bulk_extend(conn, conditions, hours, now):
+        statement = f'''
+            UPDATE licenses
+            SET expires_at = {License.EXTEND_SQL[conn.dialect]},
+                status = CASE WHEN status = 'expired' THEN 'active' ELSE status END
+            WHERE {{where}}
+        '''
+        return License._bulk_apply(conn, conditions, 'extend', 'extension', statement, (now, hours))
+
+    @staticmethod
+    def _bulk_apply(conn, conditions, target, action, statement, set_params=()):
+        """Audit then change the matched rows: one INSERT ... SELECT and one statement per chunk."""
+        affected = 0
+        for where, params in conditions:
+            where += License.BULK_TARGETS[target]
+            conn.execute(f'''
+                INSERT INTO usage_logs (license_key, ip_address, action, response_status)
+                SELECT key, 'admin', ?, 'success' FROM licenses WHERE {where}
+            ''', (action, *params))
+            affected += conn.execute(statement.format(where=where), (*set_params, *params)).rowcount
+        return affected
+
+    @staticmethod
+    def import_rows(rows, dry_run=False):
+        """Insert validated import rows (dicts with a `row` number) in one transaction.
+
+        Rows clashing with an existing license (same key, or same product with the
+        same user or machine) are skipped; returns {row number: error} for them.
+        """
+        if dry_run:
+            with get_read_connection() as conn:
+                return License._import_conflicts(conn, rows)
+        return run_write(License._import_rows, rows)
+
+    @staticmethod
+    def _import_conflicts(conn, rows):
+        def existing(sql, values, params=()):
+            found = set()
+            for i in range(0, len(values), License.BULK_KEY_CHUNK):
+                chunk = values[i:i + License.BULK_KEY_CHUNK]
+                found.update(row[0] for row in conn.execute(
+                    sql.format(placeholders=', '.join('?' * len(chunk))), (*params, *chunk)))
+            return found
+
+        conflicts = {}
+        keys = existing('SELECT key FROM licenses WHERE key IN ({placeholders})', [row['key'] for row in rows])
+        by_product = {}
+        for row in rows:
+            by_product.setdefault(row['product_id'], []).append(row)
+        for product_id, product_rows in by_product.items():
+            users = existing('SELECT user_id FROM licenses WHERE product_id = ? AND user_id IN ({placeholders})',
+                             [row['user_id'] for row in product_rows], (product_id,))
+            machines = {bytes(value) for value in existing(
+                'SELECT machine_hash FROM licenses WHERE product_id = ? AND machine_hash IN ({placeholders})',
+                [row['machine_hash'] for row in product_rows], (product_id,))}
+            for row in product_rows:
+                if row['key'] in keys:
+                    conflicts[row['row']] = 'License key already exists'
+                elif row['user_id'] in users or row['machine_hash'] in machines:
+                    conflicts[row['row']] = 'A license for this user and machine already exists for the product'
+        return conflicts
+
+    @staticmethod
+    def _import_rows(conn, rows):
+        conflicts = License._import_conflicts(conn, rows)
+        conn.executemany('''
+            INSERT INTO licenses (key, product_id, user_id, credit_number, machine_code, machine_hash, expires_at, created_at, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(row['key'], row['product_id'], row['user_id'], row['credit_number'], row['machine_code'],
+               row['machine_hash'], row['expires_at'], row['created_at'], row['status'])
+              for row in rows if row['row'] not in conflicts])
+        return conflicts
+
     @staticmethod
     def get_by_name(name):
-        from models.database import get_db_connection
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM products WHERE product_name = ?', (name,))
             row = c.fetchone()
@@ -0,0 +1,131 @@
+"""Schema migration runner.
+
+Run once per deploy, before starting the workers:
+
+    python -m models.migrations            # apply pending migrations
+    python -m models.migrations --status   # show applied / pending versions
+"""
+import argparse
+import importlib
+import pkgutil
+import re
+import sqlite3
+from datetime import datetime
+
+from models.database import get_db_connection, table_exists
+
+_MODULE_NAME = re.compile(r'^m(\d{3})_\w+$')
+
+def discover_migrations():
+    """Return [(version, module_name)] for every migration module, in order."""
+    import migrations
+    found = []
+    for module_info in pkgutil.iter_modules(migrations.__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if match:
+            found.append((int(match.group(1)), module_info.name))
+    return sorted(found)
+
+def get_applied_versions(conn):
+    """Versions recorded in schema_version (empty if the table doesn't exist yet)."""
+    if not table_exists(conn, 'schema_version'):
+        return set()
+    return {r[0] for r in conn.execute('SELECT version FROM schema_version').fetchall()}
+
+def get_pending_migrations(conn=None):
+    """Migrations not applied yet. Read-only: safe to call on every worker start."""
+    if conn is None:
+        conn = get_db_connection()
+        try:
+            return get_pending_migrations(conn)
+        finally:
+            conn.close()
+    applied = get_applied_versions(conn)
+    return [(version, name) for version, name in discover_migrations() if version not in applied]
+
+def migrate(target=None, log=print):
+    """Apply pending migrations up to `target` (all if None). Returns applied versions."""
+    conn = get_db_connection()
+    conn.isolation_level = None  # Manage transactions explicitly; DDL is transactional in SQLite and PostgreSQL
+    applied_now = []
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        ''')
+        for version, name in discover_migrations():
+            if target is not None and version > target:
+                break
+            # Take the write lock before re-checking so concurrent deploys don't race
+            # (an advisory lock on PostgreSQL)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if version in get_applied_versions(conn):
+                    conn.execute('COMMIT')
+                    continue
+                module = importlib.import_module(f'migrations.{name}')
+                log(f"Applying migration {version:03d}: {getattr(module, 'description', name)}")
+                module.upgrade(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                    (version, name, datetime.now().isoformat())
+                )
+                conn.execute('COMMIT')
+                applied_now.append(version)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.close()
+    return applied_now
+
+def ensure_schema(app):
+    """Check the schema on worker start; only migrate if AUTO_MIGRATE is enabled.
+
+    A schema left behind is reported here and by the `schema` health check,
+    which keeps /health unhealthy (503) until the migrations are applied.
+    """
+    try:
+        pending = get_pending_migrations()
+    except sqlite3.Error as e:
+        app.logger.error(f"Could not read schema version: {e}")
+        return
+    if not pending:
+        return
+    if app.config.get('AUTO_MIGRATE'):
+        migrate(log=app.logger.info)
+    else:
+        versions = ', '.join(f'{version:03d}' for version, _ in pending)
+        app.logger.warning(
+            f"Database schema is behind (pending migrations: {versions}). "
+            "Run 'python -m models.migrations'; /health reports unhealthy until then."
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply database schema migrations.')
+    parser.add_argument('--status', action='store_true', help='Show applied and pending migrations')
+    parser.add_argument('--target', type=int, help='Migrate up to this version only')
+    args = parser.parse_args()
+
+    if args.status:
+        conn = get_db_connection()
+        try:
+            applied = get_applied_versions(conn)
+        finally:
+            conn.close()
+        for version, name in discover_migrations():
+            state = 'applied' if version in applied else 'pending'
+            print(f'{version:03d}  {state:8}  {name}')
+        return
+
+    applied = migrate(target=args.target)
+    if applied:
+        print(f"Applied {len(applied)} migration(s). Database schema is up to date.")
+    else:
+        print("Database schema is up to date.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""PostgreSQL driver behind models.database.get_db_connection (DATABASE_URL=postgresql://...).
+
+The models and services are written against sqlite3. PostgresConnection offers
+the part of that API they use (cursor/execute/fetch*, commit, rowcount,
+lastrowid, Row-style rows, isolation_level=None) on a connection borrowed from
+a psycopg pool, and translate_sql rewrites the few SQLite-only constructs in
+our statements. Errors are re-raised as the matching sqlite3 exception classes,
+so existing except clauses work unchanged.
+
+Unlike sqlite3, leaving a `with conn:` block also returns the connection to
+the pool, as does close(). A failed statement aborts the whole transaction
+(PostgreSQL semantics): callers that need to continue must use
+INSERT OR IGNORE or a new transaction.
+
+Only imported when PostgreSQL is configured; under gevent psycopg waits on its
+socket cooperatively, so statements run on the calling greenlet.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+import psycopg
+from psycopg.types.numeric import FloatLoader
+from psycopg.types.string import TextLoader
+from psycopg_pool import ConnectionPool
+
+from config import Config
+
+# Each piece of SQL is split into quoted literals/identifiers and the code between them
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_CODE_REWRITES = [
+    (re.compile(r'\s+INDEXED\s+BY\s+\w+', re.I), ''),  # Planner hint; PostgreSQL picks its own
+    (re.compile(r'\s+WITHOUT\s+ROWID\b', re.I), ''),
+    (re.compile(r'\bINTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT\b', re.I), 'BIGSERIAL PRIMARY KEY'),
+    (re.compile(r'\bBLOB\b', re.I), 'BYTEA'),
+    (re.compile(r'\bLIKE\b', re.I), 'ILIKE'),  # SQLite's LIKE ignores ASCII case
+]
+_INSERT_OR_IGNORE = re.compile(r'^(\s*)INSERT\s+OR\s+IGNORE\s+INTO\b', re.I)
+_BEGIN_IMMEDIATE = re.compile(r'^\s*BEGIN\s+IMMEDIATE\s*;?\s*$', re.I)
+
+# BEGIN IMMEDIATE takes SQLite's single write lock; its users (migrations, usage
+# log jobs) serialize on this transaction-scoped advisory lock instead
+WRITE_LOCK_ID = zlib.crc32(b'license_server.write_lock')
+
+@lru_cache(maxsize=2048)
+def translate_sql(sql):
+    """SQLite statement -> PostgreSQL: `?` -> `%s`, literal `%` doubled, SQLite-only syntax rewritten."""
+    on_conflict = ''
+    match = _INSERT_OR_IGNORE.match(sql)
+    if match:
+        sql = f'{match.group(1)}INSERT INTO{sql[match.end():]}'.rstrip().rstrip(';')
+        on_conflict = ' ON CONFLICT DO NOTHING'
+    parts = _QUOTED.split(sql)
+    for i, part in enumerate(parts):
+        if i % 2:  # Quoted: only protect % from parameter interpolation
+            parts[i] = part.replace('%', '%%')
+            continue
+        for pattern, replacement in _CODE_REWRITES:
+            part = pattern.sub(replacement, part)
+        parts[i] = part.replace('%', '%%').replace('?', '%s')
+    return ''.join(parts) + on_conflict
+
+def translate_error(error):
+    """The sqlite3 exception class callers already catch for a psycopg error."""
+    if isinstance(error, psycopg.IntegrityError):
+        cls = sqlite3.IntegrityError
+    elif isinstance(error, (psycopg.OperationalError, psycopg.ProgrammingError)):
+        cls = sqlite3.OperationalError  # Includes undefined tables before migrations
+    elif isinstance(error, psycopg.DataError):
+        cls = sqlite3.DataError
+    elif isinstance(error, psycopg.NotSupportedError):
+        cls = sqlite3.NotSupportedError
+    else:
+        cls = sqlite3.DatabaseError
+    return cls(str(error).strip())
+
+class PostgresRow:
+    """sqlite3.Row lookalike: index or (case-insensitive) column name, keys(), dict(row)."""
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index, values):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return self._values[key]
+        try:
+            return self._values[self._index[key]]
+        except KeyError:
+            return self._values[self._index[key.lower()]]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __eq__(self, other):
+        return isinstance(other, PostgresRow) and self._values == other._values
+
+    def keys(self):
+        return list(self._index)
+
+    def __repr__(self):
+        return f'<PostgresRow {dict(zip(self._index, self._values))}>'
+
+def _row_factory(cursor):
+    index = {column.name: i for i, column in enumerate(cursor.description or ())}
+    return lambda values: PostgresRow(index, values)
+
+class PostgresCursor:
+    def __init__(self, connection, tracked=True):
+        self.connection = connection
+        self.arraysize = 1
+        self._cursor = connection.raw.cursor(row_factory=_row_factory)
+        self._tracked = tracked
+        self._lastrowid = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        """Id generated by the last INSERT on this connection (sqlite3's cursor.lastrowid)."""
+        if self._lastrowid is None:
+            self._lastrowid = self.connection.raw.execute('SELECT lastval()').fetchone()[0]
+        return self._lastrowid
+
+    def execute(self, sql, parameters=()):
+        from models.database import _notify_query_observers, _query_observers
+        start = time.perf_counter()
+        self._lastrowid = None
+        try:
+            if _BEGIN_IMMEDIATE.match(sql):
+                self._cursor.execute('BEGIN')
+                self._cursor.execute('SELECT pg_advisory_xact_lock(%s)', (WRITE_LOCK_ID,))
+            else:
+                self._cursor.execute(translate_sql(sql), tuple(parameters))
+        except psycopg.Error as e:
+            raise translate_error(e) from e
+        finally:
+            if self._tracked and _query_observers:
+                _notify_query_observers(self.connection, sql, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        from models.database import _notify_query_observers, _query_observers
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_of_parameters])
+        except psycopg.Error as e:
+            raise translate_error(e) from e
+        finally:
+            if self._tracked and _query_observers:
+                _notify_query_observers(self.connection, sql, None, time.perf_counter() - start)
+        return self
+
+    # sqlite3 returns None / [] after statements without a result set; psycopg raises
+    def fetchone(self):
+        return self._cursor.fetchone() if self._cursor.description else None
+
+    def fetchall(self):
+        return self._cursor.fetchall() if self._cursor.description else []
+
+    def fetchmany(self, size=None):
+        if not self._cursor.description:
+            return []
+        return self._cursor.fetchmany(self.arraysize if size is None else size)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+class PostgresConnection:
+    """A pooled psycopg connection with the sqlite3.Connection interface used in this app."""
+    dialect = 'postgresql'
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.raw = pool.getconn()
+
+    @property
+    def row_factory(self):
+        return PostgresRow
+
+    @row_factory.setter
+    def row_factory(self, value):
+        pass  # Rows always support both index and name access
+
+    @property
+    def isolation_level(self):
+        return None if self.raw.autocommit else 'DEFERRED'
+
+    @isolation_level.setter
+    def isolation_level(self, value):
+        # None = autocommit, transactions managed with explicit BEGIN/COMMIT
+        self.raw.autocommit = value is None
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    def cursor(self, factory=None):
+        return PostgresCursor(self)
+
+    def untracked_cursor(self):
+        """Cursor whose statements are not reported to query observers."""
+        return PostgresCursor(self, tracked=False)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        try:
+            self.raw.commit()
+        except psycopg.Error as e:
+            raise translate_error(e) from e
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        """Return the connection to the pool (rolled back, autocommit off)."""
+        conn, self.raw = self.raw, None
+        if conn is None:
+            return
+        try:
+            if not conn.closed:
+                if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+        except psycopg.Error:
+            pass  # The pool discards broken connections
+        self._pool.putconn(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self.raw is not None and not self.raw.closed:
+                if exc_type is None:
+                    self.commit()
+                else:
+                    self.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+def _configure(conn):
+    # Same Python types the SQLite backend returns: timestamps as ISO text, AVG() as float
+    for name in ('timestamp', 'timestamptz'):
+        conn.adapters.register_loader(name, TextLoader)
+    conn.adapters.register_loader('numeric', FloatLoader)
+    # CURRENT_TIMESTAMP defaults and the usage log jobs assume UTC, as in SQLite
+    conn.execute("SET TIME ZONE 'UTC'")
+    conn.commit()
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Per-process pool sized from SQLALCHEMY_ENGINE_OPTIONS (created lazily, after any fork)."""
+    global _pool, _pool_pid
+    if _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            options = Config.SQLALCHEMY_ENGINE_OPTIONS
+            pool_size = options.get('pool_size', 10)
+            _pool = ConnectionPool(
+                Config.SQLALCHEMY_DATABASE_URI,
+                min_size=pool_size,
+                max_size=pool_size + options.get('max_overflow', 0),
+                max_lifetime=options.get('pool_recycle', 3600),
+                timeout=options.get('pool_timeout', 30),
+                check=ConnectionPool.check_connection if options.get('pool_pre_ping') else None,
+                kwargs=dict(options.get('connect_args', {})),
+                configure=_configure,
+                name='license_server',
+                open=True
+            )
+            _pool_pid = os.getpid()
+    return _pool
+
+def close_pool():
+    """Close this process's pool, e.g. in a preloading master before it forks workers."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool_pid == os.getpid():
+            _pool.close()
+        _pool = _pool_pid = None
+
+def connect():
+    return PostgresConnection(get_pool())
+
+def pool_stats():
+    if _pool_pid != os.getpid():
+        return {'open': False}
+    stats = _pool.get_stats()
+    return {
+        'open': True,
+        'size': stats.get('pool_size', 0),
+        'idle': stats.get('pool_available', 0),
+        'max': _pool.max_size,
+        'waiting': stats.get('requests_waiting', 0)
+    }
@@ -1,6 +1,67 @@
-from models.database import get_db_connection
+import threading
+import time
+
+from config import Config
+from models.database import get_db_connection, get_read_connection
+
+class _ProductIdCache:
+    """In-memory product name <-> id map for the validation hot path.
+
+    Entries are reloaded wholesale after PRODUCT_CACHE_TTL seconds (other workers
+    may have changed products) and invalidated immediately on local writes.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._by_name = {}
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    RELOAD_SQL = 'SELECT id, name FROM products'
+
+    def store(self, rows):
+        """Replace the mappings with (id, name) rows, e.g. loaded by the async service."""
+        self._by_name = {row[1]: row[0] for row in rows}
+        self._by_id = {row[0]: row[1] for row in rows}
+        self._loaded_at = time.monotonic()
+
+    def _reload(self):
+        with get_read_connection() as conn:
+            self.store(conn.execute(self.RELOAD_SQL).fetchall())
+
+    def peek(self, mapping_name, key):
+        """(cached value, whether the caller should reload and look again) without querying."""
+        age = time.monotonic() - self._loaded_at
+        if age > self.ttl:
+            return None, True
+        value = getattr(self, mapping_name).get(key)
+        # Unknown key: a product may have been created by another worker. Reload,
+        # but at most once a second so bogus names can't force a query per request.
+        return value, value is None and age > 1
+
+    def _lookup(self, mapping_name, key):
+        with self._lock:
+            value, stale = self.peek(mapping_name, key)
+            if stale:
+                self._reload()
+                value = getattr(self, mapping_name).get(key)
+            return value
+
+    def get_id(self, name):
+        return self._lookup('_by_name', name)
+
+    def get_name(self, product_id):
+        return self._lookup('_by_id', product_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+_product_ids = _ProductIdCache(Config.PRODUCT_CACHE_TTL)
 
 class Product:  
+    CACHE_SQL = _ProductIdCache.RELOAD_SQL
+
     @staticmethod
     def create(name, description=None, max_devices=1):
         # Check name uniqueness
@@ -16,6 +77,7 @@ class Product:
                     (name, description, max_devices)
                 )
                 conn.commit()
+                _product_ids.invalidate()
                 return {'success': True, 'product_id': c.lastrowid}
             except Exception as e:
                 conn.rollback()
@@ -26,7 +88,7 @@ class Product:
         """Get all products with pagination."""
         offset = (page - 1) * per_page
         
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             
             # Get total count
@@ -58,7 +120,7 @@ class Product:
     @staticmethod
     def get_by_id(product_id):
         """Get product by ID."""
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM products WHERE id = ?', (product_id,))
             row = c.fetchone()
@@ -66,11 +128,36 @@ class Product:
     @staticmethod
     def get_by_name(name):
         """Get product by name."""
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM products WHERE name = ?', (name,))
             row = c.fetchone()
             return dict(row) if row else None
+
+    @staticmethod
+    def get_id_by_name(name):
+        """Get product ID by name from the in-memory cache."""
+        return _product_ids.get_id(name)
+
+    @staticmethod
+    def get_name_by_id(product_id):
+        """Get product name by ID from the in-memory cache."""
+        return _product_ids.get_name(product_id)
+
+    @staticmethod
+    def peek_cached_id(name):
+        """(cached id, needs reload) without querying; for callers that load rows themselves."""
+        return _product_ids.peek('_by_name', name)
+
+    @staticmethod
+    def store_cache(rows):
+        """Replace the cache with (id, name) rows loaded with Product.CACHE_SQL."""
+        _product_ids.store(rows)
+
+    @staticmethod
+    def invalidate_cache():
+        """Drop cached name/id mappings after products change."""
+        _product_ids.invalidate()
     
     @staticmethod
     def update(product_id, **kwargs):
@@ -93,6 +180,7 @@ class Product:
             c = conn.cursor()
             c.execute(query, values)
             conn.commit()
+            _product_ids.invalidate()
             
             if c.rowcount > 0:
                 return {'success': True, 'message': 'Product updated'}
@@ -1,4 +1,4 @@
-from models.database import get_db_connection
+from models.database import get_db_connection, get_read_connection
 from datetime import datetime
 
 class Setting:
@@ -53,7 +53,7 @@ class Setting:
     @staticmethod
     def get_all():
         """Get all settings."""
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM settings')
             return c.fetchall()
@@ -61,7 +61,7 @@ class Setting:
     @staticmethod
     def get_by_product_id(product_id):
         """Get setting by product ID."""
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             # get setting and product name by product_id
             c.execute('''
@@ -1,4 +1,4 @@
-from models.database import get_db_connection
+from models.database import get_db_connection, get_read_connection
 
 class User:
     @staticmethod
@@ -20,7 +20,7 @@ class User:
     @staticmethod
     def get_by_username(username):
         """Get user by username."""
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT * FROM users WHERE username = ?', (username,))
             row = c.fetchone()
@@ -31,7 +31,7 @@ class User:
         """Get all users with pagination."""
         offset = (page - 1) * per_page
         
-        with get_db_connection() as conn:
+        with get_read_connection() as conn:
             c = conn.cursor()
             
             # Get total count
@@ -0,0 +1,139 @@
+"""Group commit for license mutations.
+
+Each write is a function `fn(conn, *args)` that runs its statements without
+committing. run_write() queues it for this process's writer thread, which
+collects whatever arrives within WRITE_BATCH_WINDOW_MS (up to WRITE_BATCH_MAX
+writes), runs each one in its own savepoint of a single transaction and
+commits once; callers wait on a Future for their function's return value (or
+exception). A write that raises is rolled back alone; a failed COMMIT fails
+the whole batch. Results are only handed out after the commit succeeded.
+
+Write functions must not call run_write() themselves. Callers that already
+hold the write connection (nested in a `with get_db_connection()` block) and
+WRITE_QUEUE_ENABLED=false run the function inline in their own transaction.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import Config
+from models.database import get_db_connection, holds_write_connection, run_blocking
+
+class WriteQueue:
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.largest_batch = 0
+        self.failed_commits = 0
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args); the returned Future resolves after its batch commits."""
+        self._ensure_running()
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def _ensure_running(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._pid = pid
+                threading.Thread(target=self._run, args=(pid,), name='write-queue', daemon=True).start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pid):
+        while self._pid == pid:
+            batch = self._next_batch()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                conn = get_db_connection()
+                try:
+                    outcomes = run_blocking(_apply, conn, batch)
+                finally:
+                    conn.close()
+            except Exception as e:
+                self.failed_commits += 1
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.writes += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for future, result, error in outcomes:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'writes': self.writes,
+            'largest_batch': self.largest_batch,
+            'failed_commits': self.failed_commits
+        }
+
+def _apply(conn, batch):
+    """Run a batch in one transaction, one savepoint per write; [(future, result, error)]."""
+    conn.isolation_level = None  # Explicit BEGIN/SAVEPOINT/COMMIT
+    # IMMEDIATE takes SQLite's write lock up front (no upgrade deadlock with other workers)
+    conn.execute('BEGIN' if conn.dialect == 'postgresql' else 'BEGIN IMMEDIATE')
+    outcomes = []
+    try:
+        for fn, args, future in batch:
+            conn.execute('SAVEPOINT write')
+            try:
+                result = fn(conn, *args)
+            except Exception as e:
+                conn.execute('ROLLBACK TO SAVEPOINT write')
+                outcomes.append((future, None, e))
+            else:
+                outcomes.append((future, result, None))
+            conn.execute('RELEASE SAVEPOINT write')
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    return outcomes
+
+_write_queue = WriteQueue(Config.WRITE_BATCH_WINDOW_MS / 1000, Config.WRITE_BATCH_MAX)
+
+def run_write(fn, *args):
+    """Run fn(conn, *args) in a group-committed transaction and return its result."""
+    if not Config.WRITE_QUEUE_ENABLED or holds_write_connection():
+        with get_db_connection() as conn:
+            return fn(conn, *args)
+    return _write_queue.submit(fn, *args).result()
+
+def write_queue_stats():
+    return {'enabled': Config.WRITE_QUEUE_ENABLED, **_write_queue.stats()}
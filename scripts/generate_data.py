@@ -0,0 +1,294 @@
+"""Generate a production-sized database for scale testing.
+
+Usage:
+    DATABASE_URL=sqlite:///data/scale.db python scripts/generate_data.py \\
+        --products 200 --licenses 10000000 --usage-logs 20000000 --shards 8
+
+The schema comes from the migrations (init_db); rows are bulk-inserted with
+executemany in large transactions, not through License.create. With
+--shards N, N processes generate rows into scratch SQLite files in parallel
+and the main process merges them with INSERT ... SELECT (SQLite has a single
+writer, so only row generation is parallel). Indexes and triggers on the
+loaded tables are dropped during the load and recreated from their original
+SQL afterwards.
+
+Distributions:
+- products: Zipf-like popularity (--product-skew), so a few products hold most licenses
+- licenses: created over the last --days days; --revoked and --expired fractions,
+  the rest active with expiry spread up to a year ahead
+- usage_logs: skewed towards hot licenses, spread over --days days, mostly validations
+
+Generated data is deterministic for a given --seed. License i has key
+license_key(i, seed) and raw machine code machine_code(i, seed), so
+benchmarks and load tests can validate generated licenses.
+"""
+import argparse
+import hashlib
+import itertools
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from models.database import init_db
+
+_BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_KEY_SPACE = 62 ** 16
+# Odd and not a multiple of 31, so i -> i * _KEY_MULTIPLIER mod 62^16 is a bijection
+_KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+
+LICENSE_COLUMNS = ('key', 'product_id', 'user_id', 'status', 'created_at', 'expires_at',
+                   'usage_count', 'credit_number', 'machine_code', 'machine_hash', 'last_used_at')
+USAGE_LOG_COLUMNS = ('license_key', 'ip_address', 'timestamp', 'action', 'user_agent',
+                     'response_status', 'duration_ms', 'error_message')
+LOADED_TABLES = ('licenses', 'usage_logs')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+USER_AGENTS = ('LicenseClient/2.4 (Windows NT 10.0)', 'LicenseClient/2.4 (Macintosh)',
+               'LicenseClient/2.3 (Windows NT 10.0)', 'python-requests/2.32', 'Mozilla/5.0')
+
+def license_key(i, seed=0):
+    """16 alphanumeric characters, unique per index (a scrambled base-62 counter)."""
+    n = ((i + seed * 1000003) * _KEY_MULTIPLIER) % _KEY_SPACE
+    chars = []
+    for _ in range(16):
+        n, digit = divmod(n, 62)
+        chars.append(_BASE62[digit])
+    return ''.join(chars)
+
+def machine_code(i, seed=0):
+    """Raw machine code of license i; the server stores its SHA-256."""
+    return f'machine-{seed}-{i}'
+
+def _db_path(database_url):
+    return database_url.replace('sqlite:///', '', 1) if database_url.startswith('sqlite:///') else database_url
+
+def _zipf_cum_weights(count, skew):
+    weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+    return list(itertools.accumulate(weights))
+
+def _license_batches(start, stop, args, product_ids, now):
+    rng = random.Random(f'{args.seed}-licenses-{start}')
+    # Product ids are shuffled once (same seed everywhere) so popularity isn't tied to id order
+    ranked = list(product_ids)
+    random.Random(args.seed).shuffle(ranked)
+    cum_weights = _zipf_cum_weights(len(ranked), args.product_skew)
+    year = 365 * 86400
+    for batch_start in range(start, stop, args.batch_size):
+        batch_stop = min(batch_start + args.batch_size, stop)
+        size = batch_stop - batch_start
+        products = rng.choices(ranked, cum_weights=cum_weights, k=size)
+        rows = []
+        for offset, i in enumerate(range(batch_start, batch_stop)):
+            digest = hashlib.sha256(machine_code(i, args.seed).encode('utf-8')).digest()
+            created = now - timedelta(seconds=rng.random() * args.days * 86400)
+            roll = rng.random()
+            if roll < args.revoked:
+                status = 'revoked'
+                expires = created + timedelta(seconds=rng.random() * year)
+            elif roll < args.revoked + args.expired:
+                status = 'expired'
+                expires = created + timedelta(seconds=rng.random() * max((now - created).total_seconds(), 1))
+            else:
+                status = 'active'
+                expires = now + timedelta(seconds=3600 + rng.random() * year)
+            usage_count = int(rng.expovariate(1 / 25))
+            last_used = (created + (now - created) * rng.random()).strftime(TIMESTAMP_FORMAT) if usage_count else None
+            rows.append((
+                license_key(i, args.seed), products[offset], f'user-{i}', status,
+                created.isoformat(), expires.isoformat(), usage_count, str(rng.randint(0, 1000)),
+                digest.hex(), digest, last_used
+            ))
+        yield rows
+
+def _usage_log_batches(count, args, first_index, now, stream):
+    rng = random.Random(f'{args.seed}-usage-{stream}')
+    span = args.days * 86400
+    for batch_start in range(0, count, args.batch_size):
+        rows = []
+        for _ in range(min(args.batch_size, count - batch_start)):
+            # random() ** k piles indexes near 0: a small set of hot licenses gets most traffic
+            i = first_index + int(args.licenses * rng.random() ** args.usage_skew)
+            roll = rng.random()
+            action = 'validation' if roll < 0.97 else ('revocation' if roll < 0.99 else 'deletion')
+            failed = rng.random() < args.failure_rate
+            rows.append((
+                license_key(i, args.seed),
+                f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                (now - timedelta(seconds=rng.random() * span)).strftime(TIMESTAMP_FORMAT),
+                action,
+                rng.choice(USER_AGENTS),
+                'failed' if failed else 'success',
+                int(rng.lognormvariate(2.5, 0.6)),
+                'Invalid license key or machine code' if failed else None
+            ))
+        yield rows
+
+def _insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+def _bulk_load(conn, args, product_ids, license_range, first_index, usage_logs, stream, now):
+    """Insert one share of the rows, committing every --commit-every rows."""
+    pending = 0
+    for table, columns, batches in (
+        ('licenses', LICENSE_COLUMNS, _license_batches(*license_range, args, product_ids, now)),
+        ('usage_logs', USAGE_LOG_COLUMNS, _usage_log_batches(usage_logs, args, first_index, now, stream))
+    ):
+        sql = _insert_sql(table, columns)
+        for rows in batches:
+            conn.executemany(sql, rows)
+            pending += len(rows)
+            if pending >= args.commit_every:
+                conn.commit()
+                pending = 0
+    conn.commit()
+
+def _generate_shard(shard_path, table_sql, args, product_ids, license_range, first_index, usage_logs, stream, now):
+    """Worker process: write one share of the rows into its own scratch database."""
+    conn = sqlite3.connect(shard_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for sql in table_sql:
+        conn.execute(sql)
+    _bulk_load(conn, args, product_ids, license_range, first_index, usage_logs, stream, now)
+    conn.close()
+    return shard_path
+
+def _merge_shard(conn, shard_path):
+    conn.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+    try:
+        with conn:
+            conn.execute(f"INSERT INTO licenses ({', '.join(LICENSE_COLUMNS)}) "
+                         f"SELECT {', '.join(LICENSE_COLUMNS)} FROM shard.licenses")
+            conn.execute(f"INSERT INTO usage_logs ({', '.join(USAGE_LOG_COLUMNS)}) "
+                         f"SELECT {', '.join(USAGE_LOG_COLUMNS)} FROM shard.usage_logs")
+    finally:
+        conn.execute('DETACH DATABASE shard')
+
+def _drop_indexes_and_triggers(conn):
+    """Drop secondary indexes and triggers on the loaded tables; return their SQL for later."""
+    placeholders = ','.join('?' * len(LOADED_TABLES))
+    saved = conn.execute(f'''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND tbl_name IN ({placeholders}) AND sql IS NOT NULL
+    ''', LOADED_TABLES).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    conn.commit()
+    return saved
+
+def _restore_indexes_and_triggers(conn, saved):
+    # Indexes first: building each one once over the full table is what makes deferring them pay off
+    for kind, _, sql in sorted(saved, key=lambda item: item[0] != 'index'):
+        conn.execute(sql)
+    # The change-counter triggers were skipped; bump them once so cached ETags go stale
+    conn.execute("UPDATE data_versions SET version = version + 1 WHERE name IN ('licenses', 'usage_logs')")
+    conn.commit()
+
+def _ensure_products(conn, args):
+    existing = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    rng = random.Random(f'{args.seed}-products')
+    with conn:
+        for n in range(existing, args.products):
+            cursor = conn.execute('INSERT OR IGNORE INTO products (name, description, max_devices) VALUES (?, ?, ?)',
+                                  (f'Product {n:05d}', f'Generated product {n}', rng.choice((1, 1, 1, 2, 3, 5))))
+            conn.execute('''
+                INSERT OR IGNORE INTO settings (product_id, number_of_credits, license_duration_hours)
+                VALUES (?, ?, ?)
+            ''', (cursor.lastrowid, rng.choice((100, 500, 1000, 5000)), rng.choice((24, 168, 720, 8760))))
+    return [row[0] for row in conn.execute('SELECT id FROM products ORDER BY id')]
+
+def _split(total, parts):
+    """[(start, stop)] covering range(total) in `parts` near-equal slices."""
+    bounds = [total * k // parts for k in range(parts + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+def generate(args):
+    path = _db_path(args.database or Config.SQLALCHEMY_DATABASE_URI)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    Config.SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    init_db()
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute(f'PRAGMA cache_size=-{args.cache_mb * 1024}')
+    started = time.perf_counter()
+    product_ids = _ensure_products(conn, args)
+    first_index = conn.execute('SELECT COALESCE(MAX(id), 0) FROM licenses').fetchone()[0]
+    now = datetime.now()
+    print(f"Generating {args.licenses:,} licenses (from index {first_index:,}) and "
+          f"{args.usage_logs:,} usage logs across {len(product_ids)} products into {path}")
+
+    saved = _drop_indexes_and_triggers(conn) if args.defer_indexes else []
+    # Restored even when the load fails: validation queries name idx_licenses_validate
+    try:
+        license_ranges = [(first_index + start, first_index + stop)
+                          for start, stop in _split(args.licenses, args.shards)]
+        usage_counts = [stop - start for start, stop in _split(args.usage_logs, args.shards)]
+        if args.shards == 1:
+            _bulk_load(conn, args, product_ids, license_ranges[0], first_index, usage_counts[0], 0, now)
+        else:
+            table_sql = [row[0] for row in conn.execute(f'''
+                SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ({','.join('?' * len(LOADED_TABLES))})
+            ''', LOADED_TABLES)]
+            scratch = tempfile.mkdtemp(prefix='generate-data-', dir=args.scratch_dir)
+            jobs = [(os.path.join(scratch, f'shard-{n}.db'), table_sql, args, product_ids, license_ranges[n],
+                     first_index, usage_counts[n], n, now) for n in range(args.shards)]
+            with multiprocessing.Pool(args.shards) as pool:
+                for shard_path in pool.starmap(_generate_shard, jobs):
+                    _merge_shard(conn, shard_path)
+                    os.remove(shard_path)
+            os.rmdir(scratch)
+        print(f"Rows loaded in {time.perf_counter() - started:.1f}s")
+    finally:
+        if saved:
+            conn.rollback()  # Rows of a failed batch; every finished batch is committed
+            rebuild_started = time.perf_counter()
+            _restore_indexes_and_triggers(conn, saved)
+            print(f"Rebuilt {sum(kind == 'index' for kind, _, _ in saved)} indexes "
+                  f"in {time.perf_counter() - rebuild_started:.1f}s")
+
+    conn.execute('ANALYZE')
+    conn.close()
+    total_rows = args.licenses + args.usage_logs
+    elapsed = time.perf_counter() - started
+    print(f"Done: {total_rows:,} rows in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/s). "
+          "Run `python -m services.usage_log_service` to build usage rollups.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic licenses and usage logs for scale testing.')
+    parser.add_argument('--database', help='SQLite file (default: DATABASE_URL)')
+    parser.add_argument('--products', type=int, default=100, help='Total products to have (existing ones count)')
+    parser.add_argument('--licenses', type=int, default=1000000, help='Licenses to add')
+    parser.add_argument('--usage-logs', type=int, default=5000000, help='Usage log rows to add')
+    parser.add_argument('--days', type=int, default=90, help='Spread creation and usage times over this many days')
+    parser.add_argument('--revoked', type=float, default=0.03, help='Fraction of revoked licenses')
+    parser.add_argument('--expired', type=float, default=0.12, help='Fraction of expired licenses')
+    parser.add_argument('--product-skew', type=float, default=1.1, help='Zipf exponent of product popularity')
+    parser.add_argument('--usage-skew', type=float, default=3.0, help='Higher concentrates usage on fewer licenses')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='Fraction of failed usage log entries')
+    parser.add_argument('--shards', type=int, default=1, help='Parallel generator processes')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Rows per executemany call')
+    parser.add_argument('--commit-every', type=int, default=500000, help='Rows per transaction')
+    parser.add_argument('--cache-mb', type=int, default=512, help='SQLite page cache for the load')
+    parser.add_argument('--scratch-dir', help='Where shard files are written (default: system temp)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-defer-indexes', dest='defer_indexes', action='store_false',
+                        help='Keep indexes and triggers during the load (faster for small appends)')
+    args = parser.parse_args()
+    if args.revoked + args.expired > 1:
+        parser.error('--revoked + --expired must not exceed 1')
+    if args.shards < 1 or args.products < 1:
+        parser.error('--shards and --products must be at least 1')
+    generate(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""License validation for the ASGI service, without blocking the event loop.
+
+Same rules and responses as services.license_service.validate_license and
+services.rate_limiter.suspicious_activity_check (run only when
+suspicious_activity_enabled, as in the Flask app): the SQL, the result builder
+and the thresholds are shared, only the I/O is awaited (aiosqlite, redis.asyncio).
+"""
+import asyncio
+import logging
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from models.license import License
+from models.product import Product
+from services.rate_limiter import RECENT_REQUESTS_LIMIT, RECENT_REQUESTS_WINDOW, SPAM_SCORE_LIMIT
+from utils.hash_utils import machine_code_digest
+
+logger = logging.getLogger('license_server.validation')
+
+class AsyncLicenseValidator:
+    def __init__(self, db):
+        self.db = db
+        self._reload_lock = asyncio.Lock()
+
+    async def get_product_id(self, product_name):
+        """Product id from the process-wide cache; one reload at a time when it is stale."""
+        product_id, stale = Product.peek_cached_id(product_name)
+        if not stale:
+            return product_id
+        async with self._reload_lock:
+            # Another request may have reloaded while this one waited
+            product_id, stale = Product.peek_cached_id(product_name)
+            if stale:
+                Product.store_cache(await self.db.fetchall(Product.CACHE_SQL))
+                product_id, _ = Product.peek_cached_id(product_name)
+        return product_id
+
+    async def validate(self, product_name, license_key, machine_code):
+        product_id = await self.get_product_id(product_name)
+        if product_id is None:
+            return {'valid': False, 'error': 'Product not found'}
+
+        machine_hash = machine_code_digest(machine_code)
+        row = await self.db.fetchone(License.VALIDATE_SQL, (license_key, product_id, machine_hash))
+        result, newly_expired = License.validation_result(row, product_name, machine_hash)
+        if newly_expired:
+            await self.db.execute(License.EXPIRE_SQL, (license_key,))
+        return result
+
+async def connect_redis(url):
+    """redis.asyncio client, or None when Redis is unreachable (checks are then skipped)."""
+    client = aioredis.from_url(url, decode_responses=True, socket_connect_timeout=5,
+                               socket_timeout=5, retry_on_timeout=True, max_connections=20)
+    try:
+        await client.ping()
+        logger.info('Redis connection established for suspicious activity checks')
+        return client
+    except Exception as e:
+        logger.warning(f'Redis connection failed: {e}. Suspicious activity checks disabled.')
+        await client.aclose()
+        return None
+
+async def suspicious_activity_check(client, ip_address):
+    """Async twin of services.rate_limiter.suspicious_activity_check; Redis errors allow the request."""
+    if client is None:
+        return False
+    try:
+        try:
+            spam_score = await client.get(f"spam_score:{ip_address}")
+            if spam_score and int(spam_score) > SPAM_SCORE_LIMIT:
+                return True
+        except redis.RedisError:
+            return False
+
+        now = time.time()
+        try:
+            recent_requests = await client.zcount(
+                f"requests:{ip_address}", int(now - RECENT_REQUESTS_WINDOW), int(now))
+            if recent_requests > RECENT_REQUESTS_LIMIT:
+                await client.incr(f"spam_score:{ip_address}")
+                await client.expire(f"spam_score:{ip_address}", 86400)  # 24 hours
+                return True
+        except redis.RedisError:
+            return False
+
+        try:
+            await client.zadd(f"requests:{ip_address}", {str(now): now})
+            await client.expire(f"requests:{ip_address}", 3600)  # 1 hour
+        except redis.RedisError:
+            pass
+        return False
+    except Exception as e:
+        logger.error(f"Rate limiting error for {ip_address}: {e}")
+        return False
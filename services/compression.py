@@ -0,0 +1,91 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/plain', 'text/css', 'text/csv',
+    'application/javascript', 'text/javascript'
+}
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encodings):
+    """Best encoding the client accepts ('br' preferred), or None."""
+    for encoding in supported_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.get('COMPRESSION_BROTLI_QUALITY', 4))
+    return gzip.compress(data, compresslevel=config.get('COMPRESSION_GZIP_LEVEL', 5), mtime=0)
+
+def decompress(data, encoding, max_size=None):
+    """Inflate client-sent data, refusing output larger than max_size."""
+    if encoding == 'br':
+        if brotli is None:
+            raise ValueError('brotli is not installed')
+        return _brotli_decompress(data, max_size)
+    else:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        result = decompressor.decompress(data, max_size + 1 if max_size else 0)
+    if max_size and len(result) > max_size:
+        raise ValueError('Decompressed body too large')
+    return result
+
+def _brotli_decompress(data, max_size):
+    if not max_size:
+        return brotli.decompress(data)
+    decompressor = brotli.Decompressor()
+    if not hasattr(decompressor, 'can_accept_more_data'):
+        # Before brotli 1.2 output cannot be bounded: a small body may inflate to gigabytes
+        raise ValueError('brotli request bodies need brotli>=1.2')
+    result = bytearray(decompressor.process(data, output_buffer_limit=max_size + 1))
+    while len(result) <= max_size and not decompressor.is_finished() and not decompressor.can_accept_more_data():
+        result += decompressor.process(b'', output_buffer_limit=max_size + 1 - len(result))
+    if len(result) > max_size:
+        raise ValueError('Decompressed body too large')
+    if not decompressor.is_finished():
+        raise ValueError('Truncated brotli body')
+    return bytes(result)
+
+def init_compression(app):
+    """Compress large text/JSON responses per Accept-Encoding.
+
+    Register this before the encryption hook: after_request hooks run in
+    reverse order, so compression then sees the final (wrapped) body.
+    v2 encrypted envelopes compress their plaintext instead and are skipped here.
+    """
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get('COMPRESSION_ENABLED', True):
+            return response
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or 'X-Encryption-Version' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESSION_MIN_BYTES', 1024):
+            return response
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding, app.config))
+        response.headers['Content-Encoding'] = encoding
+        # A strong ETag names exact bytes, so each coding gets its own tag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+    return app
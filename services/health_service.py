@@ -0,0 +1,225 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from flask import g
+
+from services import rate_limiter
+
+def _now_iso():
+    return datetime.utcnow().isoformat()
+
+class HealthProber:
+    """Refreshes component health in a background thread; endpoints read the cached snapshot.
+
+    The thread is started lazily and restarted when the process id changes,
+    so it survives gunicorn's fork after preload_app.
+    """
+    def __init__(self, interval=10, stale_after=30):
+        self.interval = interval
+        self.stale_after = stale_after
+        self._checks = {}  # name -> (fn, critical)
+        self._stats = {}   # name -> fn returning a dict
+        self._components = {}
+        self._snapshot = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def register_check(self, name, fn, critical=True):
+        """fn() raises on failure; its return value (if any) is reported as detail."""
+        self._checks[name] = (fn, critical)
+
+    def register_stats(self, name, fn):
+        """fn() returns a dict of gauges (pool usage, sessions, ...) for the snapshot."""
+        self._stats[name] = fn
+
+    def request_started(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def refresh(self, critical_only=False):
+        """Run every check once and publish a new snapshot."""
+        components = {}
+        for name, (fn, critical) in list(self._checks.items()):
+            if critical_only and not critical:
+                continue
+            previous = self._components.get(name, {})
+            start = time.perf_counter()
+            try:
+                detail = fn()
+                status, error = 'ok', None
+            except Exception as e:
+                detail, status, error = None, 'error', str(e)
+            components[name] = {
+                'status': status,
+                'critical': critical,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+                'checked_at': _now_iso(),
+                'detail': detail,
+                'last_error': error or previous.get('last_error'),
+                'last_error_at': _now_iso() if error else previous.get('last_error_at')
+            }
+        stats = {}
+        for name, fn in list(self._stats.items()):
+            try:
+                stats[name] = fn()
+            except Exception as e:
+                stats[name] = {'error': str(e)}
+
+        if any(c['status'] != 'ok' and c['critical'] for c in components.values()):
+            status = 'unhealthy'
+        elif any(c['status'] != 'ok' for c in components.values()):
+            status = 'degraded'
+        else:
+            status = 'healthy'
+        self._components = components
+        # Swap in a complete snapshot; readers never see a half-built dict
+        self._snapshot = {
+            'status': status,
+            'refreshed_at': time.time(),
+            'components': components,
+            'stats': stats
+        }
+
+    def _run(self, pid):
+        while self._pid == pid:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def ensure_running(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            if self._snapshot is None:
+                # Prime with the fast critical checks; the thread fills in the rest
+                self.refresh(critical_only=True)
+            threading.Thread(target=self._run, args=(pid,), name='health-prober', daemon=True).start()
+
+    def snapshot(self):
+        """Latest snapshot, marked unhealthy if the prober has stopped refreshing it."""
+        self.ensure_running()
+        snapshot = dict(self._snapshot)
+        age = time.time() - snapshot['refreshed_at']
+        snapshot['age_seconds'] = round(age, 3)
+        if age > self.stale_after:
+            snapshot['status'] = 'unhealthy'
+            snapshot['stale'] = True
+        with self._lock:
+            snapshot['stats'] = dict(snapshot['stats'], requests={'in_flight': self._in_flight})
+        return snapshot
+
+health_prober = HealthProber()
+
+def _check_database():
+    from models.database import get_read_connection
+    conn = get_read_connection()
+    try:
+        conn.execute('SELECT 1').fetchone()
+    finally:
+        conn.close()
+
+def _check_schema():
+    # Workers don't migrate outside development; until `python -m models.migrations`
+    # runs, validation queries fail on missing indexes, so the instance is not ready
+    from models.migrations import get_pending_migrations
+    pending = get_pending_migrations()
+    if pending:
+        raise RuntimeError(f"Pending migrations: {', '.join(f'{version:03d}' for version, _ in pending)}")
+    return 'current'
+
+def _check_redis():
+    client = rate_limiter.redis_client
+    if client is None:
+        return 'not configured'
+    client.ping()
+    return 'connected'
+
+def _redis_pool_stats():
+    client = rate_limiter.redis_client
+    if client is None:
+        return {'configured': False}
+    pool = client.connection_pool
+    in_use = len(getattr(pool, '_in_use_connections', ()))
+    return {
+        'in_use': in_use,
+        'idle': len(getattr(pool, '_available_connections', ())),
+        'max': pool.max_connections,
+        'saturation': round(in_use / pool.max_connections, 3) if pool.max_connections else None
+    }
+
+def _session_stats():
+    from api.security import session_manager
+    return {
+        'active_sessions': len(session_manager.sessions),
+        'resumed_sessions': len(session_manager.resumed_sessions)
+    }
+
+def _logging_stats():
+    from utils.logger import log_pipeline
+    return log_pipeline.stats()
+
+def _db_threadpool_stats():
+    from models.database import blocking_pool_stats
+    return blocking_pool_stats()
+
+def _db_pool_stats():
+    from models.database import db_pool_stats
+    return db_pool_stats()
+
+def _write_queue_stats():
+    from models.write_queue import write_queue_stats
+    return write_queue_stats()
+
+def _internet_check(target, timeout):
+    host, _, port = target.rpartition(':')
+    def check():
+        socket.create_connection((host, int(port)), timeout=timeout).close()
+        return 'connected'
+    return check
+
+def init_health(app):
+    """Configure the prober and count in-flight requests for the snapshot."""
+    health_prober.interval = app.config.get('HEALTH_CHECK_INTERVAL', 10)
+    health_prober.stale_after = max(3 * health_prober.interval, health_prober.interval + 5)
+    health_prober.register_check('database', _check_database)
+    health_prober.register_check('schema', _check_schema)
+    health_prober.register_check('redis', _check_redis, critical=False)
+    target = app.config.get('HEALTH_INTERNET_CHECK')
+    if target:
+        health_prober.register_check(
+            'internet', _internet_check(target, app.config.get('HEALTH_CHECK_TIMEOUT', 2)), critical=False)
+    health_prober.register_stats('sessions', _session_stats)
+    health_prober.register_stats('redis_pool', _redis_pool_stats)
+    health_prober.register_stats('logging', _logging_stats)
+    health_prober.register_stats('db_threadpool', _db_threadpool_stats)
+    health_prober.register_stats('db_pool', _db_pool_stats)
+    health_prober.register_stats('write_queue', _write_queue_stats)
+
+    @app.before_request
+    def count_request_start():
+        health_prober.request_started()
+        g.health_counted = True
+
+    @app.teardown_request
+    def count_request_end(exc):
+        # An earlier before_request may have answered before we counted this one
+        if g.pop('health_counted', False):
+            health_prober.request_finished()
+
+    return health_prober
@@ -0,0 +1,73 @@
+import hashlib
+import sqlite3
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+from services.compression import supported_encodings
+
+def get_data_versions(tables):
+    """Change counters for `tables` (see migrations/m006_data_versions.py)."""
+    from models.database import get_read_connection
+    conn = get_read_connection()
+    try:
+        placeholders = ','.join('?' * len(tables))
+        rows = conn.execute(
+            f'SELECT name, version FROM data_versions WHERE name IN ({placeholders})', tables
+        ).fetchall()
+    finally:
+        conn.close()
+    versions = {row[0]: row[1] for row in rows}
+    return tuple(versions.get(table, 0) for table in tables)
+
+def _compute_etag(tables):
+    try:
+        versions = get_data_versions(tables)
+    except sqlite3.OperationalError:
+        return None  # Schema not migrated yet; serve without validators
+    bucket_seconds = current_app.config.get('ETAG_TIME_BUCKET_SECONDS', 60)
+    material = '|'.join((
+        request.path,
+        request.query_string.decode('latin-1'),
+        ','.join(map(str, versions)),
+        # Results also depend on the clock (expiry, "last 3 days" stats)
+        str(int(time.time() // bucket_seconds)) if bucket_seconds else '',
+        # Encrypted bodies are only reusable within the same session key
+        request.headers.get('X-Session-ID') or request.headers.get('X-Session-Ticket') or '',
+        request.headers.get('X-Encryption-Version', '')
+    ))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+def _matching_etag(etag):
+    """The tag from If-None-Match naming the current version (plain or per-coding), if any."""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    if if_none_match.star_tag:
+        return etag
+    for tag in [etag] + [f'{etag}-{encoding}' for encoding in supported_encodings()]:
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+def conditional_get(*tables):
+    """Strong ETag from the data versions of `tables`; 304 if the client's copy is current."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _compute_etag(tables)
+            if etag is None:
+                return view(*args, **kwargs)
+            matched = _matching_etag(etag)
+            if matched:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+                return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
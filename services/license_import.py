@@ -0,0 +1,218 @@
+"""Bulk license import from CSV or XLSX, for POST /api/licenses/import and the CLI.
+
+Usage: python -m services.license_import FILE [--sheet Licenses] [--chunk-size 1000]
+           [--hashed-machine-codes] [--dry-run]
+
+The file is read a row at a time (csv module, openpyxl in read-only mode) and
+handled in chunks of IMPORT_CHUNK_SIZE rows: each chunk is validated, its
+machine codes hashed, checked against existing licenses with a few set-based
+queries and inserted with one executemany in its own transaction. A bad row
+never stops the import; it is reported with its line number.
+
+Columns (header row, any order and case; the /backup export's Licenses sheet
+works as is with --hashed-machine-codes):
+    product_name or product_id   required
+    user_id, machine_code        required; machine_code raw unless hashed
+    key                          optional, generated when empty
+    credit_number, status, expires_at, created_at   optional; credit_number a whole number >= 0
+                                                    (default 0), no expires_at = never expires
+"""
+import argparse
+import codecs
+import csv
+import json
+import logging
+import os
+import sys
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+
+from config import Config
+from models.license import License
+from models.product import Product
+from utils.hash_utils import generate_license_key, machine_code_digest, machine_hash_from_hex, validate_license_format
+
+logger = logging.getLogger('license_server.import')
+
+_STATUSES = ('active', 'expired', 'revoked')
+# Unreadable files: bad CSV, not an XLSX (zip) archive, unknown sheet
+_READ_ERRORS = (csv.Error, zipfile.BadZipFile, KeyError, OSError)
+
+def read_rows(stream, filename, sheet=None):
+    """Yield (line number, {column: value}) from a binary CSV or XLSX stream, skipping blank rows."""
+    if os.path.splitext(filename)[1].lower() in ('.xlsx', '.xlsm'):
+        rows = _xlsx_rows(stream, sheet)
+    else:
+        rows = csv.reader(codecs.getreader('utf-8-sig')(stream, errors='replace'))
+    header = None
+    for number, values in enumerate(rows, start=1):
+        if header is None:
+            header = [str(value or '').strip().lower() for value in values]
+            continue
+        if any(value not in (None, '') for value in values):
+            yield number, dict(zip(header, values))
+
+def _xlsx_rows(stream, sheet):
+    from openpyxl import load_workbook  # Only needed for spreadsheets
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        if sheet:
+            worksheet = workbook[sheet]
+        else:
+            worksheet = workbook['Licenses'] if 'Licenses' in workbook.sheetnames else workbook.active
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Spreadsheets store numbers as floats
+    return str(value).strip()
+
+def _timestamp(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return datetime.fromisoformat(_text(value)).isoformat()
+
+def _validate(number, record, hashed):
+    """The insert row for one record, or raise ValueError with the reason."""
+    product_name = _text(record.get('product_name'))
+    if product_name:
+        product_id = Product.get_id_by_name(product_name)
+        if product_id is None:
+            raise ValueError(f'Product not found: {product_name}')
+    else:
+        product_id = _text(record.get('product_id'))
+        if not product_id.isdigit() or Product.get_name_by_id(int(product_id)) is None:
+            raise ValueError('product_name or an existing product_id is required')
+        product_id = int(product_id)
+
+    user_id = _text(record.get('user_id'))
+    machine_code = _text(record.get('machine_code'))
+    if not user_id or not machine_code:
+        raise ValueError('user_id and machine_code are required')
+    key = _text(record.get('key')) or generate_license_key()
+    if not validate_license_format(key):
+        raise ValueError('Invalid license key format')
+    credit_number = _text(record.get('credit_number')) or '0'
+    if not credit_number.isdecimal():
+        raise ValueError('credit_number must be a non-negative integer')
+    status = _text(record.get('status')).lower() or 'active'
+    if status not in _STATUSES:
+        raise ValueError(f"status must be one of {', '.join(_STATUSES)}")
+    try:
+        expires_at = _timestamp(record.get('expires_at'))
+        created_at = _timestamp(record.get('created_at')) or datetime.now().isoformat()
+    except ValueError:
+        raise ValueError('expires_at and created_at must be ISO dates or datetimes')
+
+    if hashed:
+        machine_hash = machine_hash_from_hex(machine_code.lower())
+        if machine_hash is None:
+            raise ValueError('machine_code must be a SHA-256 hex digest')
+    else:
+        machine_hash = None  # Hashed for the whole chunk at once
+    return {'row': number, 'key': key, 'product_id': product_id, 'user_id': user_id,
+            'credit_number': str(int(credit_number)), 'machine_code': machine_code,
+            'machine_hash': machine_hash, 'expires_at': expires_at, 'created_at': created_at, 'status': status}
+
+def import_licenses(rows, chunk_size=None, hashed_machine_codes=False, dry_run=False, progress=None):
+    """Import (line number, record) pairs from read_rows; returns a summary with per-row errors.
+
+    `progress(summary)` is called after every chunk. With dry_run everything is
+    validated and checked for duplicates but nothing is written.
+    """
+    chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
+    summary = {'success': True, 'dry_run': dry_run, 'rows': 0, 'imported': 0, 'failed': 0, 'errors': []}
+    seen_keys, seen_users, seen_machines = set(), set(), set()
+
+    def fail(number, error):
+        summary['failed'] += 1
+        if len(summary['errors']) < Config.IMPORT_MAX_ERRORS:
+            summary['errors'].append({'row': number, 'error': error})
+
+    rows = iter(rows)
+    Product.invalidate_cache()  # Products created just before the import
+    while True:
+        try:
+            chunk = list(islice(rows, chunk_size))
+        except _READ_ERRORS as e:
+            # Chunks before this point stay imported
+            summary['success'] = False
+            summary['error'] = f'Could not read the file after row {summary["rows"]}: {e}'
+            break
+        if not chunk:
+            break
+        summary['rows'] += len(chunk)
+        valid = []
+        for number, record in chunk:
+            try:
+                valid.append(_validate(number, record, hashed_machine_codes))
+            except ValueError as e:
+                fail(number, str(e))
+        if not hashed_machine_codes:
+            for row, digest in zip(valid, map(machine_code_digest, [row['machine_code'] for row in valid])):
+                row['machine_hash'], row['machine_code'] = digest, digest.hex()
+
+        # Duplicates within the file; clashes with stored licenses are found in the database
+        unique = []
+        for row in valid:
+            user, machine = (row['product_id'], row['user_id']), (row['product_id'], row['machine_hash'])
+            if row['key'] in seen_keys:
+                fail(row['row'], 'Duplicate license key in file')
+            elif user in seen_users or machine in seen_machines:
+                fail(row['row'], 'Duplicate user or machine for the product in file')
+            else:
+                seen_keys.add(row['key'])
+                seen_users.add(user)
+                seen_machines.add(machine)
+                unique.append(row)
+
+        if unique:
+            try:
+                conflicts = License.import_rows(unique, dry_run=dry_run)
+            except Exception as e:
+                conflicts = {row['row']: f'Insert failed: {e}' for row in unique}
+            for number, error in sorted(conflicts.items()):
+                fail(number, error)
+            summary['imported'] += len(unique) - len(conflicts)
+        if progress:
+            progress(summary)
+    summary['errors_truncated'] = summary['failed'] > len(summary['errors'])
+    logger.info('License import%s: %d rows, %d imported, %d failed', ' (dry run)' if dry_run else '',
+                summary['rows'], summary['imported'], summary['failed'])
+    return summary
+
+def import_file(stream, filename, sheet=None, **options):
+    """import_licenses over read_rows(stream, filename, sheet)."""
+    return import_licenses(read_rows(stream, filename, sheet), **options)
+
+def main():
+    parser = argparse.ArgumentParser(description='Import licenses from a CSV or XLSX file.')
+    parser.add_argument('file')
+    parser.add_argument('--sheet', help='Worksheet to read (default: Licenses, else the first one)')
+    parser.add_argument('--chunk-size', type=int, help='Rows per transaction (default: IMPORT_CHUNK_SIZE)')
+    parser.add_argument('--hashed-machine-codes', action='store_true',
+                        help='machine_code holds SHA-256 hex digests (e.g. the /backup export)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and check duplicates only')
+    args = parser.parse_args()
+
+    def report(summary):
+        print(f"\r{summary['rows']} rows, {summary['imported']} {'valid' if args.dry_run else 'imported'}, "
+              f"{summary['failed']} failed", end='', file=sys.stderr, flush=True)
+
+    with open(args.file, 'rb') as f:
+        summary = import_file(f, args.file, args.sheet, chunk_size=args.chunk_size,
+                              hashed_machine_codes=args.hashed_machine_codes, dry_run=args.dry_run, progress=report)
+    print(file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+    if not summary['success']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
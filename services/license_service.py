@@ -1,7 +1,9 @@
 from datetime import datetime
+from config import Config
 from models.license import License
 from models.product import Product
-from utils.hash_utils import hash_license_key
+from services.usage_log_service import count_events
+from utils.hash_utils import hash_license_key, validate_license_format
 
 def create_license(product_id, user_id, credit_number, machine_code,expires_hours=24):
     """Create a new license for a product."""
@@ -14,13 +16,16 @@ def create_license(product_id, user_id, credit_number, machine_code,expires_hour
 
 def get_licenses(search_query="", page=1, per_page=10):
     """Get all licenses with pagination."""
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     
     offset = (page - 1) * per_page
     # Get keywords from search_query ignore empty strings
     keywords = [kw.strip() for kw in search_query.split(',') if kw.strip()]
+
+    # update licenses expired status
+    License.expire_overdue()
     
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         if(keywords):
             query_conditions = []
@@ -40,14 +45,6 @@ def get_licenses(search_query="", page=1, per_page=10):
         else:
             c.execute("SELECT COUNT(*) FROM licenses")
         total = c.fetchone()[0]
-
-        # update licenses expired status
-        c.execute('''
-            UPDATE licenses
-            SET status = 'expired'
-            WHERE expires_at IS NOT NULL AND expires_at < ? AND status != 'revoked'
-        ''', (datetime.now().isoformat(),))
-        conn.commit()
         
         if(keywords):
             data_query = f'''
@@ -72,6 +69,7 @@ def get_licenses(search_query="", page=1, per_page=10):
         licenses = []
         for row in c.fetchall():
             license_data = dict(row)
+            license_data.pop('machine_hash', None)  # Binary copy of machine_code, not JSON serializable
             # Show partial key for security
             license_data['key_display'] = license_data['key'][:8] + '...' if license_data['key'] else None
             license_data['key']  # Hide full key
@@ -83,9 +81,9 @@ def get_licenses(search_query="", page=1, per_page=10):
 
 def get_license_detail(license_key):
     """Get detailed information for a specific license."""
-    from models.database import get_db_connection
+    from models.database import get_read_connection
 
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         c.execute('''
             SELECT l.*, p.name as product_name
@@ -97,16 +95,17 @@ def get_license_detail(license_key):
         if not row:
             return None
         license_data = dict(row)
+        license_data.pop('machine_hash', None)  # Binary copy of machine_code, not JSON serializable
         # Optionally, hide the full key in the response
         license_data['key_display'] = license_data['key']
         return license_data
 
 def get_license_stats():
     """Get overall license statistics."""
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     from datetime import datetime, timedelta
     
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         
         # Basic stats
@@ -126,14 +125,9 @@ def get_license_stats():
         c.execute("SELECT AVG(usage_count) as avg_usage, MAX(usage_count) as max_usage FROM licenses")
         usage_stats = c.fetchone()
         
-        # Recent activity (last 3 days)
+        # Recent activity (last 3 days), from rollups plus the raw tail
         week_ago = datetime.now() - timedelta(days=3)
-        c.execute('''
-            SELECT COUNT(*) as recent_validations
-            FROM usage_logs 
-            WHERE action = 'validation' AND timestamp > ?
-        ''', (week_ago,))
-        recent_validations = c.fetchone()['recent_validations']
+        recent_validations = count_events('validation', week_ago)
         
         return {
             'total_licenses': total_licenses,
@@ -152,16 +146,80 @@ def revoke_license(license_key):
 def delete_license(license_key):
     """Delete a license key."""
     return License.delete(license_key)
+
+BULK_ACTIONS = ('revoke', 'delete', 'extend')
+_BULK_FILTERS = ('product', 'product_id', 'user_id', 'status', 'created_from', 'created_to')
+
+def bulk_license_action(action, data):
+    """Revoke, delete or extend many licenses with one set-based statement per key chunk.
+
+    data: `keys` (list) and/or `filter` ({product or product_id, user_id, status,
+    created_from, created_to}), `hours` for extend, and `dry_run` to only count.
+    """
+    if not isinstance(data, dict):
+        return {'success': False, 'error': 'Request body must be a JSON object'}
+    keys = data.get('keys') or []
+    criteria = data.get('filter') or {}
+    if not isinstance(keys, list) or not all(isinstance(key, str) and validate_license_format(key) for key in keys):
+        return {'success': False, 'error': 'keys must be a list of license keys'}
+    if len(keys) > Config.BULK_MAX_KEYS:
+        return {'success': False, 'error': f'At most {Config.BULK_MAX_KEYS} keys per request'}
+    if not isinstance(criteria, dict):
+        return {'success': False, 'error': 'filter must be an object'}
+    unknown = sorted(set(criteria) - set(_BULK_FILTERS))
+    if unknown:
+        return {'success': False, 'error': f"Unknown filter fields: {', '.join(unknown)}"}
+
+    filters = {name: criteria[name] for name in ('user_id', 'status') if criteria.get(name) not in (None, '')}
+    if 'user_id' in filters:
+        if not isinstance(filters['user_id'], (str, int)) or isinstance(filters['user_id'], bool):
+            return {'success': False, 'error': 'user_id must be a string'}
+        filters['user_id'] = str(filters['user_id'])
+    if filters.get('status') not in (None, 'active', 'expired', 'revoked'):
+        return {'success': False, 'error': 'status must be active, expired or revoked'}
+    if criteria.get('product'):
+        if not isinstance(criteria['product'], str):
+            return {'success': False, 'error': 'product must be a product name'}
+        filters['product_id'] = Product.get_id_by_name(criteria['product'])
+        if filters['product_id'] is None:
+            return {'success': False, 'error': 'Product not found'}
+    elif criteria.get('product_id') is not None:
+        if not isinstance(criteria['product_id'], int) or isinstance(criteria['product_id'], bool):
+            return {'success': False, 'error': 'product_id must be an integer'}
+        filters['product_id'] = criteria['product_id']
+    for name in ('created_from', 'created_to'):
+        if criteria.get(name):
+            try:
+                filters[name] = datetime.fromisoformat(criteria[name]).isoformat()
+            except (TypeError, ValueError):
+                return {'success': False, 'error': f'{name} must be an ISO date or datetime'}
+    if not keys and not filters:
+        return {'success': False, 'error': 'keys or filter required'}
+
+    hours = data.get('hours')
+    if action == 'extend' and (not isinstance(hours, int) or isinstance(hours, bool)
+                               or not 0 < hours <= Config.BULK_MAX_EXTEND_HOURS):
+        return {'success': False, 'error': f'hours must be an integer from 1 to {Config.BULK_MAX_EXTEND_HOURS}'}
+
+    conditions = License.bulk_conditions(keys=keys, **filters)
+    if data.get('dry_run'):
+        return {'success': True, 'action': action, 'dry_run': True,
+                'matched': License.count_matching(conditions, action)}
+    if action == 'revoke':
+        affected = License.bulk_revoke(conditions)
+    elif action == 'delete':
+        affected = License.bulk_delete(conditions)
+    else:
+        affected = License.bulk_extend(conditions, hours)
+    return {'success': True, 'action': action, 'affected': affected}
     
 def validate_license(product_name, license_key, machine_code):
     """Validate a license key for a product."""
-    # Find product by name
-    product = Product.get_by_name(product_name)
-    print(product)
-    if not product:
+    # Find product by name (cached name -> id map, no query on the hot path)
+    product_id = Product.get_id_by_name(product_name)
+    if product_id is None:
         return {'valid': False, 'error': 'Product not found'}
 
-    product_id = product['id']
     # Validate license using License model
-    result = License.validate(product_id, license_key, machine_code)
+    result = License.validate(product_id, license_key, machine_code, product_name=product_name)
     return result
\ No newline at end of file
@@ -0,0 +1,267 @@
+import cProfile
+import ipaddress
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, current_app, g, has_app_context, request
+
+# Latency buckets in seconds, tuned for a license server (sub-ms cache hits up to slow backups)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels=(), value=0.0):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", bound))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", "+Inf"))} {series[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {series[-2]}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+class MetricsRegistry:
+    """Process-local metric store rendered in the Prometheus text format."""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Request latency per endpoint', ('endpoint', 'method', 'status'))
+DB_QUERIES = registry.counter(
+    'db_queries_total', 'SQL statements executed per endpoint', ('endpoint',))
+DB_QUERY_TIME = registry.histogram(
+    'db_query_duration_seconds', 'Time to first row of SQL statements per endpoint', ('endpoint',))
+REDIS_COMMANDS = registry.histogram(
+    'redis_command_duration_seconds', 'Redis round-trip latency per command', ('command',))
+CRYPTO_TIME = registry.histogram(
+    'crypto_operation_duration_seconds', 'Time spent in AES/RSA operations', ('operation',))
+SLOW_REQUEST_PROFILES = registry.counter(
+    'slow_request_profiles_total', 'Profiles dumped for slow requests', ('endpoint',))
+
+def _current_endpoint():
+    """Endpoint label for work done inside a request, 'background' otherwise."""
+    if has_app_context() and 'metrics_start' in g:
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+def _observe_query(conn, sql, params, elapsed):
+    endpoint = _current_endpoint()
+    DB_QUERIES.inc((endpoint,))
+    DB_QUERY_TIME.observe((endpoint,), elapsed)
+
+@contextmanager
+def crypto_timer(operation):
+    """Time a crypto operation; usable as a context manager or decorator."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CRYPTO_TIME.observe((operation,), time.perf_counter() - start)
+
+def instrument_redis(client):
+    """Wrap a redis client's execute_command to record per-command round-trips."""
+    if client is None or getattr(client, '_metrics_instrumented', False):
+        return client
+    execute_command = client.execute_command
+
+    @wraps(execute_command)
+    def timed_execute_command(*args, **options):
+        start = time.perf_counter()
+        try:
+            return execute_command(*args, **options)
+        finally:
+            command = str(args[0]).upper() if args else 'UNKNOWN'
+            REDIS_COMMANDS.observe((command,), time.perf_counter() - start)
+
+    client.execute_command = timed_execute_command
+    client._metrics_instrumented = True
+    return client
+
+class _SlowRequestProfiler:
+    """Samples requests with cProfile (or pyinstrument) and keeps slow ones."""
+    def __init__(self):
+        # cProfile cannot profile two requests at once; sampled requests take turns
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        if rate <= 0 or random.random() >= rate:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if app.config.get('PROFILER') == 'pyinstrument':
+                try:
+                    from pyinstrument import Profiler
+                    profiler = Profiler()
+                    profiler.start()
+                    return profiler
+                except ImportError:
+                    pass
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        except Exception:
+            self._lock.release()
+            raise
+
+    def stop(self, app, profiler, endpoint, elapsed):
+        """Stop profiling and dump the profile if the request was slow."""
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            if elapsed * 1000 < app.config.get('PROFILE_SLOW_REQUEST_MS', 500):
+                return
+            profile_dir = app.config.get('PROFILE_DIR', 'logs/profiles')
+            os.makedirs(profile_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            base_name = os.path.join(profile_dir, f'{endpoint}-{stamp}-{int(elapsed * 1000)}ms')
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(base_name + '.prof')
+            else:
+                with open(base_name + '.html', 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+            SLOW_REQUEST_PROFILES.inc((endpoint,))
+        finally:
+            self._lock.release()
+
+slow_request_profiler = _SlowRequestProfiler()
+
+def _is_local_request():
+    """A direct loopback client; proxied requests (X-Forwarded-For) may come from anywhere."""
+    if 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers:
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+def init_metrics(app):
+    """Register request timing hooks and the /metrics endpoint.
+
+    Call this before other before/after_request hooks so the recorded latency
+    covers request decryption and response encryption as well.
+    """
+    from models.database import add_query_observer
+    add_query_observer(_observe_query)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profiler = slow_request_profiler.start(app)
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        active_profiler = g.pop('metrics_profiler', None)
+        if active_profiler is not None:
+            try:
+                slow_request_profiler.stop(app, active_profiler, endpoint, elapsed)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to dump request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def release_request_profiler(exc):
+        # Unhandled errors skip after_request; don't keep the profiler slot busy
+        active_profiler = g.pop('metrics_profiler', None)
+        if active_profiler is not None:
+            slow_request_profiler.stop(app, active_profiler, request.endpoint or 'unmatched', 0)
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint (per worker process)."""
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return {'error': 'Unauthorized'}, 401
+        elif not _is_local_request():
+            return {'error': 'Forbidden'}, 403
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
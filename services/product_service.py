@@ -1,13 +1,14 @@
 from models.product import Product
+from services.usage_log_service import count_events
 
 def create_product(name, description=None, max_devices=1):
     """Create a new software product."""
     return Product.create(name, description, max_devices)
 
 def get_products(search_query="", page=1, per_page=10):
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     offset = (page - 1) * per_page
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         if(search_query):
             c.execute('SELECT COUNT(*) FROM products WHERE name LIKE ?', (f'%{search_query}%',))
@@ -43,14 +44,14 @@ def update_product(product_id, **kwargs):
 
 def get_product_stats(product_id):
     """Get detailed statistics for a specific product."""
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     from datetime import datetime, timedelta
     
     product = Product.get_by_id(product_id)
     if not product:
         return {'success': False, 'error': 'Product not found'}
     
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         
         # License counts
@@ -72,16 +73,9 @@ def get_product_stats(product_id):
         active_licenses = license_stats['active_licenses'] or 0
         estimated_revenue = active_licenses * 10
         
-        # Recent activity
+        # Recent activity, from rollups plus the raw tail
         week_ago = datetime.now() - timedelta(days=7)
-        c.execute('''
-            SELECT COUNT(*) as recent_validations
-            FROM usage_logs ul
-            JOIN licenses l ON ul.license_key = l.key
-            WHERE l.product_id = ? AND ul.action = 'validation' AND ul.timestamp > ?
-        ''', (product_id, week_ago))
-        
-        recent_activity = c.fetchone()['recent_validations']
+        recent_activity = count_events('validation', week_ago, product_id=product_id)
         
         return {
             'product': product,
@@ -99,4 +93,5 @@ def remove_product(product_id):
         c.execute('DELETE FROM settings WHERE product_id = ?', (product_id,))
         
         conn.commit()
+        Product.invalidate_cache()
         return {'success': True}
\ No newline at end of file
@@ -0,0 +1,140 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger('license_server.slow_query')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+_FULL_SCAN = re.compile(r'^(?:SCAN (\w+)$|Seq Scan on (\w+))')  # SQLite / PostgreSQL plans
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and literals so identical statements aggregate together."""
+    normalized = _STRING_LITERAL.sub('?', sql)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return _IN_LIST.sub('(?...)', normalized)
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+class _StatementStats:
+    __slots__ = ('count', 'total', 'max', 'samples', 'slow_count', 'plan', 'plan_captured_at', 'full_scan')
+
+    def __init__(self, sample_size):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=sample_size)
+        self.slow_count = 0
+        self.plan = None
+        self.plan_captured_at = 0.0
+        self.full_scan = False
+
+class QueryStats:
+    """Aggregates per-normalized-statement timings and logs slow statements with their plan."""
+    def __init__(self, slow_query_ms=100, sample_size=1000, plan_refresh_seconds=300, max_statements=2000):
+        self.slow_query_ms = slow_query_ms
+        self.sample_size = sample_size
+        self.plan_refresh_seconds = plan_refresh_seconds
+        self.max_statements = max_statements
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def observe(self, conn, sql, params, elapsed):
+        """Query observer registered with models.database.add_query_observer."""
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    return  # Unbounded ad-hoc SQL must not grow memory forever
+                stats = self._statements[key] = _StatementStats(self.sample_size)
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.samples.append(elapsed)
+            is_slow = elapsed * 1000 >= self.slow_query_ms
+            if is_slow:
+                stats.slow_count += 1
+            needs_plan = is_slow and time.time() - stats.plan_captured_at > self.plan_refresh_seconds
+
+        if not is_slow:
+            return
+        plan = self._explain(conn, sql, params) if needs_plan else None
+        if plan is not None:
+            with self._lock:
+                stats.plan = plan
+                stats.plan_captured_at = time.time()
+                stats.full_scan = any(_FULL_SCAN.match(step) for step in plan)
+        logger.warning(
+            "Slow query (%.1f ms): %s%s", elapsed * 1000, key,
+            f" | plan: {' / '.join(plan)}" if plan else ''
+        )
+
+    @staticmethod
+    def _explain(conn, sql, params):
+        if conn is None or not sql.lstrip().upper().startswith(_EXPLAINABLE) or params is None:
+            return None
+        try:
+            if conn.dialect == 'postgresql':
+                # On its own connection: an error would abort the caller's transaction
+                from models.database import get_read_connection
+                with get_read_connection() as explain_conn:
+                    rows = explain_conn.untracked_cursor().execute('EXPLAIN ' + sql, params).fetchall()
+                return [row[0].strip().lstrip('-> ') for row in rows]
+            # Untracked cursor so the EXPLAIN itself is not recorded
+            cursor = conn.untracked_cursor()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+        except Exception:
+            return None
+
+    def snapshot(self, limit=50, order_by='total'):
+        """Return per-statement stats sorted by total time (or count/p99/max)."""
+        with self._lock:
+            items = [(key, stats, sorted(stats.samples)) for key, stats in self._statements.items()]
+        rows = []
+        for key, stats, samples in items:
+            rows.append({
+                'statement': key,
+                'count': stats.count,
+                'total_ms': round(stats.total * 1000, 3),
+                'avg_ms': round(stats.total * 1000 / stats.count, 3) if stats.count else 0,
+                'p50_ms': round(_percentile(samples, 0.50) * 1000, 3),
+                'p99_ms': round(_percentile(samples, 0.99) * 1000, 3),
+                'max_ms': round(stats.max * 1000, 3),
+                'slow_count': stats.slow_count,
+                'full_scan': stats.full_scan,
+                'plan': stats.plan
+            })
+        sort_key = {
+            'count': 'count', 'p99': 'p99_ms', 'max': 'max_ms', 'slow': 'slow_count'
+        }.get(order_by, 'total_ms')
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+query_stats = QueryStats()
+
+def init_query_stats(app):
+    """Enable statement aggregation and the slow query log if configured."""
+    if not app.config.get('QUERY_STATS_ENABLED', True):
+        return None
+    from models.database import add_query_observer
+    query_stats.slow_query_ms = app.config.get('SLOW_QUERY_MS', 100)
+    add_query_observer(query_stats.observe)
+    return query_stats
@@ -3,6 +3,7 @@ from flask import current_app, has_request_context
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from services.users_service import get_role_by_username
+from services.metrics import instrument_redis
 from datetime import timedelta
 from contextlib import contextmanager
 import time
@@ -13,8 +14,13 @@ limiter = Limiter(key_func=get_remote_address)
 # Global Redis client (initialized after app creation)
 redis_client = None
 
+# Suspicious activity thresholds (shared with the async validation service)
+SPAM_SCORE_LIMIT = 100
+RECENT_REQUESTS_WINDOW = 300  # seconds
+RECENT_REQUESTS_LIMIT = 200
+
 def init_limiter(app):
-    """Initialize Flask-Limiter with Redis backend and connection pooling."""
+    """Initialize Flask-Limiter (in-memory storage) and the instrumented Redis client."""
     global redis_client
 
     # Initialize Redis client with connection pooling for stability
@@ -26,17 +32,31 @@ def init_limiter(app):
         retry_on_timeout=True,
         max_connections=20
     )
+    instrument_redis(redis_client)
 
     # Test Redis connection with timeout
     try:
         redis_client.ping()
-        app.logger.info("Redis connection established for rate limiting")
+        app.logger.info("Redis connection established for suspicious activity checks")
     except Exception as e:
-        app.logger.warning(f"Redis connection failed: {e}. Rate limiting will be limited.")
+        # As in the async stack: without Redis the suspicious activity checks are skipped
+        app.logger.warning(f"Redis connection failed: {e}. Suspicious activity checks disabled.")
+        redis_client = None
 
-    limiter.storage_uri = app.config['REDIS_URL']
     limiter.init_app(app)
 
+def suspicious_activity_enabled(config):
+    """Whether the per-IP spam gate runs (both stacks); it needs the real client address, see PROXY_COUNT."""
+    return config.get('SUSPICIOUS_ACTIVITY_CHECK', False) and config.get('RATELIMIT_ENABLED', True)
+
+def client_address(remote_addr, forwarded_for, proxy_count):
+    """Client address behind `proxy_count` proxies, taken from X-Forwarded-For as ProxyFix does."""
+    if proxy_count and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',')]
+        if len(hops) >= proxy_count:
+            return hops[-proxy_count]
+    return remote_addr
+
 def get_current_time():
     """Get current timestamp compatible with Flask context."""
     if has_request_context():
@@ -54,7 +74,7 @@ def app_context():
 
 def suspicious_activity_check(ip_address):
     """Check if IP shows suspicious activity patterns with improved error handling."""
-    if not redis_client:
+    if not redis_client or not suspicious_activity_enabled(current_app.config):
         return False
 
     try:
@@ -62,14 +82,14 @@ def suspicious_activity_check(ip_address):
             # Check spam score with timeout protection
             try:
                 spam_score = redis_client.get(f"spam_score:{ip_address}")
-                if spam_score and int(spam_score) > 100:
+                if spam_score and int(spam_score) > SPAM_SCORE_LIMIT:
                     return True
             except redis.RedisError:
                 # Redis temporarily unavailable, allow request
                 return False
 
             # Check rapid requests (more than 120 in 5 minutes)
-            five_min_ago = get_current_time() - 300  # 5 minutes ago
+            five_min_ago = get_current_time() - RECENT_REQUESTS_WINDOW
             try:
                 recent_requests = redis_client.zcount(
                     f"requests:{ip_address}",
@@ -77,7 +97,7 @@ def suspicious_activity_check(ip_address):
                     int(get_current_time())
                 )
 
-                if recent_requests > 200:
+                if recent_requests > RECENT_REQUESTS_LIMIT:
                     redis_client.incr(f"spam_score:{ip_address}")
                     redis_client.expire(f"spam_score:{ip_address}", 86400)  # 24 hours
                     return True
@@ -1,6 +1,7 @@
 from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from config import Config
+from models.database import run_blocking
 
 def verify_credentials(hashed_password, password):
     """Verify credentials."""
@@ -9,13 +10,14 @@ def verify_credentials(hashed_password, password):
         return False
 
     # For now, using environment variables
-    if(check_password_hash(hashed_password, password)):
+    # scrypt takes tens of milliseconds; keep it off the gevent hub
+    if(run_blocking(check_password_hash, hashed_password, password)):
         return True
     return False
 
 def hash_password(password):
     """Hash a password for storage."""
-    return generate_password_hash(password)
+    return run_blocking(generate_password_hash, password)
 
 def generate_secure_token():
     """Generate a secure random token."""
@@ -26,12 +26,12 @@ def update_setting(product_id, number_of_credits=None, license_duration_hours=No
 
 def get_settings(search_query="", page=1, per_page=10):
     """Get all settings with pagination."""
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     
     offset = (page - 1) * per_page
     keywords = [kw.strip() for kw in search_query.split(',') if kw.strip()]
     
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         if(keywords):
             query_conditions = []
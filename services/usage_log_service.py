@@ -0,0 +1,307 @@
+"""Usage log rollups, archival and retention.
+
+Meant to run on a schedule (cron / systemd timer), e.g. every 15 minutes:
+
+    python -m services.usage_log_service
+
+1. Raw usage_logs of every completed hour are rolled up into hourly counts
+   per (license, product, action, status); completed days into daily counts.
+2. Raw rows older than USAGE_LOG_RETENTION_DAYS (and already rolled up) are
+   appended to gzip-compressed NDJSON files, one per day, then deleted in
+   bounded batches so the write lock is never held for long.
+3. Hourly rollups older than USAGE_ROLLUP_HOURLY_RETENTION_DAYS are dropped
+   (daily rollups are kept) and freed pages are reclaimed incrementally.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from config import Config
+from models.database import get_db_connection, get_read_connection
+
+logger = logging.getLogger('license_server.usage_logs')
+
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# HOUR_FORMAT bucket of a usage_logs row, per connection dialect
+_HOUR_BUCKET_SQL = {
+    'sqlite': "strftime('%Y-%m-%d %H:00:00', ul.timestamp)",
+    'postgresql': "to_char(date_trunc('hour', ul.timestamp), 'YYYY-MM-DD HH24:00:00')",
+}
+
+def _utcnow():
+    # usage_logs.timestamp defaults to CURRENT_TIMESTAMP, which is UTC
+    return datetime.utcnow()
+
+def _get_state(conn, name):
+    row = conn.execute('SELECT value FROM usage_log_rollup_state WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+def _set_state(conn, name, value):
+    conn.execute('''
+        INSERT INTO usage_log_rollup_state (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', (name, value))
+
+def _autocommit_connection():
+    conn = get_db_connection()
+    conn.isolation_level = None  # Explicit BEGIN IMMEDIATE / COMMIT per batch
+    return conn
+
+def _initial_hourly_watermark(conn):
+    row = conn.execute('SELECT MIN(timestamp) FROM usage_logs').fetchone()
+    if not row[0]:
+        return None
+    return datetime.fromisoformat(str(row[0])).strftime(HOUR_FORMAT)
+
+def rollup_hourly(conn, now=None):
+    """Roll raw logs of completed hours into hourly buckets. Returns hours rolled."""
+    end_limit = datetime.strptime((now or _utcnow()).strftime(HOUR_FORMAT), TIMESTAMP_FORMAT)
+    hours = 0
+    while True:
+        # One day per transaction keeps each write lock short. The watermark is
+        # read under the write lock so overlapping runs never count a row twice.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            watermark = _get_state(conn, 'hourly_watermark') or _initial_hourly_watermark(conn)
+            start = datetime.strptime(watermark, TIMESTAMP_FORMAT) if watermark else end_limit
+            if start >= end_limit:
+                conn.execute('COMMIT')
+                return hours
+            end = min(start + timedelta(days=1), end_limit)
+            conn.execute(f'''
+                INSERT INTO usage_log_rollups
+                    (granularity, bucket, license_key, product_id, action, response_status, event_count)
+                SELECT 'hour', {_HOUR_BUCKET_SQL[conn.dialect]}, ul.license_key,
+                       MAX(l.product_id), ul.action, COALESCE(ul.response_status, ''), COUNT(*)
+                FROM usage_logs ul
+                LEFT JOIN licenses l ON l.key = ul.license_key
+                WHERE ul.timestamp >= ? AND ul.timestamp < ?
+                GROUP BY 2, 3, 5, 6
+                ON CONFLICT(granularity, bucket, license_key, action, response_status)
+                DO UPDATE SET event_count = usage_log_rollups.event_count + excluded.event_count
+            ''', (start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)))
+            _set_state(conn, 'hourly_watermark', end.strftime(TIMESTAMP_FORMAT))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        hours += int((end - start).total_seconds() // 3600)
+
+def rollup_daily(conn):
+    """Roll hourly buckets of completed (fully rolled) days into daily buckets."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        hourly_watermark = _get_state(conn, 'hourly_watermark')
+        watermark = _get_state(conn, 'daily_watermark')
+        if watermark is None:
+            row = conn.execute("SELECT MIN(bucket) FROM usage_log_rollups WHERE granularity = 'hour'").fetchone()
+            watermark = row[0][:10] if row[0] else None
+        # Days strictly before the hourly watermark's day are complete
+        last_complete_day = hourly_watermark[:10] if hourly_watermark else None
+        if watermark is None or last_complete_day is None or watermark >= last_complete_day:
+            conn.execute('COMMIT')
+            return 0
+        cursor = conn.execute('''
+            INSERT INTO usage_log_rollups
+                (granularity, bucket, license_key, product_id, action, response_status, event_count)
+            SELECT 'day', substr(bucket, 1, 10), license_key, MAX(product_id), action, response_status,
+                   SUM(event_count)
+            FROM usage_log_rollups
+            WHERE granularity = 'hour' AND bucket >= ? AND bucket < ?
+            GROUP BY 2, 3, 5, 6
+            ON CONFLICT(granularity, bucket, license_key, action, response_status)
+            DO UPDATE SET event_count = usage_log_rollups.event_count + excluded.event_count
+        ''', (watermark, last_complete_day))
+        _set_state(conn, 'daily_watermark', last_complete_day)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return cursor.rowcount
+
+def archive_raw_logs(conn, retention_days, archive_dir, batch_size=5000, now=None):
+    """Move rolled-up raw rows older than retention_days to NDJSON.gz files."""
+    cutoff = ((now or _utcnow()) - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT)
+    hourly_watermark = _get_state(conn, 'hourly_watermark')
+    if hourly_watermark is None:
+        return 0
+    # Never drop raw rows that are not represented in the rollups yet
+    cutoff = min(cutoff, hourly_watermark)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    archived = 0
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT * FROM usage_logs
+            WHERE id > ? AND timestamp < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, cutoff, batch_size)).fetchall()
+        if not rows:
+            break
+
+        by_day = {}
+        for row in rows:
+            record = dict(row)
+            by_day.setdefault(str(record['timestamp'])[:10], []).append(record)
+        for day, records in by_day.items():
+            path = os.path.join(archive_dir, f'usage_logs-{day}.ndjson.gz')
+            # gzip supports appending members; readers see one continuous stream
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+        ids = [row['id'] for row in rows]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'DELETE FROM usage_logs WHERE id BETWEEN ? AND ? AND timestamp < ?',
+                (ids[0], ids[-1], cutoff)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        archived += len(ids)
+        last_id = ids[-1]
+    return archived
+
+def prune_hourly_rollups(conn, retention_days, now=None):
+    """Drop hourly buckets already folded into daily rollups and past retention."""
+    cutoff = ((now or _utcnow()) - timedelta(days=retention_days)).strftime(HOUR_FORMAT)
+    daily_watermark = _get_state(conn, 'daily_watermark')
+    if daily_watermark is None:
+        return 0
+    cutoff = min(cutoff, daily_watermark)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = conn.execute(
+            "DELETE FROM usage_log_rollups WHERE granularity = 'hour' AND bucket < ?", (cutoff,)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return cursor.rowcount
+
+def incremental_vacuum(conn, pages):
+    """Return up to `pages` free pages to the OS if auto_vacuum is INCREMENTAL."""
+    if conn.dialect == 'postgresql':
+        return False  # Space is reclaimed by autovacuum
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        logger.info(
+            "auto_vacuum is not INCREMENTAL; run with --enable-incremental-vacuum once "
+            "(full VACUUM, needs exclusive access) to reclaim space in small steps"
+        )
+        return False
+    conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    return True
+
+def enable_incremental_vacuum(conn):
+    """One-off switch to auto_vacuum=INCREMENTAL (rewrites the whole database)."""
+    if conn.dialect == 'postgresql':
+        logger.info("auto_vacuum is SQLite-only; PostgreSQL reclaims space with autovacuum")
+        return
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+def run_retention_job(retention_days=None, hourly_retention_days=None, archive_dir=None,
+                      batch_size=None, vacuum_pages=None):
+    """Run every maintenance step once and return a summary."""
+    retention_days = retention_days if retention_days is not None else Config.USAGE_LOG_RETENTION_DAYS
+    hourly_retention_days = (hourly_retention_days if hourly_retention_days is not None
+                             else Config.USAGE_ROLLUP_HOURLY_RETENTION_DAYS)
+    archive_dir = archive_dir or Config.USAGE_LOG_ARCHIVE_DIR
+    batch_size = batch_size or Config.USAGE_LOG_BATCH_SIZE
+    vacuum_pages = vacuum_pages if vacuum_pages is not None else Config.USAGE_LOG_VACUUM_PAGES
+
+    conn = _autocommit_connection()
+    try:
+        summary = {
+            'hours_rolled_up': rollup_hourly(conn),
+            'daily_rollups': rollup_daily(conn),
+            'raw_rows_archived': archive_raw_logs(conn, retention_days, archive_dir, batch_size),
+            'hourly_rollups_pruned': prune_hourly_rollups(conn, hourly_retention_days),
+        }
+        summary['vacuumed'] = incremental_vacuum(conn, vacuum_pages) if vacuum_pages else False
+        logger.info(f"Usage log retention job finished: {summary}")
+        return summary
+    finally:
+        conn.close()
+
+def count_events(action, since, product_id=None):
+    """Count usage events since `since`, reading rollups plus the not-yet-rolled tail.
+
+    Rolled-up hours are counted from usage_log_rollups (no join to licenses);
+    only raw rows newer than the hourly watermark are counted from usage_logs.
+    Buckets are hourly, so the window start is rounded down to the hour; windows
+    must stay within USAGE_ROLLUP_HOURLY_RETENTION_DAYS.
+    """
+    since_str = since.strftime(TIMESTAMP_FORMAT) if isinstance(since, datetime) else str(since)
+    with get_read_connection() as conn:
+        watermark = _get_state(conn, 'hourly_watermark')
+        total = 0
+        raw_since = since_str
+        if watermark and since_str < watermark:
+            since_hour = since_str[:13] + ':00:00'
+            query = '''
+                SELECT COALESCE(SUM(event_count), 0) FROM usage_log_rollups
+                WHERE action = ? AND granularity = 'hour' AND bucket >= ? AND bucket < ?
+            '''
+            params = [action, since_hour, watermark]
+            if product_id is not None:
+                query += ' AND product_id = ?'
+                params.append(product_id)
+            total += conn.execute(query, params).fetchone()[0]
+            raw_since = watermark
+
+        if product_id is None:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM usage_logs WHERE action = ? AND timestamp >= ?',
+                (action, raw_since)
+            ).fetchone()
+        else:
+            row = conn.execute('''
+                SELECT COUNT(*) FROM usage_logs ul
+                JOIN licenses l ON ul.license_key = l.key
+                WHERE l.product_id = ? AND ul.action = ? AND ul.timestamp >= ?
+            ''', (product_id, action, raw_since)).fetchone()
+        return total + row[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Roll up, archive and prune usage logs.')
+    parser.add_argument('--retention-days', type=int, help='Keep raw usage_logs this many days')
+    parser.add_argument('--hourly-retention-days', type=int, help='Keep hourly rollups this many days')
+    parser.add_argument('--archive-dir', help='Directory for archived NDJSON.gz files')
+    parser.add_argument('--batch-size', type=int, help='Rows archived/deleted per transaction')
+    parser.add_argument('--vacuum-pages', type=int, help='Pages to release with incremental_vacuum (0 disables)')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch the database to auto_vacuum=INCREMENTAL (one-off full VACUUM)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.enable_incremental_vacuum:
+        conn = _autocommit_connection()
+        try:
+            enable_incremental_vacuum(conn)
+        finally:
+            conn.close()
+
+    summary = run_retention_job(
+        retention_days=args.retention_days,
+        hourly_retention_days=args.hourly_retention_days,
+        archive_dir=args.archive_dir,
+        batch_size=args.batch_size,
+        vacuum_pages=args.vacuum_pages
+    )
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -16,9 +16,9 @@ def create_user(username, password_hash, first_name='', last_name='', role='user
     )
 
 def get_users(page=1, per_page=10):
-    from models.database import get_db_connection
+    from models.database import get_read_connection
     offset = (page - 1) * per_page
-    with get_db_connection() as conn:
+    with get_read_connection() as conn:
         c = conn.cursor()
         c.execute('SELECT COUNT(*) FROM users')
         total = c.fetchone()[0]
@@ -55,8 +55,8 @@ def remove_user(username):
         return {'success': True}
 
 def get_users_count():
-    from models.database import get_db_connection
-    with get_db_connection() as conn:
+    from models.database import get_read_connection
+    with get_read_connection() as conn:
         c = conn.cursor()
         c.execute('SELECT COUNT(*) FROM users')
         total = c.fetchone()[0]
@@ -64,8 +64,8 @@ def get_users_count():
 
 def get_role_by_username(username):
         """Get the role of a user by username."""
-        from models.database import get_db_connection
-        with get_db_connection() as conn:
+        from models.database import get_read_connection
+        with get_read_connection() as conn:
             c = conn.cursor()
             c.execute('SELECT role FROM users WHERE username = ?', (username,))
             row = c.fetchone()
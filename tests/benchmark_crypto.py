@@ -0,0 +1,76 @@
+"""Per-request AES cost: fresh Cipher objects vs the cached per-session context.
+
+Usage: python tests/benchmark_crypto.py [--iterations 200]
+
+"before" rebuilds the AES key object and pads in pure Python on every call
+(the previous CryptoManager implementation); "after" reuses the
+SessionCryptoContext created at key exchange.
+"""
+import argparse
+import base64
+import os
+import secrets
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from api.security import SessionCryptoContext
+
+SIZES = (('1 KB', 1024), ('64 KB', 64 * 1024), ('1 MB', 1024 * 1024))
+
+def before_encrypt(key, data):
+    iv = secrets.token_bytes(16)
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend()).encryptor()
+    data_bytes = data.encode('utf-8')
+    pad_length = 16 - (len(data_bytes) % 16)
+    data_bytes += bytes([pad_length] * pad_length)
+    encrypted = encryptor.update(data_bytes) + encryptor.finalize()
+    return {'iv': base64.b64encode(iv).decode('utf-8'), 'data': base64.b64encode(encrypted).decode('utf-8')}
+
+def before_decrypt(key, encrypted_data):
+    iv = base64.b64decode(encrypted_data['iv'])
+    decryptor = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend()).decryptor()
+    decrypted = decryptor.update(base64.b64decode(encrypted_data['data'])) + decryptor.finalize()
+    decrypted = decrypted[:-decrypted[-1]]
+    data_str = decrypted.decode('utf-8')
+    return (data_str[:data_str.rfind('}')] + '}').encode('utf-8')
+
+def per_call(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-request AES cost.')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    key = secrets.token_bytes(32)
+    context = SessionCryptoContext(key)
+    print(f"{'payload':8} {'operation':14} {'before us':>11} {'after us':>11} {'speedup':>8}")
+    for label, size in SIZES:
+        data = '{"blob": "' + 'x' * (size - 12) + '"}'
+        encrypted = context.aes_encrypt(data)
+        body = data.encode('utf-8')
+        envelope = context.seal_envelope(body)
+        iterations = max(10, args.iterations * 1024 // size) if size > 64 * 1024 else args.iterations
+        rows = [
+            ('cbc encrypt', per_call(lambda: before_encrypt(key, data), iterations),
+             per_call(lambda: context.aes_encrypt(data), iterations)),
+            ('cbc decrypt', per_call(lambda: before_decrypt(key, encrypted), iterations),
+             per_call(lambda: context.aes_decrypt(encrypted), iterations)),
+            ('gcm seal', per_call(lambda: SessionCryptoContext(key).seal_envelope(body), iterations),
+             per_call(lambda: context.seal_envelope(body), iterations)),
+            ('gcm open', per_call(lambda: SessionCryptoContext(key).open_envelope(envelope), iterations),
+             per_call(lambda: context.open_envelope(envelope), iterations)),
+        ]
+        for operation, before, after in rows:
+            print(f"{label:8} {operation:14} {before:11.1f} {after:11.1f} {before / after:7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare the legacy response envelope with the v2 (AES-256-GCM) envelope.
+
+Usage: python tests/benchmark_envelope.py [--rows 500] [--iterations 200]
+
+Reports CPU time per response and bytes on the wire for a license listing
+payload, mirroring what app.encrypt_response does for each format.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.security import CryptoManager
+
+def sample_body(rows):
+    licenses = [{
+        'id': i,
+        'key': f'LK{i:014d}',
+        'product_name': 'RichDreamVEO3Tool',
+        'user_id': f'user{i}',
+        'machine_code': f'{i:064x}',
+        'credit_number': 100,
+        'status': 'active',
+        'expires_at': '2026-12-31T23:59:59',
+        'created_at': '2025-01-01T00:00:00'
+    } for i in range(rows)]
+    return json.dumps({'licenses': licenses, 'total': rows, 'page': 1}).encode('utf-8')
+
+def legacy_envelope(key, body):
+    encrypted = CryptoManager.aes_encrypt(key, json.dumps(body.decode('utf-8')))
+    b64 = base64.b64encode(json.dumps(encrypted).encode('utf-8')).decode('utf-8')
+    return json.dumps({'encrypted_data': b64, 'status': 'encrypted'}).encode('utf-8')
+
+def v2_base64_envelope(key, body):
+    return base64.b64encode(CryptoManager.seal_envelope(key, body))
+
+def v2_binary_envelope(key, body):
+    return CryptoManager.seal_envelope(key, body)
+
+def measure(encode, key, body, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        wire = encode(key, body)
+    return (time.process_time() - start) / iterations, len(wire)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark response envelope formats.')
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    key = CryptoManager.generate_aes_key()
+    body = sample_body(args.rows)
+    print(f"Plain JSON body: {len(body)} bytes ({args.rows} rows)")
+
+    baseline_cpu, baseline_bytes = measure(legacy_envelope, key, body, args.iterations)
+    formats = [
+        ('legacy (CBC+JSON+base64)', baseline_cpu, baseline_bytes),
+        ('v2 base64', *measure(v2_base64_envelope, key, body, args.iterations)),
+        ('v2 binary', *measure(v2_binary_envelope, key, body, args.iterations)),
+    ]
+    print(f"{'format':26} {'cpu/resp':>10} {'bytes':>10} {'vs legacy':>22}")
+    for name, cpu, size in formats:
+        saved = f"-{(1 - cpu / baseline_cpu) * 100:.0f}% cpu -{(1 - size / baseline_bytes) * 100:.0f}% bytes"
+        print(f"{name:26} {cpu * 1000:8.3f}ms {size:10d} {saved:>22}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Server-side cost of session setup: RSA-2048 vs X25519 + HKDF.
+
+Usage: python tests/benchmark_handshake.py [--sessions 50]
+
+Times what the server does for /init-session and /key-exchange in each
+mode; the client's share of the work is prepared outside the timed region.
+"""
+import argparse
+import os
+import secrets
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, x25519
+
+from api.security import (
+    CryptoManager, SessionManager, KEY_EXCHANGE_RSA, KEY_EXCHANGE_X25519
+)
+
+OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+
+def rsa_handshake(manager):
+    start = time.process_time()
+    session_id = manager.create_session('bench', KEY_EXCHANGE_RSA)
+    session = manager.get_session(session_id)
+    manager.export_server_public_key(session)
+    server_cost = time.process_time() - start
+
+    wrapped_key = session['server_private_key'].public_key().encrypt(secrets.token_bytes(32), OAEP)
+
+    start = time.process_time()
+    aes_key = CryptoManager.rsa_decrypt(session['server_private_key'], wrapped_key)
+    manager.set_session_key(session, aes_key)
+    return server_cost + time.process_time() - start
+
+def x25519_handshake(manager):
+    start = time.process_time()
+    session_id = manager.create_session('bench', KEY_EXCHANGE_X25519)
+    session = manager.get_session(session_id)
+    manager.export_server_public_key(session)
+    server_cost = time.process_time() - start
+
+    client_public = x25519.X25519PrivateKey.generate().public_key().public_bytes(
+        encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+
+    start = time.process_time()
+    aes_key = CryptoManager.derive_session_key(session['server_private_key'], client_public, session_id)
+    manager.set_session_key(session, aes_key)
+    return server_cost + time.process_time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark server-side handshake cost.')
+    parser.add_argument('--sessions', type=int, default=50)
+    args = parser.parse_args()
+
+    manager = SessionManager()
+    rsa_cost = sum(rsa_handshake(manager) for _ in range(args.sessions)) / args.sessions
+    x25519_cost = sum(x25519_handshake(manager) for _ in range(args.sessions)) / args.sessions
+    print(f"rsa     {rsa_cost * 1000:9.3f} ms/session")
+    print(f"x25519  {x25519_cost * 1000:9.3f} ms/session  ({rsa_cost / x25519_cost:.0f}x cheaper)")
+
+if __name__ == '__main__':
+    main()
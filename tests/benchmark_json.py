@@ -0,0 +1,74 @@
+"""Serialize a license listing page with Flask's stdlib provider vs the orjson provider.
+
+Usage: python tests/benchmark_json.py [--per-page 500] [--iterations 200]
+
+Rows are shaped like services.license_service.get_licenses output, including
+the datetime expires_at/created_at values.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import FastJSONProvider
+
+def license_page(per_page):
+    created = datetime(2025, 1, 1)
+    return {
+        'licenses': [{
+            'id': i,
+            'key': f'LK{i:014d}',
+            'key_display': f'LK{i:06d}...',
+            'product_id': 1,
+            'product_name': 'RichDreamVEO3Tool',
+            'user_id': f'user{i}',
+            'machine_code': f'{i:064x}',
+            'device_id': None,
+            'credit_number': 100,
+            'status': 'active',
+            'expires_at': created + timedelta(days=365, seconds=i),
+            'created_at': created + timedelta(seconds=i),
+            'last_used_at': None
+        } for i in range(per_page)],
+        'total': per_page * 10,
+        'page': 1,
+        'per_page': per_page
+    }
+
+def per_response(app, obj, iterations):
+    with app.app_context():
+        start = time.process_time()
+        for _ in range(iterations):
+            response = app.json.response(obj)
+        return (time.process_time() - start) / iterations, len(response.get_data())
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON response serialization.')
+    parser.add_argument('--per-page', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    page = license_page(args.per_page)
+    stdlib_app = Flask('stdlib')
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+    iso_app = Flask('fast_iso')
+    iso_app.config['JSON_DATETIME_FORMAT'] = 'iso'
+    iso_app.json = FastJSONProvider(iso_app)
+
+    stdlib_cost, stdlib_bytes = per_response(stdlib_app, page, args.iterations)
+    print(f"per_page={args.per_page}")
+    print(f"{'stdlib':12} {stdlib_cost * 1000:8.3f} ms/response  {stdlib_bytes} bytes")
+    for name, app in (('orjson', fast_app), ('orjson iso', iso_app)):
+        cost, size = per_response(app, page, args.iterations)
+        print(f"{name:12} {cost * 1000:8.3f} ms/response  {size} bytes  ({stdlib_cost / cost:.1f}x faster)")
+
+if __name__ == '__main__':
+    main()
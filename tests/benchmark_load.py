@@ -0,0 +1,292 @@
+"""Multi-process HTTP load generator against a locally started server.
+
+Usage: python tests/benchmark_load.py [--scenarios validate_warm_v2,search_plain]
+           [--duration 10] [--concurrency 8] [--workers 2] [--server uvicorn] [--licenses 10000]
+           [--output benchmark_results/load.json] [--compare baseline.json]
+
+Seeds a fresh SQLite database, starts `gunicorn -c gunicorn.conf.py app:app`
+on a free local port (rate limiting off, access log off), then runs each
+scenario for --duration seconds from --concurrency client processes. Every
+client does its own X25519 handshake and sends the resumption ticket, so any
+gunicorn worker can serve it. --server uvicorn serves `asgi:app` from uvicorn
+workers instead (async /api/validate, the Flask app mounted for everything else).
+
+Scenarios:
+  validate_warm_v1   POST /api/validate/, one license, legacy AES-CBC envelope
+  validate_warm_v2   same, AES-GCM envelope
+  validate_cold_v2   a different license on every request
+  search_plain       GET /api/licenses/search (admin JWT), plain JSON
+  search_v2          same, AES-GCM encrypted response
+  stats_plain        GET /api/licenses/stats
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import requests
+from cryptography.hazmat.primitives import hashes, padding, serialization
+from cryptography.hazmat.primitives.asymmetric import x25519
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from benchmark_utils import (
+    ADMIN_PASSWORD, ADMIN_USERNAME, PRODUCT_NAME, ROOT, compare_results, license_key, machine_code,
+    seed_database, summarize, write_results
+)
+
+SCENARIOS = {
+    'validate_warm_v1': {'request': 'validate', 'envelope': 1, 'distinct': False},
+    'validate_warm_v2': {'request': 'validate', 'envelope': 2, 'distinct': False},
+    'validate_cold_v2': {'request': 'validate', 'envelope': 2, 'distinct': True},
+    'search_plain': {'request': 'search', 'envelope': None},
+    'search_v2': {'request': 'search', 'envelope': 2},
+    'stats_plain': {'request': 'stats', 'envelope': None},
+}
+
+class LoadClient:
+    """Minimal protocol client: X25519 handshake, ticket resumption, v1/v2 envelopes."""
+    def __init__(self, base_url, envelope, token=None):
+        self.base_url = base_url
+        self.envelope = envelope
+        self.http = requests.Session()
+        self.http.headers['X-Client-ID'] = 'load-test'
+        if token:
+            self.http.headers['Authorization'] = f'Bearer {token}'
+        self.aes_key = None
+
+    def handshake(self, attempts=20):
+        # Handshake state lives in one worker's memory; if /key-exchange lands on
+        # another worker it fails and we start over (tickets work on any worker)
+        for _ in range(attempts):
+            if self._try_handshake():
+                return
+        raise RuntimeError(f'Key exchange failed {attempts} times')
+
+    def _try_handshake(self):
+        init = self.http.get(f'{self.base_url}/init-session', headers={'X-Key-Exchange': 'x25519'}).json()
+        private_key = x25519.X25519PrivateKey.generate()
+        shared = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(
+            base64.b64decode(init['server_public_key'])))
+        self.aes_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=init['session_id'].encode('utf-8'),
+                            info=b'license-server session key v1').derive(shared)
+        public_bytes = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+        done = self.http.post(f'{self.base_url}/key-exchange', json={
+            'session_id': init['session_id'],
+            'client_public_key': base64.b64encode(public_bytes).decode('ascii')
+        })
+        if done.status_code != 200:
+            return False
+        self.http.headers['X-Session-Ticket'] = done.json()['session_ticket']
+        if self.envelope == 2:
+            self.http.headers['X-Encryption-Version'] = '2'
+        return True
+
+    def encrypt(self, data):
+        plaintext = json.dumps(data).encode('utf-8')
+        if self.envelope == 2:
+            header, nonce = bytes((2, 0)), secrets.token_bytes(12)
+            envelope = header + nonce + AESGCM(self.aes_key).encrypt(nonce, plaintext, header)
+            return {'data': base64.b64encode(envelope), 'headers': {'Content-Type': 'text/plain'}}
+        iv = secrets.token_bytes(16)
+        padder = padding.PKCS7(128).padder()
+        encryptor = Cipher(algorithms.AES(self.aes_key), modes.CBC(iv)).encryptor()
+        data = encryptor.update(padder.update(plaintext) + padder.finalize()) + encryptor.finalize()
+        return {'json': {'encryptedRequest': {'iv': base64.b64encode(iv).decode('ascii'),
+                                              'data': base64.b64encode(data).decode('ascii')}}}
+
+    def decrypt(self, response):
+        if self.envelope is None:
+            return response.json()
+        if self.envelope == 2:
+            envelope = base64.b64decode(response.content)
+            return json.loads(AESGCM(self.aes_key).decrypt(envelope[2:14], envelope[14:], envelope[:2]))
+        wrapped = json.loads(base64.b64decode(response.json()['encrypted_data']))
+        decryptor = Cipher(algorithms.AES(self.aes_key), modes.CBC(base64.b64decode(wrapped['iv']))).decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        padded = decryptor.update(base64.b64decode(wrapped['data'])) + decryptor.finalize()
+        # Legacy responses are the JSON body serialized again as a JSON string
+        return json.loads(json.loads(unpadder.update(padded) + unpadder.finalize()))
+
+    def validate(self, i, products):
+        return self.http.post(f'{self.base_url}/api/validate/', **self.encrypt({
+            'license_key': license_key(i),
+            'product_name': PRODUCT_NAME.format(i % products),
+            'machine_code': machine_code(i)
+        }))
+
+    def search(self, i):
+        return self.http.get(f'{self.base_url}/api/licenses/search',
+                             params={'q': f'bench-user-{i % 1000}', 'per_page': 20})
+
+    def stats(self, i):
+        return self.http.get(f'{self.base_url}/api/licenses/stats')
+
+def run_client(base_url, scenario, duration, index, concurrency, licenses, products, token):
+    """One client process: handshake, check one response decrypts, then loop until the deadline."""
+    spec = SCENARIOS[scenario]
+    client = LoadClient(base_url, spec['envelope'], token)
+    if spec['envelope']:
+        client.handshake()
+
+    if spec['request'] == 'validate':
+        if spec['distinct']:
+            def send(n):
+                return client.validate((index + n * concurrency) % licenses, products)
+        else:
+            def send(n):
+                return client.validate(0, products)
+    else:
+        send = getattr(client, spec['request'])
+
+    first = send(0)
+    if first.status_code != 200:
+        raise RuntimeError(f'{scenario}: first request returned {first.status_code}: {first.text[:200]}')
+    body = client.decrypt(first)
+    if spec['request'] == 'validate' and not body.get('valid'):
+        raise RuntimeError(f'{scenario}: seeded license did not validate: {body}')
+
+    latencies, statuses = [], Counter()
+    n = 1
+    deadline = time.perf_counter() + duration
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        try:
+            status = send(n).status_code
+        except requests.RequestException:
+            status = 'error'
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+        n += 1
+    return latencies, statuses
+
+def run_scenario(args, base_url, scenario, token):
+    with multiprocessing.Pool(args.concurrency) as pool:
+        start = time.perf_counter()
+        outcomes = pool.starmap(run_client, [
+            (base_url, scenario, args.duration, index, args.concurrency, args.licenses, args.products, token)
+            for index in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    latencies, statuses = [], Counter()
+    for client_latencies, client_statuses in outcomes:
+        latencies.extend(client_latencies)
+        statuses.update(client_statuses)
+    result = summarize(latencies)
+    result.update({
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / args.duration, 1),
+        'errors': sum(count for status, count in statuses.items() if status != 200),
+        'status_counts': {str(status): count for status, count in statuses.items()},
+        'wall_seconds': round(elapsed, 2)
+    })
+    return result
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(args, database, log_path):
+    port = free_port()
+    if args.server == 'uvicorn':
+        # Gunicorn-managed uvicorn workers, as deployed (see asgi.py)
+        worker_class = args.worker_class or 'uvicorn.workers.UvicornWorker'
+        application = 'asgi:app'
+    else:
+        try:
+            import gevent  # noqa: F401
+            worker_class = args.worker_class or 'gevent'
+        except ImportError:
+            worker_class = args.worker_class or 'sync'
+        application = 'app:app'
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{database}',
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_LOG_LEVEL='warning',
+               GUNICORN_ACCESS_LOG='',
+               RATELIMIT_ENABLED='false',
+               SESSION_TICKET_SECRET=secrets.token_urlsafe(48),
+               LOG_ACCESS='false',
+               LOG_FILE='',
+               HEALTH_INTERNET_CHECK='')
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', application],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with {process.returncode}; see {log_path}')
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return process, base_url, worker_class
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'Server did not become healthy; see {log_path}')
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test against a locally started server.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client processes')
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+    parser.add_argument('--worker-class', help='Gunicorn worker class (default: gevent if installed, else sync; '
+                        'UvicornWorker with --server uvicorn)')
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--licenses', type=int, default=10000)
+    parser.add_argument('--database', help='SQLite file to seed and reuse (default: a temp file)')
+    parser.add_argument('--output', default='benchmark_results/load.json')
+    parser.add_argument('--compare', help='Previous results file to compare throughput against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed throughput drop before failing')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='license-load-')
+    database = args.database or os.path.join(workdir, 'bench.db')
+    seed_database(database, products=args.products, licenses=args.licenses)
+    server, base_url, worker_class = start_server(args, database, os.path.join(workdir, 'server.log'))
+    print(f"Server {base_url}: {args.workers} {worker_class} workers; logs in {workdir}")
+    try:
+        login = requests.post(f'{base_url}/api/auth/login',
+                              json={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+        token = login.json()['access_token']
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = run_scenario(args, base_url, scenario, token)
+            stats = results[scenario]
+            print(f"{scenario:18} {stats['requests_per_sec']:8.1f} req/s  p50 {stats['median_ms']:8.2f} ms  "
+                  f"p99 {stats['p99_ms']:8.2f} ms  errors {stats['errors']}")
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    params = dict(vars(args), worker_class=worker_class)
+    write_results(args.output, 'load', params, results)
+    print(f"\nResults written to {args.output}")
+    if args.compare and compare_results(args.compare, results, 'requests_per_sec', args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Throughput and durability of the SQLite pragma profiles (SQLITE_PRAGMA_PROFILE).
+
+Usage: python tests/benchmark_pragmas.py [--profiles durable,balanced,fast] [--duration 5]
+           [--readers 4] [--writers 2] [--output benchmark_results/pragmas.json]
+           [--compare baseline.json] [--threshold 0.15]
+
+For each profile a fresh copy of the seeded database is opened through the
+connection pools, then reader threads validate licenses while writer threads
+log usage (one commit each) for --duration seconds. Reported per profile:
+validations/s and commits/s with their latency, a single-threaded commit
+latency, and the largest WAL file seen. With --compare, commit throughput is
+checked against a previous results file.
+
+What each profile risks (see models/database.py):
+    durable   synchronous=FULL: every commit is fsynced, nothing is lost.
+    balanced  synchronous=NORMAL in WAL mode: the database cannot be corrupted,
+              but commits since the last checkpoint/sync may be lost on power
+              loss or an OS crash (not on a process crash).
+    fast      synchronous=OFF: an OS crash or power loss can corrupt the file.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_utils import (
+    PRODUCT_NAME, compare_results, license_key, machine_code, measure, seed_database, summarize,
+    use_database, write_results
+)
+
+DURABILITY = {
+    'durable': 'no committed data lost',
+    'balanced': 'recent commits may roll back on power loss',
+    'fast': 'file may corrupt on power loss'
+}
+
+def run_profile(profile, seed_path, args):
+    from config import Config
+    from models.database import close_db_pool, db_pool_stats, get_db_connection
+    from models.license import License
+    from services.license_service import validate_license
+
+    path = os.path.join(tempfile.mkdtemp(prefix=f'license-pragmas-{profile}-'), 'bench.db')
+    shutil.copyfile(seed_path, path)
+    close_db_pool()
+    use_database(path)
+    Config.SQLITE_PRAGMA_PROFILE = profile
+    Config.SQLITE_CHECKPOINT_INTERVAL = args.checkpoint_interval
+
+    commit = measure(lambda: License.log_usage(license_key(0), '10.0.0.1', 'validation'), args.commit_rounds)
+
+    stop = threading.Event()
+    reads, writes, errors = [], [], []
+    wal_max = [0]
+
+    def reader(worker):
+        i = worker
+        while not stop.is_set():
+            start = time.perf_counter()
+            result = validate_license(PRODUCT_NAME.format(i % args.products), license_key(i), machine_code(i))
+            reads.append(time.perf_counter() - start)
+            if not result.get('valid'):
+                errors.append(result)
+            i = (i + args.readers) % args.licenses
+
+    def writer(worker):
+        i = worker
+        while not stop.is_set():
+            start = time.perf_counter()
+            License.log_usage(license_key(i), '10.0.0.1', 'validation')
+            writes.append(time.perf_counter() - start)
+            i = (i + args.writers) % args.licenses
+
+    def watch_wal():
+        while not stop.wait(0.05):
+            try:
+                wal_max[0] = max(wal_max[0], os.path.getsize(path + '-wal'))
+            except OSError:
+                pass
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads.append(threading.Thread(target=watch_wal))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[:3]
+
+    with get_db_connection() as conn:
+        synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    checkpoint = db_pool_stats().get('checkpoint')
+    close_db_pool()
+    read_stats, write_stats = summarize(reads), summarize(writes)
+    return {
+        f'{profile}_commit': commit,
+        f'{profile}_mixed_reads': dict(read_stats, ops_per_sec=round(len(reads) / args.duration, 1)),
+        f'{profile}_mixed_writes': dict(write_stats, ops_per_sec=round(len(writes) / args.duration, 1),
+                                        synchronous=synchronous, wal_max_bytes=wal_max[0],
+                                        checkpoints=checkpoint['runs'] if checkpoint else None,
+                                        durability=DURABILITY.get(profile, 'custom'))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SQLite pragma profiles under a mixed workload.')
+    parser.add_argument('--profiles', default='durable,balanced,fast')
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--licenses', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=5, help='Seconds of mixed load per profile')
+    parser.add_argument('--readers', type=int, default=4, help='Threads validating licenses')
+    parser.add_argument('--writers', type=int, default=2, help='Threads logging usage (one commit each)')
+    parser.add_argument('--commit-rounds', type=int, default=200, help='Single-threaded commits timed per profile')
+    parser.add_argument('--checkpoint-interval', type=float, default=1)
+    parser.add_argument('--output', default='benchmark_results/pragmas.json')
+    parser.add_argument('--compare', help='Previous results file to compare throughput against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed slowdown before failing')
+    args = parser.parse_args()
+
+    seed_path = os.path.join(tempfile.mkdtemp(prefix='license-pragmas-'), 'seed.db')
+    seed_database(seed_path, products=args.products, licenses=args.licenses)
+
+    results = {}
+    for profile in args.profiles.split(','):
+        results.update(run_profile(profile.strip(), seed_path, args))
+        commit = results[f'{profile}_commit']
+        reads, writes = results[f'{profile}_mixed_reads'], results[f'{profile}_mixed_writes']
+        print(f"{profile:9} commit median {commit['median_ms']:8.3f} ms  "
+              f"mixed: {reads['ops_per_sec']:>9} validations/s (p99 {reads['p99_ms']:.3f} ms)  "
+              f"{writes['ops_per_sec']:>8} commits/s (p99 {writes['p99_ms']:.3f} ms)  "
+              f"WAL max {writes['wal_max_bytes'] / 1024:,.0f} KiB  [{writes['durability']}]")
+
+    write_results(args.output, 'pragmas', vars(args), results)
+    print(f"\nResults written to {args.output}")
+    if args.compare and compare_results(args.compare, results, 'ops_per_sec', args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
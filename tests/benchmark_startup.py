@@ -0,0 +1,91 @@
+"""Measure worker startup cost: import time and memory per worker.
+
+Usage: python tests/benchmark_startup.py [--runs 5] [--top 15]
+
+- Import time of `app` in a fresh interpreter (median of --runs), and the
+  slowest modules from `python -X importtime`.
+- RSS of a worker that imported the app itself (no preload), and the
+  private (unshared) memory of a worker forked from a preloaded master,
+  which is what each extra gunicorn worker costs with preload_app.
+
+Linux only (reads /proc). Uses DATABASE_URL from the environment.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_MEMORY_PROBE = r'''
+import os, sys, time
+sys.path.insert(0, {root!r})
+
+def memory_kb(pid='self'):
+    fields = {{}}
+    with open(f'/proc/{{pid}}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields['Rss'], fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+
+start = time.perf_counter()
+import app
+import_seconds = time.perf_counter() - start
+rss, private = memory_kb()
+print(f'cold {{import_seconds:.4f}} {{rss}} {{private}}')
+
+# Fork like gunicorn does with preload_app and serve one request in the child
+read_fd, write_fd = os.pipe()
+pid = os.fork()
+if pid == 0:
+    app.app.test_client().get('/health')
+    rss, private = memory_kb()
+    os.write(write_fd, f'forked {{rss}} {{private}}'.encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+print(os.read(read_fd, 1024).decode())
+'''
+
+def run_python(args, **kwargs):
+    return subprocess.run([sys.executable, '-W', 'ignore'] + args, cwd=ROOT, capture_output=True,
+                          text=True, check=True, **kwargs)
+
+def import_profile(top):
+    """(total seconds, [(cumulative us, self us, module)]) from one -X importtime run."""
+    result = run_python(['-X', 'importtime', '-c', 'import app'])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    total = next(cumulative for cumulative, _, module in rows if module.strip() == 'app')
+    slowest = sorted(rows, key=lambda row: row[0], reverse=True)[:top]
+    return total / 1e6, slowest
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark worker startup time and memory.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, slowest = import_profile(args.top)
+        totals.append(total)
+    print(f"import app: median {statistics.median(totals) * 1000:.1f} ms over {args.runs} runs")
+    print(f"\nSlowest imports (last run, cumulative):")
+    for cumulative, self_us, module in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {module}")
+
+    output = run_python(['-c', _MEMORY_PROBE.format(root=ROOT)]).stdout.split()
+    _, _, cold_rss, cold_private, _, forked_rss, forked_private = output
+    print(f"\nWorker without preload:  RSS {int(cold_rss) / 1024:7.1f} MB  (all private to the worker)")
+    print(f"Worker forked (preload): RSS {int(forked_rss) / 1024:7.1f} MB, "
+          f"private {int(forked_private) / 1024:6.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Shared helpers for the benchmark scripts: a seeded database, timing stats and JSON results.
+
+Results files look like:
+    {"kind": "micro", "created_at": ..., "environment": {...}, "params": {...},
+     "results": {"<name>": {"median_ms": ..., "p95_ms": ..., "ops_per_sec": ..., ...}}}
+
+Pass a previous results file as --compare to print per-benchmark deltas; the
+scripts exit with status 1 when any benchmark regressed by more than --threshold.
+"""
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+ADMIN_USERNAME = 'bench_admin'
+ADMIN_PASSWORD = 'bench-password'
+PRODUCT_NAME = 'Bench Product {}'
+
+def license_key(i):
+    return f'BENCH{i:011d}'
+
+def machine_code(i):
+    return f'bench-machine-{i}'
+
+def use_database(db_path):
+    """Point the app (Config and anything imported later) at an SQLite file."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    if 'config' in sys.modules:
+        sys.modules['config'].Config.SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+
+def seed_database(db_path, products=10, licenses=10000, usage_logs=20000):
+    """Create a migrated database with deterministic products, licenses and usage logs.
+
+    License i belongs to product i % products, has key license_key(i) and machine
+    machine_code(i), and is active for another 30 days. Reuses an existing file if
+    it already holds the requested number of licenses.
+    """
+    use_database(db_path)
+    from models.migrations import migrate
+    from werkzeug.security import generate_password_hash
+
+    migrate(log=lambda *args: None)
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute('SELECT COUNT(*) FROM licenses').fetchone()[0] == licenses:
+            return db_path
+        now = datetime.now()
+        expires_at = (now + timedelta(days=30)).isoformat()
+        with conn:
+            conn.execute('DELETE FROM licenses')
+            conn.execute('DELETE FROM usage_logs')
+            conn.execute('DELETE FROM products')
+            conn.executemany('INSERT INTO products (id, name, description, max_devices) VALUES (?, ?, ?, 1)',
+                             [(p + 1, PRODUCT_NAME.format(p), 'Benchmark product') for p in range(products)])
+            rows = []
+            for i in range(licenses):
+                digest = hashlib.sha256(machine_code(i).encode('utf-8')).digest()
+                rows.append((license_key(i), i % products + 1, f'bench-user-{i}', 'active',
+                             now.isoformat(), expires_at, i % 50, str(100 + i % 900), digest.hex(), digest))
+            conn.executemany('''
+                INSERT INTO licenses (key, product_id, user_id, status, created_at, expires_at,
+                                      usage_count, credit_number, machine_code, machine_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.executemany('''
+                INSERT INTO usage_logs (license_key, ip_address, timestamp, action, response_status)
+                VALUES (?, ?, ?, 'validation', 'success')
+            ''', [(license_key(i % licenses), f'10.0.{i % 250}.{i % 200}',
+                   (now - timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(usage_logs)])
+            conn.execute('''
+                INSERT OR REPLACE INTO users (username, password, first_name, last_name, role)
+                VALUES (?, ?, 'Bench', 'Admin', 'admin')
+            ''', (ADMIN_USERNAME, generate_password_hash(ADMIN_PASSWORD)))
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    return db_path
+
+def summarize(samples):
+    """Latency stats (samples in seconds) in milliseconds."""
+    ordered = sorted(samples)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    mean = statistics.fmean(ordered)
+    return {
+        'rounds': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 4),
+        'mean_ms': round(mean * 1000, 4),
+        'median_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(percentile(95), 4),
+        'p99_ms': round(percentile(99), 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'stddev_ms': round(statistics.pstdev(ordered) * 1000, 4),
+        'ops_per_sec': round(1 / mean, 1) if mean else None
+    }
+
+def measure(fn, rounds=1000, warmup=50, setup=None):
+    """Time `fn` like pytest-benchmark's pedantic mode: warmup calls, then `rounds` timed calls.
+
+    `setup`, if given, runs before each call outside the timed region and its
+    return value is passed to `fn`.
+    """
+    for _ in range(warmup):
+        fn(setup()) if setup else fn()
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            arg = setup()
+            start = time.perf_counter()
+            fn(arg)
+        else:
+            start = time.perf_counter()
+            fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version
+    }
+
+def write_results(path, kind, params, results):
+    document = {
+        'kind': kind,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'params': params,
+        'results': results
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    return document
+
+def compare_results(baseline_path, results, metric='median_ms', threshold=0.15):
+    """Print metric deltas against a baseline file; return the names that regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    print(f"\n{'benchmark':32} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, stats in results.items():
+        before = baseline.get(name, {}).get(metric)
+        after = stats.get(metric)
+        if not before or after is None:
+            print(f"{name:32} {'-':>11} {after:>11} {'new':>8}")
+            continue
+        change = (after - before) / before
+        # Higher is better for throughput, lower for latency
+        worse = -change if metric in ('ops_per_sec', 'requests_per_sec') else change
+        flag = '  REGRESSION' if worse > threshold else ''
+        print(f"{name:32} {before:>11} {after:>11} {change:>+7.1%}{flag}")
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
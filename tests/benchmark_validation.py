@@ -0,0 +1,111 @@
+"""Micro benchmarks for the validation path, license queries and session crypto.
+
+Usage: python tests/benchmark_validation.py [--licenses 10000] [--rounds 1000]
+           [--output benchmark_results/micro.json] [--compare baseline.json] [--threshold 0.15]
+
+Seeds a throwaway SQLite database (see benchmark_utils.seed_database), times
+each benchmark in-process and writes the stats as JSON. With --compare, medians
+are checked against a previous results file and the exit status is 1 on regression.
+"""
+import argparse
+import base64
+import itertools
+import os
+import secrets
+import sys
+import tempfile
+
+from benchmark_utils import (
+    PRODUCT_NAME, compare_results, license_key, machine_code, measure, seed_database, write_results
+)
+
+def validation_benchmarks(args):
+    from models.license import License
+    from models.product import Product
+    from services.license_service import get_license_stats, get_licenses, validate_license
+
+    product = PRODUCT_NAME.format(0)
+    distinct = itertools.cycle(range(0, args.licenses, args.products))  # Every license of product 0
+    results = {}
+    check = validate_license(product, license_key(0), machine_code(0))
+    assert check.get('valid'), f"Seeded license does not validate: {check}"
+
+    # Warm: the same row every time, product id from the cache
+    results['validate_warm'] = measure(
+        lambda: validate_license(product, license_key(0), machine_code(0)), args.rounds)
+
+    # Cold: a different row each call and a reloaded product cache
+    def cold_setup():
+        Product.invalidate_cache()
+        return next(distinct)
+    results['validate_cold'] = measure(
+        lambda i: validate_license(product, license_key(i), machine_code(i)), args.rounds, setup=cold_setup)
+
+    results['validate_unknown_key'] = measure(
+        lambda: validate_license(product, 'BENCHXXXXXXXXXXX', machine_code(0)), args.rounds)
+    results['license_validate_model'] = measure(
+        lambda: License.validate(1, license_key(0), machine_code(0), product_name=product), args.rounds)
+
+    query_rounds = max(args.rounds // 10, 20)
+    results['get_licenses_page'] = measure(lambda: get_licenses(page=5, per_page=50), query_rounds)
+    results['get_licenses_search'] = measure(
+        lambda: get_licenses(search_query='bench-user-12', per_page=50), query_rounds)
+    results['get_license_stats'] = measure(get_license_stats, query_rounds)
+    return results
+
+def crypto_benchmarks(args):
+    from api.security import CryptoManager, SessionManager, KEY_EXCHANGE_X25519
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import x25519
+    from utils import json_codec
+
+    key = secrets.token_bytes(32)
+    payload = json_codec.dumps({'valid': True, 'license_key': license_key(0), 'user_id': 'bench-user-0',
+                                'expires_at': '2030-01-01T00:00:00', 'credit_number': '100'})
+    encrypted = CryptoManager.aes_encrypt(key, payload)
+    manager = SessionManager()
+    session = manager.get_session(manager.create_session('bench', KEY_EXCHANGE_X25519))
+    manager.set_session_key(session, key)
+    crypto = session['crypto']
+    envelope = crypto.seal_envelope(payload.encode('utf-8'))
+    client_public = x25519.X25519PrivateKey.generate().public_key().public_bytes(
+        encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+    server_private = x25519.X25519PrivateKey.generate()
+
+    return {
+        'crypto_aes_encrypt': measure(lambda: crypto.aes_encrypt(payload), args.rounds),
+        'crypto_aes_decrypt': measure(lambda: crypto.aes_decrypt(encrypted), args.rounds),
+        'crypto_envelope_seal': measure(lambda: base64.b64encode(crypto.seal_envelope(payload.encode('utf-8'))),
+                                        args.rounds),
+        'crypto_envelope_open': measure(lambda: crypto.open_envelope(envelope), args.rounds),
+        'crypto_x25519_derive': measure(
+            lambda: CryptoManager.derive_session_key(server_private, client_public, 'bench-session'), args.rounds)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro benchmarks for validation, queries and crypto.')
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--licenses', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--database', help='SQLite file to seed and reuse (default: a temp file)')
+    parser.add_argument('--output', default='benchmark_results/micro.json')
+    parser.add_argument('--compare', help='Previous results file to compare medians against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed slowdown before failing')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='license-bench-'), 'bench.db')
+    seed_database(database, products=args.products, licenses=args.licenses)
+
+    results = validation_benchmarks(args)
+    results.update(crypto_benchmarks(args))
+    for name, stats in results.items():
+        print(f"{name:28} median {stats['median_ms']:9.4f} ms  p95 {stats['p95_ms']:9.4f} ms  "
+              f"{stats['ops_per_sec']:>10} ops/s")
+
+    write_results(args.output, 'micro', vars(args), results)
+    print(f"\nResults written to {args.output}")
+    if args.compare and compare_results(args.compare, results, 'median_ms', args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
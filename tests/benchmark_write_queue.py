@@ -0,0 +1,101 @@
+"""Write throughput with and without group commit (WRITE_QUEUE_ENABLED).
+
+Usage: python tests/benchmark_write_queue.py [--concurrency 1,8,32] [--duration 3]
+           [--profile durable] [--output benchmark_results/write_queue.json]
+           [--compare baseline.json] [--threshold 0.15]
+
+Threads run a mix of license mutations (usage logging, credit deductions,
+field updates) for --duration seconds at each concurrency level, once with
+every mutation committing on its own and once through the write queue, which
+commits concurrent mutations together. The default `durable` pragma profile
+fsyncs every commit, where batching matters most. With --compare, throughput
+is checked against a previous results file.
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_utils import compare_results, license_key, seed_database, summarize, use_database, write_results
+
+def run(queued, concurrency, seed_path, args):
+    from config import Config
+    from models.database import close_db_pool
+    from models.license import License
+    from models.write_queue import write_queue_stats
+
+    path = os.path.join(tempfile.mkdtemp(prefix='license-writes-'), 'bench.db')
+    shutil.copyfile(seed_path, path)
+    close_db_pool()
+    use_database(path)
+    Config.SQLITE_PRAGMA_PROFILE = args.profile
+    Config.WRITE_QUEUE_ENABLED = queued
+    batches_before = write_queue_stats()['batches']
+
+    operations = [
+        lambda i: License.log_usage(license_key(i), '10.0.0.1', 'validation'),
+        lambda i: License.use_credits(license_key(i), 1),
+        lambda i: License.update(license_key(i), ['user_id = ?'], [f'bench-user-{i}'])
+    ]
+    stop = threading.Event()
+    samples = []
+
+    def worker(n):
+        for step in itertools.count(n):
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            operations[step % len(operations)](step % args.licenses)
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    close_db_pool()
+
+    stats = summarize(samples)
+    stats['ops_per_sec'] = round(len(samples) / args.duration, 1)
+    if queued:
+        batches = write_queue_stats()['batches'] - batches_before
+        stats['writes_per_commit'] = round(len(samples) / batches, 1) if batches else None
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare individual commits with group commit.')
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--licenses', type=int, default=10000)
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated writer thread counts')
+    parser.add_argument('--duration', type=float, default=3, help='Seconds per run')
+    parser.add_argument('--profile', default='durable', help='SQLITE_PRAGMA_PROFILE for every run')
+    parser.add_argument('--output', default='benchmark_results/write_queue.json')
+    parser.add_argument('--compare', help='Previous results file to compare throughput against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed slowdown before failing')
+    args = parser.parse_args()
+
+    seed_path = os.path.join(tempfile.mkdtemp(prefix='license-writes-'), 'seed.db')
+    seed_database(seed_path, products=args.products, licenses=args.licenses, usage_logs=0)
+
+    results = {}
+    for concurrency in (int(n) for n in args.concurrency.split(',')):
+        for label, queued in (('individual', False), ('grouped', True)):
+            name = f'{label}_{concurrency}'
+            results[name] = stats = run(queued, concurrency, seed_path, args)
+            per_commit = f"  {stats['writes_per_commit']} writes/commit" if queued else ''
+            print(f"{name:16} {stats['ops_per_sec']:>9} writes/s  median {stats['median_ms']:8.3f} ms  "
+                  f"p99 {stats['p99_ms']:8.3f} ms{per_commit}")
+
+    write_results(args.output, 'write_queue', vars(args), results)
+    print(f"\nResults written to {args.output}")
+    if args.compare and compare_results(args.compare, results, 'ops_per_sec', args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,16 @@
 import requests
 import json
 import base64
+import gzip
 import secrets
 from getpass import getpass
 from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, x25519
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding as sym_padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from urllib.parse import quote
 from HttpAntiDebug import SessionServer as SV
 import os
@@ -17,8 +20,12 @@ import socket
 import ssl
 
 class SecureLicenseClient:
-    def __init__(self, server_url, timeout=30, max_retries=3, enable_logging=True):
+    def __init__(self, server_url, timeout=30, max_retries=3, enable_logging=True, envelope_version=1, key_exchange='rsa'):
         self.server_url = server_url
+        self.envelope_version = envelope_version
+        self.key_exchange = key_exchange
+        self.session_ticket = None
+        self.ticket_expires_at = None
         self.client_id = 'x-client'
         self.session_id = None
         self.aes_key = None
@@ -48,6 +55,12 @@ class SecureLicenseClient:
             'X-Client-ID': self.client_id,
             'Content-Type': 'application/json'
         })
+        if key_exchange == 'x25519':
+            # Ask for the ECDH handshake; the server skips its RSA keygen
+            self.anti_debug_session.headers['X-Key-Exchange'] = 'x25519'
+        if envelope_version == 2:
+            # Opt in to the AES-GCM envelope; responses come back as one base64 string
+            self.anti_debug_session.headers['X-Encryption-Version'] = '2'
 
     def _log(self, level, message, *args, **kwargs):
         """Internal logging method"""
@@ -102,7 +115,10 @@ class SecureLicenseClient:
                         data = json.loads(response.text)
 
                     self.session_id = data['session_id']
-                    self.server_public_key = self.import_public_key(data['server_public_key'])
+                    if self.key_exchange == 'x25519':
+                        self.server_public_key = base64.b64decode(data['server_public_key'])
+                    else:
+                        self.server_public_key = self.import_public_key(data['server_public_key'])
 
                     # Update session ID header
                     self.anti_debug_session.headers.update({'X-Session-ID': self.session_id})
@@ -180,24 +196,10 @@ class SecureLicenseClient:
         for attempt in range(max_retries):
             try:
                 self._log(logging.INFO, f"Key exchange attempt {attempt + 1}/{max_retries}...")
-                # Generate client key pair
-                self.generate_key_pair()
-
-                # Generate AES key
-                self.aes_key = secrets.token_bytes(32)  # 256-bit AES key
-
-                # Encrypt AES key with server's public key
-                encrypted_aes_key = self.server_public_key.encrypt(
-                    self.aes_key,
-                    padding.OAEP(
-                        mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                        algorithm=hashes.SHA256(),
-                        label=None
-                    )
-                )
-
-                # Export client public key
-                client_public_key_pem = self.export_public_key()
+                if self.key_exchange == 'x25519':
+                    json_payload = json.dumps(self._x25519_key_exchange_payload())
+                else:
+                    json_payload = json.dumps(self._rsa_key_exchange_payload())
 
                 self._log(logging.DEBUG, "Key exchange payload prepared")
 
@@ -208,12 +210,6 @@ class SecureLicenseClient:
                     'X-Session-ID': self.session_id
                 }
 
-                # Prepare JSON payload as string
-                json_payload = json.dumps({
-                    'session_id': self.session_id,
-                    'encrypted_aes_key': self.bytes_to_base64(encrypted_aes_key),
-                    'client_public_key': client_public_key_pem
-                })
                 form_payload = {'json_data': json_payload}
 
                 # Add timeout if supported
@@ -227,12 +223,11 @@ class SecureLicenseClient:
                 self._log(logging.DEBUG, f"Key exchange response: {response.text}")
 
                 if response.status_code == 200:
-                    # Handle HttpAntiDebug response
-                    if hasattr(response, 'json') and callable(response.json):
-                        result = response.json()
-                    else:
-                        result = json.loads(response.text)
+                    # The server already holds the new key, so the reply comes back encrypted
+                    result = self.decrypt_response(response)
                     self._log(logging.INFO, f"Key exchange result: {result}")
+                    self.session_ticket = result.get('session_ticket')
+                    self.ticket_expires_at = result.get('ticket_expires_at')
                     return True
                 elif response.status_code >= 500:
                     # Server error, retry
@@ -256,6 +251,43 @@ class SecureLicenseClient:
                     return False
         return False
 
+    def _rsa_key_exchange_payload(self):
+        """Generate the AES key locally and send it wrapped with the server's RSA key"""
+        self.generate_key_pair()
+        self.aes_key = secrets.token_bytes(32)  # 256-bit AES key
+        encrypted_aes_key = self.server_public_key.encrypt(
+            self.aes_key,
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        )
+        return {
+            'session_id': self.session_id,
+            'encrypted_aes_key': self.bytes_to_base64(encrypted_aes_key),
+            'client_public_key': self.export_public_key()
+        }
+
+    def _x25519_key_exchange_payload(self):
+        """Derive the AES key from an X25519 exchange (HKDF-SHA256, salted with the session id)"""
+        private_key = x25519.X25519PrivateKey.generate()
+        shared_secret = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(self.server_public_key))
+        self.aes_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=self.session_id.encode('utf-8'),
+            info=b'license-server session key v1'
+        ).derive(shared_secret)
+        public_bytes = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+        return {
+            'session_id': self.session_id,
+            'client_public_key': self.bytes_to_base64(public_bytes)
+        }
+
     def pkcs7_pad(self, data):
         """PKCS7 padding implementation"""
         block_size = 16
@@ -345,6 +377,46 @@ class SecureLicenseClient:
             traceback.print_exc()
             raise
 
+    def seal_envelope(self, data):
+        """Encrypt a dict into a base64 v2 envelope (version | flags | nonce | AES-GCM)"""
+        header = bytes((2, 0))
+        nonce = secrets.token_bytes(12)
+        plaintext = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        envelope = header + nonce + AESGCM(self.aes_key).encrypt(nonce, plaintext, header)
+        return base64.b64encode(envelope).decode('ascii')
+
+    def open_envelope(self, body):
+        """Decrypt a v2 envelope (base64 text or raw bytes) into the response JSON"""
+        envelope = body if isinstance(body, bytes) and body[:1] == b'\x02' else base64.b64decode(body)
+        if envelope[0] != 2:
+            raise ValueError(f"Unsupported envelope version: {envelope[0]}")
+        plaintext = AESGCM(self.aes_key).decrypt(envelope[2:14], envelope[14:], envelope[:2])
+        if envelope[1] & 0x01:  # Plaintext was gzipped before sealing
+            plaintext = gzip.decompress(plaintext)
+        elif envelope[1] & 0x02:
+            import brotli
+            plaintext = brotli.decompress(plaintext)
+        return json.loads(plaintext)
+
+    def decrypt_response(self, response):
+        """Decrypt a response in whichever envelope format the server used"""
+        if response.headers.get('X-Encryption-Version') == '2':
+            return self.open_envelope(response.content)
+        body = json.loads(response.text)
+        if body.get('status') != 'encrypted':
+            return body
+        result = self.aes_decrypt(body['encrypted_data'])
+        # The legacy envelope wraps the JSON body in a JSON string
+        return json.loads(result) if isinstance(result, str) else result
+
+    def resume_session(self, session_ticket, aes_key):
+        """Reuse a saved ticket and AES key instead of a new handshake"""
+        self.session_ticket = session_ticket
+        self.aes_key = aes_key
+        self.session_id = None
+        self.anti_debug_session.headers.pop('X-Session-ID', None)
+        self.anti_debug_session.headers['X-Session-Ticket'] = session_ticket
+
     def login_user(self, username, password):
         """Login user using HttpAntiDebug and manual cookie handling"""
         try:
@@ -509,6 +581,22 @@ class SecureLicenseClient:
     def send_encrypted_post_request(self, endpoint, data):
         """Send encrypted POST request using HttpAntiDebug"""
         try:
+            if self.envelope_version == 2:
+                headers = self.anti_debug_session.headers.copy()
+                headers['Content-Type'] = 'text/plain'
+                if self.access_token_cookie:
+                    headers['Cookie'] = f'access_token_cookie={self.access_token_cookie}'
+                response = self.anti_debug_session.post(
+                    f"/api/{endpoint.lstrip('/')}",
+                    data=self.seal_envelope(data),
+                    headers=headers
+                )
+                if response.status_code == 200:
+                    return self.decrypt_response(response)
+                result = json.loads(response.text)
+                result['status'] = response.status_code
+                return result
+
             # Encrypt the request data
             encrypted_request = self.aes_encrypt(data)
             # print(f"Encrypted request prepared")
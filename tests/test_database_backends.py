@@ -0,0 +1,216 @@
+"""The models and maintenance jobs behave the same on SQLite and PostgreSQL.
+
+Usage: python tests/test_database_backends.py [--database-url postgresql://user@host:5432/db]
+
+Without --database-url a throwaway SQLite file is used. A PostgreSQL database
+must be empty (or a previous run of this script): its tables are dropped first.
+A local server for this is one command away:
+
+    docker run --rm -e POSTGRES_HOST_AUTH_METHOD=trust -p 5432:5432 postgres:16
+
+Under pytest the SQLite run always happens; the PostgreSQL run needs
+TEST_DATABASE_URL. Each run is a subprocess so Config is read fresh.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TABLES = ('schema_version', 'usage_log_rollup_state', 'usage_log_rollups', 'data_versions',
+           'usage_logs', 'settings', 'licenses', 'products', 'users')
+
+def reset_database():
+    from models.database import get_db_connection, is_postgres
+    if not is_postgres():
+        return
+    with get_db_connection() as conn:
+        for table in _TABLES:
+            conn.execute(f'DROP TABLE IF EXISTS {table} CASCADE')
+
+def check(label, condition, detail=''):
+    print(f"{'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail and not condition else ''}")
+    return bool(condition)
+
+def run_checks():
+    import io
+    import sqlite3
+    from concurrent.futures import ThreadPoolExecutor
+
+    from models.database import get_database_size, get_db_connection, insert_default_users, init_db, is_postgres
+    from models.license import License
+    from models.migrations import get_pending_migrations
+    from models.product import Product
+    from models.setting import Setting
+    from models.user import User
+    from models.write_queue import run_write
+    from services import usage_log_service
+    from services.http_cache import get_data_versions
+    from services.license_import import import_file
+    from services.license_service import bulk_license_action, get_license_stats, get_licenses, validate_license
+    from utils.hash_utils import machine_code_digest
+
+    results = []
+    reset_database()
+    init_db()
+    results.append(check('migrations applied', not get_pending_migrations()))
+    results.append(check('migrations idempotent', init_db() == []))
+
+    insert_default_users()
+    insert_default_users()  # Existing users are skipped, not an error
+    results.append(check('default users', User.get_by_username('richtoolsmmo01')['role'] == 'admin'))
+    created = User.create('backend_user', 'hash')
+    results.append(check('user create returns id', created.get('user_id')))
+    results.append(check('duplicate user rejected', not User.create('backend_user', 'hash')['success']))
+
+    product = Product.create('Backend Product', 'desc', 3)
+    product_id = product.get('product_id')
+    results.append(check('product create returns id', product_id and Product.get_by_id(product_id)['name'] == 'Backend Product'))
+    results.append(check('setting create', Setting.create(product_id, 5, 48).get('success')))
+    versions_before = get_data_versions(['licenses'])
+
+    machine = 'backend-machine'
+    license_result = License.create(product_id, 'user-1', '5', machine_code_digest(machine).hex(), 24)
+    key = license_result.get('license_key')
+    results.append(check('license create', key, license_result))
+    results.append(check('duplicate license rejected',
+                         not License.create(product_id, 'user-1', '5', machine_code_digest(machine).hex())['success']))
+    results.append(check('data version bumped', get_data_versions(['licenses']) != versions_before))
+
+    result = validate_license('Backend Product', key, machine)
+    results.append(check('validate', result.get('valid') and result['product_name'] == 'Backend Product', result))
+    results.append(check('validate wrong machine', not validate_license('Backend Product', key, 'other')['valid']))
+    License.log_usage(key, '127.0.0.1', 'validation')
+
+    licenses, total = get_licenses('BACKEND PRODUCT')  # LIKE ignores case on both backends
+    results.append(check('search', total == 1 and licenses[0]['product_name'] == 'Backend Product', total))
+    results.append(check('search with %', get_licenses('100%')[1] == 0))
+    stats = get_license_stats()
+    results.append(check('stats', stats['total_licenses'] == 1 and stats['recent_validations'] == 1, stats))
+
+    with get_db_connection() as conn:
+        conn.execute("UPDATE licenses SET expires_at = ? WHERE key = ?",
+                     ((datetime.now() - timedelta(hours=1)).isoformat(), key))
+    results.append(check('expired license', validate_license('Backend Product', key, machine)['error'] == 'License expired'))
+    with get_db_connection() as conn:
+        status = conn.execute('SELECT status FROM licenses WHERE key = ?', (key,)).fetchone()['status']
+    results.append(check('expiry persisted', status == 'expired', status))
+
+    try:
+        with get_db_connection() as conn:
+            conn.execute("UPDATE licenses SET status = 'bogus' WHERE key = ?", (key,))
+        results.append(check('status constraint', False))
+    except sqlite3.DatabaseError:
+        results.append(check('status constraint', True))
+
+    # Logs of a past hour are rolled up, archived and pruned
+    old = (datetime.utcnow() - timedelta(days=40)).strftime(usage_log_service.TIMESTAMP_FORMAT)
+    with get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO usage_logs (license_key, ip_address, action, response_status, timestamp) VALUES (?, ?, ?, ?, ?)',
+            [(key, '10.0.0.1', 'validation', 'success', old)] * 3
+        )
+    summary = usage_log_service.run_retention_job(archive_dir=tempfile.mkdtemp(prefix='license-archive-'))
+    results.append(check('retention job', summary['raw_rows_archived'] == 3 and summary['hours_rolled_up'] > 0, summary))
+    with get_db_connection() as conn:
+        rolled = conn.execute("SELECT SUM(event_count) FROM usage_log_rollups WHERE granularity = 'day'").fetchone()[0]
+    results.append(check('daily rollup counts', rolled == 3, rolled))
+
+    # Group commit: racing creates see each other's rows; a failing write is rolled back alone
+    with ThreadPoolExecutor(8) as executor:
+        created = list(executor.map(
+            lambda n: License.create(product_id, 'racer', '1', machine_code_digest(f'race-{n}').hex()), range(8)))
+    results.append(check('concurrent duplicate creates', sum(r['success'] for r in created) == 1, created))
+    def bad_write(conn):
+        conn.execute("UPDATE licenses SET status = 'bogus' WHERE key = ?", (key,))
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(run_write, bad_write)] + [
+            executor.submit(License.log_usage, key, '10.0.0.2', 'validation') for _ in range(3)]
+    results.append(check('failed write isolated', isinstance(futures[0].exception(), sqlite3.DatabaseError)
+                         and all(f.exception() is None for f in futures[1:])))
+
+    # Bulk actions: set-based changes with one audit row per license
+    bulk_product = Product.create('Bulk Product', 'desc', 1)['product_id']
+    bulk_keys = [License.create(bulk_product, f'bulk-{n}', '1', machine_code_digest(f'bulk-{n}').hex(), 1)['license_key']
+                 for n in range(5)]
+    by_product = {'filter': {'product': 'Bulk Product'}}
+    dry_run = bulk_license_action('revoke', dict(by_product, dry_run=True))
+    results.append(check('bulk dry run', dry_run.get('matched') == 5, dry_run))
+    extended = bulk_license_action('extend', {'keys': bulk_keys[:2], 'hours': 48})
+    result = validate_license('Bulk Product', bulk_keys[0], 'bulk-0')
+    results.append(check('bulk extend', extended.get('affected') == 2 and result.get('valid')
+                         and datetime.fromisoformat(result['expires_at']) > datetime.now() + timedelta(hours=47),
+                         (extended, result)))
+    revoked = [bulk_license_action('revoke', by_product)['affected'] for _ in range(2)]
+    results.append(check('bulk revoke', revoked == [5, 0], revoked))
+    deleted = bulk_license_action('delete', {'keys': bulk_keys + ['BULKMISSINGKEY0000']})
+    with get_db_connection() as conn:
+        audited = conn.execute(
+            f"SELECT action, COUNT(*) FROM usage_logs WHERE license_key IN ({', '.join('?' * 5)}) GROUP BY action",
+            bulk_keys).fetchall()
+    results.append(check('bulk delete and audit', deleted.get('affected') == 5 and dict(
+        (row[0], row[1]) for row in audited) == {'extension': 2, 'revocation': 5, 'deletion': 5}, (deleted, audited)))
+    results.append(check('bulk needs a selection', not bulk_license_action('delete', {})['success']))
+    extend_key = License.create(bulk_product, 'bulk-extend', '1', machine_code_digest('bulk-extend').hex(), 1)['license_key']
+    results.append(check('bulk input validated', not any(bulk_license_action(action, data)['success'] for action, data in (
+        ('extend', {'keys': [extend_key], 'hours': 100000000}), ('extend', {'keys': [extend_key], 'hours': 2 ** 64}),
+        ('revoke', {'filter': {'user_id': ['bulk-extend']}}), ('revoke', {'filter': {'user_id': {'id': 1}}}),
+        ('revoke', {'filter': {'product': ['Bulk Product']}}), ('revoke', {'filter': {'product': {'name': 'x'}}}),
+        ('revoke', {'filter': {'product_id': True}}), ('revoke', ['keys']), ('revoke', b'raw body')))))
+    if not is_postgres():  # strftime overflows to NULL instead of raising
+        with get_db_connection() as conn:
+            expires_at = conn.execute('SELECT expires_at FROM licenses WHERE key = ?', (extend_key,)).fetchone()[0]
+            License._bulk_extend(conn, License.bulk_conditions(keys=[extend_key]), 100000000, datetime.now().isoformat())
+            extended = conn.execute('SELECT expires_at FROM licenses WHERE key = ?', (extend_key,)).fetchone()[0]
+        results.append(check('bulk extend never clears expiry', extended == expires_at, extended))
+
+    csv_file = io.BytesIO(b'product_name,user_id,machine_code,expires_at,credit_number\n'
+                          b'Bulk Product,import-1,import-machine-1,2030-01-01\n'
+                          b'Bulk Product,import-2,import-machine-2,\n'
+                          b'Bulk Product,import-3,import-machine-1,\n'   # Same machine as row 2
+                          b'Backend Product,racer,racer-machine,\n'    # Existing user
+                          b'Bulk Product,import-4,import-machine-4,,1.5\n')  # Credits not a whole number
+    summary = import_file(csv_file, 'licenses.csv', chunk_size=2)
+    with get_db_connection() as conn:
+        imported_key = conn.execute("SELECT key FROM licenses WHERE user_id = 'import-1'").fetchone()[0]
+    results.append(check('import', summary['imported'] == 2 and [e['row'] for e in summary['errors']] == [4, 5, 6]
+                         and validate_license('Bulk Product', imported_key, 'import-machine-1')['valid'], summary))
+
+    results.append(check('revoke', License.revoke(key)['success']))
+    results.append(check('delete', License.delete(key)['success']))
+    results.append(check('database size', get_database_size() > 0))
+    return all(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the model checks against one database backend.')
+    parser.add_argument('--database-url', help='postgresql://... (default: a temporary SQLite file)')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='license-backend-'), 'backend.db')
+    os.environ['REDIS_URL'] = 'redis://127.0.0.1:1'  # Not needed here
+    sys.path.insert(0, ROOT)
+    print(f"Backend: {os.environ['DATABASE_URL'].split(':', 1)[0]}")
+    if not run_checks():
+        sys.exit(1)
+
+def _run(*args):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), *args],
+                            capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+def test_sqlite_backend():
+    _run()
+
+def test_postgres_backend():
+    import pytest
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL not set')
+    _run('--database-url', url)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Validations keep completing on a gevent worker while a slow admin query runs.
+
+Usage: python tests/test_gevent_database.py [--licenses 2000] [--slow-rows 2000000] [--greenlets 8]
+
+Monkey-patches like gunicorn's gevent worker, seeds a throwaway database and
+runs one slow query next to greenlets that validate licenses in a loop, once
+with the native threadpool (DB_THREADPOOL_SIZE) and once inline (0). With the
+pool, validations complete while the slow query is still running; inline,
+none do. Exits 1 if the pool run shows no overlap. Under pytest the script is
+run in a subprocess so the test process itself is never patched.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Counts to N without touching any table: CPU-bound inside SQLite, no I/O
+SLOW_QUERY = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?) SELECT COUNT(*) FROM n'
+
+def run(pool_size, args):
+    import gevent
+    from benchmark_utils import PRODUCT_NAME, license_key, machine_code
+    from config import Config
+    from models.database import get_read_connection
+    from services.license_service import validate_license
+
+    Config.DB_THREADPOOL_SIZE = pool_size
+    window = {}
+    completed = []
+
+    def slow_query():
+        conn = get_read_connection()
+        try:
+            window['start'] = time.perf_counter()
+            conn.execute(SLOW_QUERY, (args.slow_rows,)).fetchone()
+            window['end'] = time.perf_counter()
+        finally:
+            conn.close()
+
+    def validate_loop(worker):
+        i = worker
+        while 'end' not in window:
+            result = validate_license(PRODUCT_NAME.format(i % args.products), license_key(i), machine_code(i))
+            assert result.get('valid'), result
+            completed.append(time.perf_counter())
+            i = (i + args.greenlets) % args.licenses
+
+    slow = gevent.spawn(slow_query)
+    validators = [gevent.spawn(validate_loop, worker) for worker in range(args.greenlets)]
+    gevent.joinall([slow] + validators, raise_error=True)
+    overlapped = sum(1 for t in completed if window['start'] < t < window['end'])
+    return {
+        'slow_query_ms': round((window['end'] - window['start']) * 1000, 1),
+        'validations': len(completed),
+        'during_slow_query': overlapped
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that gevent workers overlap DB calls.')
+    parser.add_argument('--products', type=int, default=10)
+    parser.add_argument('--licenses', type=int, default=2000)
+    parser.add_argument('--slow-rows', type=int, default=2000000, help='Rows the slow query counts')
+    parser.add_argument('--greenlets', type=int, default=8, help='Concurrent validation loops')
+    parser.add_argument('--pool-size', type=int, default=10)
+    args = parser.parse_args()
+
+    from benchmark_utils import seed_database
+    seed_database(os.path.join(tempfile.mkdtemp(prefix='license-gevent-'), 'bench.db'),
+                  products=args.products, licenses=args.licenses, usage_logs=0)
+
+    results = {}
+    for label, pool_size in (('threadpool', args.pool_size), ('inline', 0)):
+        results[label] = stats = run(pool_size, args)
+        print(f"{label:10} slow query {stats['slow_query_ms']:8.1f} ms  "
+              f"validations during it {stats['during_slow_query']:5} / {stats['validations']}")
+
+    if results['threadpool']['during_slow_query'] == 0:
+        print('FAIL: validations waited for the slow query')
+        sys.exit(1)
+    print('OK: validations overlapped the slow query')
+
+def test_validations_overlap_slow_query():
+    result = subprocess.run([sys.executable, os.path.abspath(__file__)],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+if __name__ == '__main__':
+    from gevent import monkey
+    monkey.patch_all()
+    main()
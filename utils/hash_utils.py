@@ -12,6 +12,19 @@ def hash_machine_code(machine_code):
     """Create a SHA-256 hash of the machine code for secure storage."""
     return hashlib.sha256(machine_code.encode('utf-8')).hexdigest()
 
+def machine_code_digest(machine_code):
+    """Raw 32-byte SHA-256 digest of the machine code (stored in licenses.machine_hash)."""
+    return hashlib.sha256(machine_code.encode('utf-8')).digest()
+
+def machine_hash_from_hex(hashed_machine_code):
+    """Convert a stored hex machine hash to its 32-byte form, None if not a digest."""
+    if isinstance(hashed_machine_code, str) and len(hashed_machine_code) == 64:
+        try:
+            return bytes.fromhex(hashed_machine_code)
+        except ValueError:
+            return None
+    return None
+
 def generate_license_key(length=16):
     """Generate a random alphanumeric license key."""
     chars = string.ascii_letters + string.digits
@@ -0,0 +1,23 @@
+"""JSON encode/decode, using orjson when it is installed."""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_bytes(obj):
+    """Serialize to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps(obj):
+    """Serialize to a JSON string."""
+    return dumps_bytes(obj).decode('utf-8')
@@ -0,0 +1,73 @@
+"""Flask JSON provider backed by orjson, falling back to Flask's stdlib provider."""
+import dataclasses
+import decimal
+import uuid
+from datetime import date, datetime, timezone
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from utils import json_codec
+
+orjson = json_codec.orjson
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def _http_date(o):
+    """werkzeug.http.http_date for datetimes, without the email.utils round trip."""
+    if o.tzinfo is not None:
+        o = o.astimezone(timezone.utc)
+    return (f'{_WEEKDAYS[o.weekday()]}, {o.day:02d} {_MONTHS[o.month - 1]} {o.year:04d} '
+            f'{o.hour:02d}:{o.minute:02d}:{o.second:02d} GMT')
+
+def _default(o):
+    # Same conversions as DefaultJSONProvider, so responses keep their format
+    if isinstance(o, datetime):
+        return _http_date(o)
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson-encoded responses with DefaultJSONProvider's output conventions."""
+
+    def _options(self):
+        options = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self._app.config.get('JSON_DATETIME_FORMAT', 'http') != 'iso':
+            # HTTP dates like the stdlib provider; 'iso' lets orjson format them natively (much faster)
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=_default, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """Use the orjson provider when orjson is installed."""
+    if orjson is not None:
+        app.json = FastJSONProvider(app)
+    return app.json
@@ -1,39 +1,251 @@
+import atexit
+import copy
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+from utils import json_codec
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is logged as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, request_id and any `extra` fields."""
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        try:
+            return json_codec.dumps(entry)
+        except TypeError:
+            return json_codec.dumps({key: value if isinstance(value, (str, int, float, bool, type(None)))
+                                     else str(value) for key, value in entry.items()})
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id (runs on the request thread)."""
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            try:
+                record.request_id = g.get('request_id') if has_request_context() else None
+            except Exception:
+                record.request_id = None
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO/DEBUG records per logger; warnings and errors always pass.
+
+    rates maps a logger name (or parent name) to the fraction to keep, e.g.
+    {'license_server.validation': 0.1}.
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            if rate < 1.0:
+                record.sample_rate = rate
+            return True
+        return False
+
+def parse_sample_rates(spec):
+    """'a.b=0.1,c=0.5' -> {'a.b': 0.1, 'c': 0.5}"""
+    rates = {}
+    for item in (spec or '').split(','):
+        name, _, rate = item.strip().partition('=')
+        if name and rate:
+            rates[name.strip()] = float(rate)
+    return rates
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the pipeline's queue; drops (and counts) them when it is full."""
+    def __init__(self, pipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # Resolve the message and traceback here, but leave the layout to the listener's formatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.ensure_running()
+        try:
+            self.pipeline.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline.dropped += 1
+
+class LogPipeline:
+    """Root QueueHandler plus a QueueListener thread that does the actual I/O.
+
+    Request threads only format the message and enqueue the record. Like the
+    health prober, the listener is restarted with a fresh queue when the
+    process id changes, so it survives gunicorn's fork after preload_app.
+    """
+    def __init__(self):
+        self.queue = None
+        self.config = {}
+        self.queue_size = 10000
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.stop()
+        self.config = config
+        self.queue_size = config.get('LOG_QUEUE_SIZE', 10000)
+        self.ensure_running()
+
+    def ensure_running(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self.queue = queue.Queue(self.queue_size)
+            for handler in logging.getLogger().handlers:
+                if isinstance(handler, _NonBlockingQueueHandler):
+                    handler.queue = self.queue
+            # Built per process so LOG_FILE may contain {pid}
+            self._listener = logging.handlers.QueueListener(
+                self.queue, *_build_handlers(self.config), respect_handler_level=True)
+            self._listener.start()
+            self._pid = pid
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+            self._listener = None
+            self._pid = None
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize() if self.queue is not None else 0,
+            'capacity': self.queue_size,
+            'dropped': self.dropped
+        }
+
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.stop)
+
+def _build_handlers(config):
+    formatter = JSONFormatter() if config.get('LOG_FORMAT', 'json') == 'json' else logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler()]
+    log_file = config.get('LOG_FILE')
+    if log_file:
+        log_file = log_file.format(pid=os.getpid())
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=config.get('LOG_BACKUP_COUNT', 5), encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def configure_logging(config):
+    """Route all loggers through the queue: root gets one non-blocking QueueHandler."""
+    level = logging.getLevelName(str(config.get('LOG_LEVEL', 'INFO')).upper())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, _NonBlockingQueueHandler):
+            root.removeHandler(handler)
+    log_pipeline.configure(config)
+    handler = _NonBlockingQueueHandler(log_pipeline)
+    handler.addFilter(SamplingFilter(parse_sample_rates(config.get('LOG_SAMPLE_RATES'))))
+    handler.addFilter(RequestContextFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+    return log_pipeline
+
+def init_logging(app):
+    """Structured, non-blocking logging plus request ids and an access log.
+
+    Call this first in create_app so the access log's after_request hook runs
+    last and records the final status code.
+    """
+    from flask.logging import default_handler
+
+    configure_logging(app.config)
+    # app.logger propagates to root; Flask's own stderr handler would write synchronously
+    app.logger.removeHandler(default_handler)
+    access_logger = logging.getLogger('license_server.access')
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        start = g.pop('log_start', None)
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        if start is not None and app.config.get('LOG_ACCESS', True):
+            access_logger.log(
+                logging.WARNING if response.status_code >= 500 else logging.INFO,
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                    'remote_addr': request.remote_addr
+                })
+        return response
+
+    return log_pipeline
 
 def setup_logger(name, level=logging.INFO):
-    """Set up a logger with file and console handlers."""
-    # Create logs directory
-    log_dir = 'logs'
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # File handler
-    log_file = os.path.join(log_dir, f'{datetime.now().strftime("%Y%m%d")}.log')
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(level)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(file_formatter)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(console_formatter)
-    
-    # Logger
+    """Logger that writes through the shared queue pipeline (configured with defaults if needed)."""
+    if log_pipeline.queue is None:
+        configure_logging({'LOG_LEVEL': 'INFO', 'LOG_FILE': 'logs/license_server.log'})
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    logger.propagate = False
-    
     return logger
 
 def get_logger(name):
     """Get or create logger."""
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)